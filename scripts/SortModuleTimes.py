@@ -19,27 +19,100 @@
 #   updating from optparse to argparse
 # 1.5 (20140711, petrillo@fnal.gov)
 #   improved parsing relying on end-of-event markers; using python 2.7
+# 1.6 (20261018)
+#   parallel parsing of the input files (--jobs option)
+# 1.7 (20261018)
+#   numerically stable statistics; partial aggregate files (--sidecar option)
+# 1.8 (20261018)
+#   faster parsing; follow mode for running jobs (--follow option)
+# 1.9 (20261018)
+#   approximate percentiles of the module times (--percentiles option)
+# 1.10 (20261018)
+#   persistent cache of the parsing results (--cache option)
+# 1.11 (20261018)
+#   support for xz, zstd and lz4 input; compression detected from the content;
+#   decompression by external (parallel, if available) programs
+# 1.12 (20261018)
+#   binary columnar export of the single event times (--export option)
+# 1.13 (20261018)
+#   self-profiling of the processing phases (--self-profile option)
+# 1.14 (20261018)
+#   event table in CSV or TSV format, one event per row (--eventtable-format)
+# 1.15 (20261018)
+#   report of the slowest events of each module (--slowest option)
+# 1.16 (20261018)
+#   average times per run and subrun (--groupby option)
+# 1.17 (20261018)
+#   input from art TimeTracker SQLite databases
+# 1.18 (20261018)
+#   memory usage of the modules from art MemoryTracker SQLite databases
+# 1.19 (20261018)
+#   support for logs of multi-threaded jobs, with interleaved events
+# 1.20 (20261018)
+#   time series of the costs and warm-up detection (--timeseries, --skipwarmup)
+# 1.21 (20261018)
+#   approximate statistics from sampled regions of the logs (--approx)
+# 1.22 (20261018)
+#   pipelined reading, scanning and aggregation of each log (--pipeline)
+# 1.23 (20261018)
+#   check of the module times against a performance budget (--budget)
+# 1.24 (20261018)
+#   comparison with the times from a baseline set of logs (--compare)
 #
 
 import sys, os
 import math
+import time
 import gzip
 try: import bz2
-except ImportError: pass
+except ImportError: bz2 = None
+try: import lzma
+except ImportError:
+	try: from backports import lzma
+	except ImportError: lzma = None
+# try ... except
+try: import zstandard
+except ImportError: zstandard = None
+try: import lz4.frame
+except ImportError: lz4 = None
+import subprocess
+import signal
+import itertools
+import operator
+import multiprocessing
+import threading
+import Queue
+import cStringIO
+import collections
+import json
+import csv
+import cPickle as pickle
+import hashlib
+import array
+import heapq
+import struct
+import re
+import mmap
+import resource
+import random
+try: import sqlite3
+except ImportError: sqlite3 = None
+import contextlib
+import gc
 from collections import OrderedDict
 
 
-Version = "%(prog)s 1.5"
+Version = "%(prog)s 1.24"
 __doc__ = "Prints statistics of the module timings based on the information from the Timing service."
 
 #
 # statistics collection
 #
-def signed_sqrt(value):
-	"""Returns sign(x) * sqrt(abs(x))"""
-	if value >= 0.: return math.sqrt(value)
-	else: return -math.sqrt(-value)
-# signed_sqrt()
+
+def MissingTimes(n):
+	"""Returns an array of n missing times (NaN)."""
+	return array.array('d', [ float('nan') ]) * n
+# MissingTimes()
 
 
 class Stats:
@@ -61,6 +134,12 @@ class Stats:
 	- stdev():   standard deviation (0 if less than two events)
 	- stdevp():  an alias for rms()
 
+	The average and the second central moment are updated at each addition
+	with West's weighted version of Welford's algorithm, that does not suffer
+	from the cancellation of sqaverage() - average()**2; two samples can be
+	joined with merge() (by Chan et al. pairwise formula) with the same
+	accuracy as if all the entries had been added to a single sample.
+
 	The construction allows to specify bFloat = false, in which case the
 	accumulators are integral types (int) until a real type value or weight is
 	add()ed.
@@ -73,11 +152,11 @@ class Stats:
 		if bFloat:
 			self.e_w = 0.
 			self.e_sum = 0.
-			self.e_sumsq = 0.
 		else:
 			self.e_w = 0
 			self.e_sum = 0
-			self.e_sumsq = 0
+		self.e_mean = 0.
+		self.e_m2 = 0.
 		self.e_min = None
 		self.e_max = None
 	# clear()
@@ -91,25 +170,67 @@ class Stats:
 		self.e_n += 1
 		self.e_w += weight
 		self.e_sum += weight * value
-		self.e_sumsq += weight * value**2
+		if self.e_w != 0:
+			delta = value - self.e_mean
+			self.e_mean += delta * weight / float(self.e_w)
+			self.e_m2 += weight * delta * (value - self.e_mean)
+		# if
 		if (self.e_min is None) or (value < self.e_min): self.e_min = value
 		if (self.e_max is None) or (value > self.e_max): self.e_max = value
 	# add()
 
+	def merge(self, other):
+		"""Adds to this sample all the entries collected by another Stats."""
+		w = self.e_w + other.e_w
+		if w != 0:
+			delta = other.e_mean - self.e_mean
+			self.e_m2 += other.e_m2 \
+			  + delta**2 * self.e_w * other.e_w / float(w)
+			self.e_mean += delta * other.e_w / float(w)
+		# if
+		self.e_n += other.e_n
+		self.e_w = w
+		self.e_sum += other.e_sum
+		if (self.e_min is None) or \
+		  ((other.e_min is not None) and (other.e_min < self.e_min)):
+			self.e_min = other.e_min
+		if (self.e_max is None) or \
+		  ((other.e_max is not None) and (other.e_max > self.e_max)):
+			self.e_max = other.e_max
+	# merge()
+
+	def getState(self):
+		"""Returns the content of the accumulators as a list.
+
+		The list can be used to restore the statistics with setState(); it is
+		meant to be serialised (e.g. with JSON).
+		"""
+		return [ self.e_n, self.e_w, self.e_sum, self.e_mean, self.e_m2,
+		  self.e_min, self.e_max ]
+	# getState()
+
+	def setState(self, state):
+		"""Restores the accumulators from a list returned by getState()."""
+		self.e_n, self.e_w, self.e_sum, self.e_mean, self.e_m2, \
+		  self.e_min, self.e_max = state
+	# setState()
+
 	def n(self): return self.e_n
 	def weights(self): return self.e_w
 	def sum(self): return self.e_sum
 	def min(self): return self.e_min
 	def max(self): return self.e_max
-	def sumsq(self): return self.e_sumsq
+	def sumsq(self): return self.e_m2 + self.e_w * self.e_mean**2
 	def average(self):
-		if self.e_w != 0.: return float(self.e_sum)/self.e_w
+		if self.e_w != 0.: return self.e_mean
 		else: return 0.
 	def sqaverage(self):
-		if self.e_w != 0.: return float(self.e_sumsq)/self.e_w
+		if self.e_w != 0.: return float(self.sumsq())/self.e_w
+		else: return 0.
+	def rms2(self):
+		if self.e_w != 0.: return max(0., self.e_m2 / self.e_w)
 		else: return 0.
-	def rms2(self): return self.sqaverage() - self.average()**2
-	def rms(self): return signed_sqrt(self.rms2())
+	def rms(self): return math.sqrt(self.rms2())
 	def stdev(self):
 		if self.e_n < 2: return 0.
 		else: return self.rms() * math.sqrt(float(self.e_n)/(self.e_n-1))
@@ -117,6 +238,376 @@ class Stats:
 # class Stats
 
 
+class QuantileSketchClass(object):
+	"""Approximate quantiles of a sample of positive values, in bounded memory.
+
+	The values are counted in bins with logarithmic boundaries (as in the
+	DDSketch algorithm): the value reported for a quantile() is within a
+	fraction relativeAccuracy of the actual value of that quantile.
+	At most maxBins bins are kept: when there are more, the bins of the lowest
+	values are joined, so that the accuracy of the high tail is preserved.
+	Values not larger than minValue are all counted in a single bin, and they
+	are reported as 0.
+	Sketches with the same parameters can be merged with no loss of accuracy.
+	"""
+	def __init__(self, relativeAccuracy = 0.01, maxBins = 2048, minValue = 1e-9):
+		self.relativeAccuracy = relativeAccuracy
+		self.maxBins = maxBins
+		self.minValue = minValue
+		self.gamma = (1. + relativeAccuracy) / (1. - relativeAccuracy)
+		self.logGamma = math.log(self.gamma)
+		self.clear()
+	# __init__()
+
+	def clear(self):
+		self.bins = {} # bin index -> total weight
+		self.zeroWeight = 0
+		self.totalWeight = 0
+	# clear()
+
+	def add(self, value, weight = 1):
+		"""Adds a value to the sample."""
+		self.totalWeight += weight
+		if value <= self.minValue:
+			self.zeroWeight += weight
+			return
+		# if
+		iBin = int(math.ceil(math.log(value) / self.logGamma))
+		bins = self.bins
+		try: bins[iBin] += weight
+		except KeyError:
+			bins[iBin] = weight
+			if len(bins) > self.maxBins: self.collapse()
+		# try ... except
+	# add()
+
+	def collapse(self):
+		"""Joins the lowest bins so that at most maxBins are left."""
+		binIndices = sorted(self.bins)
+		nExcess = len(binIndices) - self.maxBins
+		if nExcess <= 0: return
+		target = binIndices[nExcess]
+		for iBin in binIndices[:nExcess]:
+			self.bins[target] += self.bins.pop(iBin)
+	# collapse()
+
+	def merge(self, other):
+		"""Adds to this sketch all the values from another one."""
+		if (self.gamma != other.gamma) or (self.minValue != other.minValue):
+			raise RuntimeError("Can't merge quantile sketches with different"
+			  " accuracy or minimum value.")
+		# if
+		bins = self.bins
+		for iBin, weight in other.bins.iteritems():
+			bins[iBin] = bins.get(iBin, 0) + weight
+		self.zeroWeight += other.zeroWeight
+		self.totalWeight += other.totalWeight
+		self.collapse()
+	# merge()
+
+	def quantile(self, q):
+		"""Returns the approximate q quantile (0 <= q <= 1), None if no data."""
+		if self.totalWeight <= 0: return None
+		rank = q * self.totalWeight
+		weight = self.zeroWeight
+		if weight >= rank and weight > 0: return 0.
+		for iBin in sorted(self.bins):
+			weight += self.bins[iBin]
+			if weight >= rank: break
+		# for
+		return 2. * self.gamma ** iBin / (self.gamma + 1.)
+	# quantile()
+
+	def getState(self):
+		"""Returns the content of the sketch as a list (see setState())."""
+		return [ self.relativeAccuracy, self.maxBins, self.minValue,
+		  self.zeroWeight, sorted(self.bins.items()) ]
+	# getState()
+
+	def setState(self, state):
+		"""Restores the content of the sketch from a list from getState()."""
+		relativeAccuracy, maxBins, minValue, zeroWeight, bins = state
+		self.__init__(relativeAccuracy, maxBins, minValue)
+		self.bins = dict((int(iBin), weight) for iBin, weight in bins)
+		self.zeroWeight = zeroWeight
+		self.totalWeight = zeroWeight + sum(self.bins.values())
+	# setState()
+
+# class QuantileSketchClass
+
+
+class SlowestEntriesClass(object):
+	"""Keeps the K entries with the largest times, in bounded memory.
+
+	The entries are ( time, eventKey ) pairs, kept in a min-heap of at most K
+	elements, so that the fastest of the kept entries is replaced in O(log K)
+	when a slower one is added.
+	"""
+	def __init__(self, K = 10):
+		self.K = K
+		self.heap = []
+	# __init__()
+
+	def add(self, time, eventKey):
+		"""Adds an entry, if it is among the K slowest so far."""
+		if len(self.heap) < self.K:
+			heapq.heappush(self.heap, ( time, eventKey ))
+		elif time > self.heap[0][0]:
+			heapq.heapreplace(self.heap, ( time, eventKey ))
+	# add()
+
+	def clear(self): self.heap = []
+
+	def merge(self, other):
+		"""Adds all the entries kept by another object."""
+		for time, eventKey in other.heap: self.add(time, eventKey)
+
+	def entries(self):
+		"""Returns the list of ( time, eventKey ) kept, the slowest first."""
+		return sorted(self.heap, reverse=True)
+
+	def getState(self):
+		"""Returns the content as a list (see setState())."""
+		return [ self.K,
+		  [ [ time, list(eventKey) ] for time, eventKey in self.heap ] ]
+	# getState()
+
+	def setState(self, state):
+		"""Restores the content from a list from getState()."""
+		self.K, entries = state
+		self.heap = [ ( time, EventKeyClass(eventKey) ) for time, eventKey in entries ]
+		heapq.heapify(self.heap)
+	# setState()
+
+# class SlowestEntriesClass
+
+
+class MemoryStatsClass(object):
+	"""Memory usage statistics of a module (or of the whole events).
+
+	The increments of virtual memory size (vsize) and of resident set size
+	(rss) in each event, in MB, are accumulated in Stats objects, and the event
+	with the largest increment of resident set size is kept (maxRSSEvent).
+	When the absolute resident set size is known too, its peak value (peakRSS)
+	is kept with the event it was reached in (peakEvent).
+	"""
+	def __init__(self):
+		self.vsize = Stats()
+		self.rss = Stats()
+		self.maxRSSEvent = None
+		self.peakRSS = None
+		self.peakEvent = None
+	# __init__()
+
+	def add(self, eventKey, deltaVsize, deltaRSS, RSS = None):
+		"""Adds the memory usage of one event."""
+		self.vsize.add(deltaVsize)
+		if (self.rss.max() is None) or (deltaRSS > self.rss.max()):
+			self.maxRSSEvent = eventKey
+		self.rss.add(deltaRSS)
+		if RSS is not None: self.addPeak(eventKey, RSS)
+	# add()
+
+	def addPeak(self, eventKey, RSS):
+		"""Records an absolute resident set size, if it is a new peak."""
+		if (self.peakRSS is None) or (RSS > self.peakRSS):
+			self.peakRSS = RSS
+			self.peakEvent = eventKey
+		# if
+	# addPeak()
+
+	def merge(self, other):
+		"""Adds all the information from another object."""
+		if (other.rss.max() is not None) \
+		  and ((self.rss.max() is None) or (other.rss.max() > self.rss.max())):
+			self.maxRSSEvent = other.maxRSSEvent
+		self.vsize.merge(other.vsize)
+		self.rss.merge(other.rss)
+		if other.peakRSS is not None: self.addPeak(other.peakEvent, other.peakRSS)
+	# merge()
+
+	def getState(self):
+		"""Returns the content as a list (see setState())."""
+		def EventState(eventKey):
+			return None if eventKey is None else list(eventKey)
+		return [ self.vsize.getState(), self.rss.getState(),
+		  EventState(self.maxRSSEvent), self.peakRSS, EventState(self.peakEvent) ]
+	# getState()
+
+	def setState(self, state):
+		"""Restores the content from a list from getState()."""
+		def RestoreEvent(eventState):
+			return None if eventState is None else EventKeyClass(eventState)
+		vsizeState, rssState, maxRSSEvent, self.peakRSS, peakEvent = state
+		self.vsize.setState(vsizeState)
+		self.rss.setState(rssState)
+		self.maxRSSEvent = RestoreEvent(maxRSSEvent)
+		self.peakEvent = RestoreEvent(peakEvent)
+	# setState()
+
+	def FormatAsList(self):
+		"""Returns a list of strings with average and extreme memory usage."""
+		if self.rss.n() == 0: output = [ "", "", "", "" ]
+		else:
+			output = [
+			  "VSize %+g MB" % self.vsize.average(),
+			  "RSS %+g MB" % self.rss.average(),
+			  "(max %+g MB" % self.rss.max(), "in %s)" % str(self.maxRSSEvent),
+			  ]
+		# if ... else
+		if self.peakRSS is not None:
+			output.extend([ "peak RSS %g MB" % self.peakRSS,
+			  "in %s" % str(self.peakEvent) ])
+		return output
+	# FormatAsList()
+
+# class MemoryStatsClass
+
+
+class ConcurrencyStatsClass(object):
+	"""Information about the concurrent processing of events.
+
+	It counts the events processed by each schedule and by each thread (when
+	the log reports them), and keeps the largest number of events seen being
+	processed at the same time (maxOpenEvents).
+	"""
+	def __init__(self):
+		self.schedules = {}
+		self.threads = {}
+		self.maxOpenEvents = 0
+	# __init__()
+
+	def addEvent(self, schedule = None, thread = None):
+		"""Counts an event processed in the specified schedule and thread."""
+		if schedule is not None:
+			self.schedules[schedule] = self.schedules.get(schedule, 0) + 1
+		if thread is not None:
+			self.threads[thread] = self.threads.get(thread, 0) + 1
+	# addEvent()
+
+	def observeOpenEvents(self, nOpenEvents):
+		"""Records the number of events currently being processed."""
+		if nOpenEvents > self.maxOpenEvents: self.maxOpenEvents = nOpenEvents
+
+	def isConcurrent(self):
+		"""Returns whether there is any sign of concurrent processing."""
+		return bool(self.schedules or self.threads or (self.maxOpenEvents > 1))
+
+	def merge(self, other):
+		"""Adds all the information from another object."""
+		for IDs, otherIDs in \
+		  ( ( self.schedules, other.schedules ), ( self.threads, other.threads ) ):
+			for ID, n in otherIDs.items(): IDs[ID] = IDs.get(ID, 0) + n
+		# for
+		self.observeOpenEvents(other.maxOpenEvents)
+	# merge()
+
+	def getState(self):
+		"""Returns the content as a list (see setState())."""
+		return [ sorted(self.schedules.items()), sorted(self.threads.items()),
+		  self.maxOpenEvents ]
+	# getState()
+
+	def setState(self, state):
+		"""Restores the content from a list from getState()."""
+		schedules, threads, self.maxOpenEvents = state
+		self.schedules = dict(map(tuple, schedules))
+		self.threads = dict(map(tuple, threads))
+	# setState()
+
+	def __str__(self):
+		output = "up to %d events processed at the same time" \
+		  % self.maxOpenEvents
+		for name, IDs in ( ( "schedules", self.schedules ),
+		  ( "threads", self.threads ) ):
+			if not IDs: continue
+			output += "; %d %s (%d to %d events each)" \
+			  % (len(IDs), name, min(IDs.values()), max(IDs.values()))
+		# for
+		return output
+	# __str__()
+
+# class ConcurrencyStatsClass
+
+
+class SamplingStatsClass(object):
+	"""Statistics of the times from sampled regions of the input.
+
+	Each region contributes the number of entries n_i and their total time T_i
+	from it (add()); the regions are treated as clusters of a cluster sample,
+	and the mean time is estimated by the ratio R = sum T_i / sum n_i, whose
+	variance is estimated from the sums of the squares and products of n_i and
+	T_i (meanHalfWidth()). The sampled and total sizes of the inputs (bytes)
+	are also recorded (addInput()).
+	"""
+	def __init__(self):
+		self.regions = 0
+		self.sn = 0.
+		self.sT = 0.
+		self.snn = 0.
+		self.sTT = 0.
+		self.snT = 0.
+		self.bytesSampled = 0
+		self.bytesTotal = 0
+	# __init__()
+
+	def add(self, n, T):
+		"""Adds a region with n entries and total time T."""
+		self.regions += 1
+		self.sn += n
+		self.sT += T
+		self.snn += n * n
+		self.sTT += T * T
+		self.snT += n * T
+	# add()
+
+	def addInput(self, bytesSampled, bytesTotal):
+		"""Records the sampled and total size of an input."""
+		self.bytesSampled += bytesSampled
+		self.bytesTotal += bytesTotal
+	# addInput()
+
+	def merge(self, other):
+		"""Adds all the information from another object."""
+		self.regions += other.regions
+		self.sn += other.sn
+		self.sT += other.sT
+		self.snn += other.snn
+		self.sTT += other.sTT
+		self.snT += other.snT
+		self.addInput(other.bytesSampled, other.bytesTotal)
+	# merge()
+
+	def meanHalfWidth(self, z = 1.96):
+		"""Returns the half width of the interval on the mean (None if n/a).
+
+		The default z gives a 95% confidence level (normal approximation).
+		At least two regions are needed.
+		"""
+		if (self.regions < 2) or (self.sn <= 0.): return None
+		R = self.sT / self.sn
+		nAverage = self.sn / self.regions
+		residuals = self.sTT - 2. * R * self.snT + R * R * self.snn
+		variance = max(residuals, 0.) \
+		  / (self.regions * (self.regions - 1) * nAverage**2)
+		return z * math.sqrt(variance)
+	# meanHalfWidth()
+
+	def getState(self):
+		"""Returns the content as a list (see setState())."""
+		return [ self.regions, self.sn, self.sT, self.snn, self.sTT, self.snT,
+		  self.bytesSampled, self.bytesTotal ]
+	# getState()
+
+	def setState(self, state):
+		"""Restores the content from a list from getState()."""
+		self.regions, self.sn, self.sT, self.snn, self.sTT, self.snT, \
+		  self.bytesSampled, self.bytesTotal = state
+	# setState()
+
+# class SamplingStatsClass
+
+
 class EventKeyClass(tuple):
 	"""Event identifier: run, subrun and event numbers."""
 	def run(self): return self[0]
@@ -159,7 +650,11 @@ class EntryDataClass(object):
 	# __init__()
 
 	def __getattr__(self, attrName):
-		# we expect this will be called only if no attrName already exists
+		# we expect this will be called only if no attrName already exists;
+		# special names are not looked up in the data, since they are queried
+		# (e.g. by pickle) also when self.data does not exist yet
+		if attrName.startswith('__') or (attrName == 'data'):
+			raise AttributeError(attrName)
 		try: return self.data[attrName]
 		except KeyError: raise AttributeError(attrName)
 	# __getattr__()
@@ -193,6 +688,39 @@ class EntryDataClass(object):
 # class EntryDataClass
 
 
+class EventIndexClass(object):
+	"""Sorted collection of event keys.
+
+	Each event key is assigned a position, in order of first appearance.
+	The index is meant to be shared among the statistics of all the modules of
+	a job, so that the times of each module can be stored in an array where the
+	i-th element refers to the i-th event of the index.
+	"""
+	def __init__(self):
+		self.keys = []
+		self.positions = {}
+	# __init__()
+
+	def index(self, eventKey):
+		"""Returns the position of eventKey, adding the key if not known yet."""
+		try: return self.positions[eventKey]
+		except KeyError:
+			pos = self.positions[eventKey] = len(self.keys)
+			self.keys.append(eventKey)
+			return pos
+		# try ... except
+	# index()
+
+	def find(self, eventKey):
+		"""Returns the position of eventKey, None if not known."""
+		return self.positions.get(eventKey, None)
+
+	def __len__(self): return len(self.keys)
+	def __iter__(self): return iter(self.keys)
+	def __getitem__(self, index): return self.keys[index]
+# class EventIndexClass
+
+
 class TimeModuleStatsClass(Stats):
 	"""Collects statistics about execution time.
 
@@ -204,28 +732,156 @@ class TimeModuleStatsClass(Stats):
 	The order of insertion of the events is also recorded.
 	By default, this does not happen and only statistics are stored.
 
+	The entries are stored in a columnar way: the event keys are recorded in an
+	event index (EventIndexClass), that can be shared with other objects, and
+	the times in an array of floating point numbers, where the i-th element
+	refers to the i-th event in the index. Missing times are stored as NaN.
+	The array is as long as the position of the last event added, and events
+	of the index which were not added have a missing time.
+
 	The sample can be forcibly filled with empty entries. The idea is that one
 	event is added to the sample only when the information about its timing is
 	available. If we are tracking the event keys, we can check if we have all
 	the events and, if some event keys are missing, we can add an empty entry for
 	them so that we have the correct number of enrties in the sample.
 	This is achieved by a call to complete().
-	Note that to keep the order of the events the correct one one should check
-	if the previous event is present or not, and complete() with it, before
-	adding a new event. If the completion is performed after the new event is
-	added, the previous event will be added after the new one, when complete()
-	is actually called.
 	"""
-	def __init__(self, moduleKey, bTrackEntries = False):
+	ReportedQuantiles = (
+	  ( "median", 0.5 ), ( "p90", 0.9 ), ( "p99", 0.99 ), ( "p99.9", 0.999 ),
+	  )
+
+	def __init__(self, moduleKey, bTrackEntries = False, eventIndex = None,
+	  bQuantiles = False, nSlowest = 0):
 		"""Constructor: specifies the module we collect information about.
 
 		If the flag bTrackEntries is true, all the added events are stored singly.
+		The entries are then indexed by eventIndex (a new index if None).
+		If the flag bQuantiles is true, the distribution of the times is also
+		recorded in a QuantileSketchClass, for the quantiles.
+		If nSlowest is positive, the nSlowest entries with the largest time are
+		kept (in a SlowestEntriesClass), even if the entries are not tracked.
 		"""
 		Stats.__init__(self)
 		self.key = moduleKey
-		self.entries = OrderedDict() if bTrackEntries else None
+		if bTrackEntries:
+			self.eventIndex \
+			  = EventIndexClass() if eventIndex is None else eventIndex
+			self.times = array.array('d')
+		else:
+			self.eventIndex = None
+			self.times = None
+		# if ... else
+		self.quantiles = QuantileSketchClass() if bQuantiles else None
+		self.slowest = SlowestEntriesClass(nSlowest) if nSlowest > 0 else None
+		self.memory = None
+		self.concurrency = None
+		self.sampling = None
 	# __init__()
 
+	def hasMemory(self):
+		"""Returns whether there is information about memory usage."""
+		return self.memory is not None
+
+	def mergeMemory(self, memory):
+		"""Adds the memory usage information from a MemoryStatsClass."""
+		if self.memory is None: self.memory = MemoryStatsClass()
+		self.memory.merge(memory)
+	# mergeMemory()
+
+	def mergeConcurrency(self, concurrency):
+		"""Adds the information from a ConcurrencyStatsClass."""
+		if self.concurrency is None: self.concurrency = ConcurrencyStatsClass()
+		self.concurrency.merge(concurrency)
+	# mergeConcurrency()
+
+	def mergeSampling(self, sampling):
+		"""Adds the information from a SamplingStatsClass."""
+		if self.sampling is None: self.sampling = SamplingStatsClass()
+		self.sampling.merge(sampling)
+	# mergeSampling()
+
+	def addSampledRegion(self, n, T):
+		"""Records that n entries with total time T came from a sampled region."""
+		if self.sampling is None: self.sampling = SamplingStatsClass()
+		self.sampling.add(n, T)
+	# addSampledRegion()
+
+	def meanHalfWidth(self, z = 1.96):
+		"""Returns the half width of the confidence interval on the average.
+
+		If the statistics come from sampled regions of the input, the interval
+		is from the spread among the regions (see SamplingStatsClass), otherwise
+		from the spread of the single times. None is returned if not available.
+		"""
+		if self.sampling is not None:
+			halfWidth = self.sampling.meanHalfWidth(z)
+			if halfWidth is not None: return halfWidth
+		# if
+		if self.n() < 2: return None
+		return z * self.stdev() / math.sqrt(self.n())
+	# meanHalfWidth()
+
+	def mergeInfo(self, other):
+		"""Merges the information not from the times (memory, concurrency...)."""
+		if other.memory is not None: self.mergeMemory(other.memory)
+		if other.concurrency is not None:
+			self.mergeConcurrency(other.concurrency)
+		if other.sampling is not None: self.mergeSampling(other.sampling)
+	# mergeInfo()
+
+	def nSlowest(self):
+		"""Returns the number of slowest entries kept (0 if none)."""
+		return 0 if self.slowest is None else self.slowest.K
+
+	def getSlowest(self):
+		"""Returns the slowest entries as ( time, eventKey ), the slowest first."""
+		return [] if self.slowest is None else self.slowest.entries()
+
+	def isTrackingQuantiles(self):
+		"""Returns whether the quantiles of the times are available."""
+		return self.quantiles is not None
+	# isTrackingQuantiles()
+
+	def quantile(self, q):
+		"""Returns the approximate q quantile of the times (None if n/a)."""
+		return None if self.quantiles is None else self.quantiles.quantile(q)
+	# quantile()
+
+	def isTrackingEntries(self):
+		"""Returns whether all the added events are stored singly."""
+		return self.times is not None
+	# isTrackingEntries()
+
+	def fillTo(self, nEntries):
+		"""Extends the entries to nEntries with missing times."""
+		if nEntries > len(self.times):
+			self.times.extend(MissingTimes(nEntries - len(self.times)))
+	# fillTo()
+
+	def addTime(self, eventKey, time):
+		"""Adds a time to the sample.
+
+		If the time is None, the event information is considered to be missing.
+		If the entries are tracked and eventKey is already present with a time,
+		or time is None and eventKey is already present at all, the addition is
+		ignored and False is returned. Otherwise, True is returned.
+		"""
+		if self.times is not None:
+			pos = self.eventIndex.index(eventKey)
+			if pos < len(self.times):
+				if (time is None) or not math.isnan(self.times[pos]): return False
+			else:
+				self.fillTo(pos + 1)
+			if time is not None: self.times[pos] = time
+		# if
+		if time is not None:
+			Stats.add(self, time)
+			if self.quantiles is not None: self.quantiles.add(time)
+			if self.slowest is not None: self.slowest.add(time, eventKey)
+		# if
+		return True
+	# addTime()
+
 	def add(self, data):
 		"""Adds a time to the sample.
 
@@ -234,45 +890,144 @@ class TimeModuleStatsClass(Stats):
 		Its time() is used as the value of the statistic; if the entry has no time
 		(None), the event information is considered to be missing.
 		"""
-		if self.entries is not None:
-			if data.eventKey in self.entries: return False
-			self.entries[data.eventKey] = data
-		# if
-		if not data.isMissing(): Stats.add(self, data.time())
-		return True
+		return self.addTime(data.eventKey, data.time())
 	# add()
 
 	def complete(self, eventKeys):
 		"""Makes sure that an entry for each of the keys in eventKeys is present.
 
 		For event keys already known, nothing happens. For new event keys, an
-		empty entry is added at the end of the list, with no time information.
-		Note that the events are added at the bottom of the list, in the relative
-		order in eventKeys.
+		empty entry is added, with no time information, in the position of the
+		event in the index.
+
+		Only the last of the eventKeys is actually considered, unless there are
+		no more than one entry; in that case, completeAll() is used.
 
 		If we are not tracking the events, nothing happens ever.
 		"""
-		if self.entries is None: return 0
-		if (len(self.entries) > 1): eventKeys = eventKeys[-1:]
-		res = 0
-		for eventKey in eventKeys:
-			if self.add(EntryDataClass(eventKey)): res += 1
-		return res
+		if self.times is None: return 0
+		if (len(self.times) > 1): eventKeys = eventKeys[-1:]
+		return self.completeAll(eventKeys)
 	# complete()
 
+	def completeAll(self, eventKeys):
+		"""Adds an empty entry for each of the unknown keys in eventKeys.
+
+		Unlike complete(), all the event keys are considered.
+		If we are not tracking the events, nothing happens ever.
+		"""
+		if self.times is None: return 0
+		nEntries = len(self.times)
+		for eventKey in eventKeys:
+			self.fillTo(self.eventIndex.index(eventKey) + 1)
+		return len(self.times) - nEntries
+	# completeAll()
+
+	def merge(self, other):
+		"""Adds to this sample all the entries from another TimeModuleStatsClass.
+
+		If both objects are tracking the events, the entries of other are added
+		one by one, in their order, and the ones of events already known are
+		ignored, as add() would do. Otherwise, only the statistics are merged.
+		The memory usage and concurrency information is always merged.
+		If this object is still empty and its index starts with the same events
+		as the one of other, the entries are just copied.
+		"""
+		if (self.times is None) or (other.times is None):
+			Stats.merge(self, other)
+			self.mergeExtras(other)
+			return
+		# if
+		if (len(self.times) == 0) and (self.e_w == 0):
+			nEntries = len(other.times)
+			if len(self.eventIndex) == 0:
+				for eventKey in other.eventIndex.keys[:nEntries]:
+					self.eventIndex.index(eventKey)
+			# if
+			if self.eventIndex.keys[:nEntries] == other.eventIndex.keys[:nEntries]:
+				self.times = array.array('d', other.times)
+				Stats.setState(self, Stats.getState(other))
+				self.mergeExtras(other)
+				return
+			# if
+		# if empty
+		for eventKey, time in itertools.izip(other.eventIndex, other.times):
+			self.addTime(eventKey, None if math.isnan(time) else time)
+		self.mergeInfo(other)
+	# merge()
+
+	def mergeExtras(self, other):
+		"""Merges the quantiles and slowest entries (where both have them).
+
+		The memory usage and concurrency information is merged whenever other
+		has it.
+		"""
+		if (self.quantiles is not None) and (other.quantiles is not None):
+			self.quantiles.merge(other.quantiles)
+		if (self.slowest is not None) and (other.slowest is not None):
+			self.slowest.merge(other.slowest)
+		self.mergeInfo(other)
+	# mergeExtras()
+
+	def recomputeStats(self, first = 0, skip = ()):
+		"""Recomputes the statistics from the entries, starting from first.
+
+		The statistics of the entries before the first one are discarded, and so
+		are the ones of the entries in the skip ranges (pairs of positions, begin
+		and end, as in slices); the statistics not coming from entries (e.g.
+		merged from a partial aggregate) are lost (memory usage and concurrency
+		information are kept). Nothing happens if the entries are not tracked.
+		"""
+		if self.times is None: return
+		Stats.clear(self)
+		AllTimes = self.times
+		if skip:
+			AllTimes = array.array('d', self.times)
+			for begin, end in skip:
+				end = min(end, len(AllTimes))
+				if end > begin: AllTimes[begin:end] = MissingTimes(end - begin)
+			# for
+		# if
+		if self.quantiles is not None:
+			self.quantiles.clear()
+			for time in itertools.islice(AllTimes, first, None):
+				if not math.isnan(time): self.quantiles.add(time)
+		# if
+		if self.slowest is not None:
+			self.slowest.clear()
+			for pos, time in enumerate(itertools.islice(AllTimes, first, None), first):
+				if not math.isnan(time): self.slowest.add(time, self.eventIndex[pos])
+		# if
+		for time in itertools.islice(AllTimes, first, None):
+			if not math.isnan(time): Stats.add(self, time)
+	# recomputeStats()
+
 	def getEvents(self):
 		"""Returns the list of known event keys (if tracking the events)."""
-		return [] if self.entries is None else self.entries.keys()
+		if self.times is None: return []
+		return self.eventIndex.keys[:len(self.times)]
 	# getEvents()
 
+	def getTimes(self):
+		"""Returns the array of times, NaN when missing (if tracking the events)."""
+		return self.times
+	# getTimes()
+
 	def getEntries(self):
 		"""Returns a list of the event statistics (if tracking the events)."""
-		return [] if self.entries is None else self.entries.values()
+		if self.times is None: return []
+		moduleData = { 'module': self.key } \
+		  if isinstance(self.key, ModuleKeyClass) else {}
+		return [
+		  EntryDataClass(eventKey,
+		    time=(None if math.isnan(time) else time), **moduleData)
+		  for eventKey, time in itertools.izip(self.eventIndex, self.times)
+		  ]
 	# getEntries()
 
 	def nEntries(self):
 		"""Returns the number of recorded entries (throws if not tracking)."""
-		return len(self.entries)
+		return len(self.times)
 	# nEntries()
 
 	def nEvents(self):
@@ -288,12 +1043,62 @@ class TimeModuleStatsClass(Stats):
 		return self.nEntries() > self.nEvents()
 	# hasEmptyData()
 
+	def getState(self):
+		"""Returns the statistics (not the single entries) as a list."""
+		return Stats.getState(self)
+	# getState()
+
+	def getExtraState(self):
+		"""Returns the content of quantiles, slowest entries and memory usage."""
+		state = OrderedDict()
+		if self.quantiles is not None:
+			state['quantiles'] = self.quantiles.getState()
+		if self.slowest is not None: state['slowest'] = self.slowest.getState()
+		if self.memory is not None: state['memory'] = self.memory.getState()
+		if self.concurrency is not None:
+			state['concurrency'] = self.concurrency.getState()
+		if self.sampling is not None: state['sampling'] = self.sampling.getState()
+		return state
+	# getExtraState()
+
+	def setExtraState(self, state):
+		"""Restores quantiles, slowest entries and memory from getExtraState().
+
+		For backward compatibility, state can also be the state of the quantile
+		sketch alone; if None, nothing happens.
+		"""
+		if state is None: return
+		if not isinstance(state, dict): state = { 'quantiles': state }
+		if 'quantiles' in state:
+			self.quantiles = QuantileSketchClass()
+			self.quantiles.setState(state['quantiles'])
+		# if
+		if 'slowest' in state:
+			self.slowest = SlowestEntriesClass()
+			self.slowest.setState(state['slowest'])
+		# if
+		if 'memory' in state:
+			self.memory = MemoryStatsClass()
+			self.memory.setState(state['memory'])
+		# if
+		if 'concurrency' in state:
+			self.concurrency = ConcurrencyStatsClass()
+			self.concurrency.setState(state['concurrency'])
+		# if
+		if 'sampling' in state:
+			self.sampling = SamplingStatsClass()
+			self.sampling.setState(state['sampling'])
+		# if
+	# setExtraState()
+
 	def FormatStatsAsList(self, format_ = None):
 		"""Prints the collected information into a list.
 
 		The list of strings includes a statistics ID (based on the key), an
 		average time, a relative RMS in percent, the total time and the recorded
 		the number of events with timing information and the timing extrema.
+		If the quantiles are tracked, the median and the 90%, 99% and 99.9%
+		quantiles follow.
 
 		The format dictionary can contain format directives, for future use (no
 		format directive is currently supported).
@@ -303,13 +1108,20 @@ class TimeModuleStatsClass(Stats):
 		if (self.n() == 0) or (self.sum() == 0.):
 			return [ name, "n/a" ]
 		RMS = self.rms() if (self.n() != 0) else 0.
-		return [
+		output = [
 			name,
 			"%g\"" % self.average(),
 			"(RMS %4.1f%%)" % (RMS / self.average() * 100.),
 			"total %g\"" % self.sum(), "(%d events:" % self.n(),
 			"%g" % self.min(), "- %g)" % self.max(),
 			]
+		if self.quantiles is not None:
+			for label, q in self.ReportedQuantiles:
+				value = self.quantile(q)
+				if value is not None: output.append("%s %g\"" % (label, value))
+			# for
+		# if
+		return output
 	# FormatStatsAsList()
 
 	def FormatTimesAsList(self, format_ = {}):
@@ -330,13 +1142,11 @@ class TimeModuleStatsClass(Stats):
 
 		n = min(self.nEntries(), format_.get('max_events', self.nEntries()))
 		format_str = format_.get('format', '%g')
-		if not self.entries: return [ name, ] + [ "n/a", ] * n
 
 		output = [ name, ]
-		for i, entry in enumerate(self.entries.values()):
-			if i >= n: break
-			if entry is None or entry.isMissing(): output.append("n/a")
-			else: output.append(format_str % entry.time())
+		for time in itertools.islice(self.times, n):
+			if math.isnan(time): output.append("n/a")
+			else: output.append(format_str % time)
 		# for
 		return output
 	# FormatTimesAsList()
@@ -367,6 +1177,36 @@ class JobStatsClass:
 		return min(map(Stats.n, self.moduleList))
 	# MinEvents()
 
+	def merge(self, other, knownEvents = [], newEvents = [], eventIndex = None):
+		"""Adds to this object the statistics from another JobStatsClass.
+
+		The modules are merged in the order they appear in other; the ones not
+		known yet are added at the end of the list, as if the information in
+		other had been parsed after the one already present here.
+		If the events are tracked, the modules new in other are completed with
+		the knownEvents (the events collected before other), and the modules
+		which are not in other are completed with the newEvents (the events
+		collected in other). The modules new in other which track the events use
+		eventIndex as event index.
+		"""
+		for stats in other:
+			try:
+				myStats = self.moduleStats[stats.key]
+			except KeyError:
+				myStats = TimeModuleStatsClass(stats.key,
+				  bTrackEntries=stats.isTrackingEntries(), eventIndex=eventIndex,
+				  bQuantiles=stats.isTrackingQuantiles(), nSlowest=stats.nSlowest())
+				myStats.completeAll(knownEvents)
+				self[stats.key] = myStats
+			# try ... except
+			myStats.merge(stats)
+		# for
+		for myStats in self.moduleList:
+			if myStats.key in other.moduleStats: continue
+			myStats.completeAll(newEvents)
+		# for
+	# merge()
+
 
 	# replicate some list/dictionary interface
 	def __iter__(self): return iter(self.moduleList)
@@ -413,6 +1253,11 @@ class FormatError(RuntimeError):
 	# __init__()
 # class FormatError
 
+class NoMoreInput(Exception):
+	"""Signals that no more input should be parsed (e.g. event limit reached)."""
+	pass
+# class NoMoreInput
+
 def ParseTimeModuleLine(line):
 	"""Parses a line to extract module timing information.
 
@@ -423,6 +1268,12 @@ def ParseTimeModuleLine(line):
 	Format 1 (20140226):
 
 	TimeModule> run: 1 subRun: 0 event: 10 beziertrackercc BezierTrackerModule 0.231838
+
+	Format 2 (multi-threaded jobs; schedule and thread are optional):
+
+	TimeModule> run: 1 subRun: 0 event: 10 schedule: 2 thread: 5 beziertrackercc BezierTrackerModule 0.231838
+
+	Schedule and thread numbers, if present, are stored in the entry.
 	"""
 	Tokens = line.split()
 
@@ -430,11 +1281,12 @@ def ParseTimeModuleLine(line):
 	EventKey = None
 	time = None
 
-	# Format 1 parsing:
+	# Format 1 and 2 parsing:
 	try:
 		EventKey = EventKeyClass((int(Tokens[2]), int(Tokens[4]), int(Tokens[6])))
-		ModuleKey = ModuleKeyClass((Tokens[7], Tokens[8]))
-		time=float(Tokens[9])
+		IDs, iToken = ParseConcurrencyTokens(Tokens, 7)
+		ModuleKey = ModuleKeyClass((Tokens[iToken], Tokens[iToken+1]))
+		time=float(Tokens[iToken+2])
 	except Exception, e:
 		raise FormatError(
 		  "TimeModule format not recognized: '%s' (%s)" % (line, str(e)),
@@ -442,21 +1294,37 @@ def ParseTimeModuleLine(line):
 		  )
 	# try ... except
 
-	# validation of Format 1
+	# validation of Format 1 and 2
 	if (Tokens[0] != 'TimeModule>') \
 	  or (Tokens[1] != 'run:') \
 	  or (Tokens[3] != 'subRun:') \
 	  or (Tokens[5] != 'event:') \
-	  or (len(Tokens) != 10) \
+	  or (len(Tokens) != iToken + 3) \
 	  :
 		raise FormatError \
 		  ("TimeModule format not recognized: '%s'" % line, type="Module")
 	# if
 
-	return EntryDataClass(EventKey, module=ModuleKey, time=time)
+	return EntryDataClass(EventKey, module=ModuleKey, time=time, **IDs)
 # ParseTimeModuleLine()
 
 
+def ParseConcurrencyTokens(Tokens, iToken):
+	"""Parses the optional schedule and thread numbers from Tokens[iToken:].
+
+	It returns a dictionary with the numbers found (keys 'schedule' and
+	'thread') and the index of the first token after them.
+	"""
+	IDs = {}
+	for name in ( 'schedule', 'thread' ):
+		if Tokens[iToken] != name + ':': continue
+		IDs[name] = int(Tokens[iToken+1])
+		iToken += 2
+	# for
+	return IDs, iToken
+# ParseConcurrencyTokens()
+
+
 def ParseTimeEventLine(line):
 	"""Parses a line to extract event timing information.
 
@@ -467,6 +1335,10 @@ def ParseTimeEventLine(line):
 	Format 1 (20140226):
 
 	TimeEvent> run: 1 subRun: 0 event: 10 0.231838
+
+	Format 2 (multi-threaded jobs; schedule and thread are optional):
+
+	TimeEvent> run: 1 subRun: 0 event: 10 schedule: 2 thread: 5 0.231838
 	"""
 	Tokens = line.split()
 
@@ -474,7 +1346,8 @@ def ParseTimeEventLine(line):
 	time = None
 	try:
 		EventKey = EventKeyClass((int(Tokens[2]), int(Tokens[4]), int(Tokens[6])))
-		time = float(Tokens[7])
+		IDs, iToken = ParseConcurrencyTokens(Tokens, 7)
+		time = float(Tokens[iToken])
 	except Exception, e:
 		raise FormatError(
 		  "TimeEvent format not recognized: '%s' (%s)" % (line, str(e)),
@@ -486,28 +1359,1162 @@ def ParseTimeEventLine(line):
 	  or (Tokens[1] != 'run:') \
 	  or (Tokens[3] != 'subRun:') \
 	  or (Tokens[5] != 'event:') \
-	  or (len(Tokens) != 8) \
+	  or (len(Tokens) != iToken + 1) \
 	  :
 		raise FormatError("TimeEvent format not recognized: '%s'" % line,
 		  type="Event", event=EventKey)
 	# if
 
-	return EntryDataClass(EventKey, time=time)
+	return EntryDataClass(EventKey, time=time, **IDs)
 # ParseTimeEventLine()
 
 
+#
+# input decompression
+#
+class PipeInputFileClass(object):
+	"""Read-only file-like object with the output of a command on a file.
+
+	The command is run in a separate process, and it works in parallel with
+	the reading. If the command fails, IOError is raised at the end of input.
+	"""
+	BufferSize = 1 << 20
+
+	def __init__(self, command, InputFilePath):
+		self.name = InputFilePath
+		self.command = command + [ InputFilePath ]
+		self.process = subprocess.Popen(self.command,
+		  stdin=open(os.devnull, 'r'), stdout=subprocess.PIPE,
+		  bufsize=self.BufferSize, close_fds=True)
+	# __init__()
+
+	def read(self, size = -1):
+		data = self.process.stdout.read(size)
+		if not data or (size < 0): self.checkExit()
+		return data
+	# read()
+
+	def __iter__(self):
+		for line in self.process.stdout: yield line
+		self.checkExit()
+	# __iter__()
+
+	def checkExit(self):
+		"""Waits for the end of the command, and raises IOError if it failed."""
+		if self.process.wait() != 0:
+			raise IOError("Command '%s' failed with exit code %d"
+			  % (" ".join(self.command), self.process.returncode))
+		# if
+	# checkExit()
+
+	def close(self):
+		self.process.stdout.close()
+		if self.process.poll() is None: # did not read to the end
+			try: self.process.terminate()
+			except OSError: pass
+		# if
+		self.process.wait()
+	# close()
+
+	def __enter__(self): return self
+	def __exit__(self, excType, excValue, traceback): self.close()
+
+# class PipeInputFileClass
+
+
+class StreamDecompressorFileClass(object):
+	"""Read-only file-like object decompressing a file with a decompressor.
+
+	The decompressor objects (e.g. bz2.BZ2Decompressor) are created by calling
+	makeDecompressor(); when a compressed stream ends and more data follows,
+	a new decompressor is started for it, so that multi-stream files (like the
+	ones from parallel compressors) are read completely.
+	"""
+	BufferSize = 1 << 20
+
+	def __init__(self, InputFilePath, makeDecompressor):
+		self.name = InputFilePath
+		self.makeDecompressor = makeDecompressor
+		self.rawFile = open(InputFilePath, 'rb')
+		self.decompressor = makeDecompressor()
+		self.buffer = ''
+	# __init__()
+
+	def decompressNext(self):
+		"""Returns the next chunk of decompressed data, '' at the end of input."""
+		while True:
+			data = self.rawFile.read(self.BufferSize)
+			if not data: return ''
+			output = []
+			while data:
+				output.append(self.decompressor.decompress(data))
+				data = getattr(self.decompressor, 'unused_data', '')
+				if data: self.decompressor = self.makeDecompressor()
+			# while
+			output = ''.join(output)
+			if output: return output
+		# while
+	# decompressNext()
+
+	def read(self, size = -1):
+		chunks = [ self.buffer ]
+		nBytes = len(self.buffer)
+		while (size < 0) or (nBytes < size):
+			data = self.decompressNext()
+			if not data: break
+			chunks.append(data)
+			nBytes += len(data)
+		# while
+		data = ''.join(chunks)
+		if (size < 0) or (len(data) <= size):
+			self.buffer = ''
+			return data
+		# if
+		self.buffer = data[size:]
+		return data[:size]
+	# read()
+
+	def __iter__(self):
+		leftover = ''
+		while True:
+			data = self.read(self.BufferSize)
+			if not data: break
+			lines = (leftover + data).split('\n')
+			leftover = lines.pop()
+			for line in lines: yield line + '\n'
+		# while
+		if leftover: yield leftover
+	# __iter__()
+
+	def close(self): self.rawFile.close()
+
+	def __enter__(self): return self
+	def __exit__(self, excType, excValue, traceback): self.close()
+
+# class StreamDecompressorFileClass
+
+
+def FindCommand(name, _cache = {}):
+	"""Returns the full path of an executable in the PATH (None if not found)."""
+	try: return _cache[name]
+	except KeyError: pass
+	_cache[name] = None
+	for Dir in os.environ.get('PATH', '').split(os.pathsep):
+		Path = os.path.join(Dir, name)
+		if os.path.isfile(Path) and os.access(Path, os.X_OK):
+			_cache[name] = Path
+			break
+		# if
+	# for
+	return _cache[name]
+# FindCommand()
+
+
+class DecompressionError(IOError):
+	"""Signals that no decompressor is available for a compressed input."""
+	pass
+# class DecompressionError
+
+
+class DecompressorClass(object):
+	"""Description of a compression format and of the ways to decompress it.
+
+	The format is recognised by the magic bytes at the beginning of a file.
+	Decompression is preferably performed by the first available of the
+	external commands (which run in parallel with the parsing, and may be
+	themselves parallel), falling back to the Python opener.
+	"""
+	def __init__(self, name, magic, commands = [], opener = None):
+		self.name = name
+		self.magic = magic
+		self.commands = commands
+		self.opener = opener
+	# __init__()
+
+	def open(self, InputFilePath):
+		"""Returns a read-only file-like object with decompressed content."""
+		for command in self.commands:
+			Path = FindCommand(command[0])
+			if Path: return PipeInputFileClass([ Path ] + command[1:], InputFilePath)
+		# for
+		if self.opener: return self.opener(InputFilePath)
+		raise DecompressionError("cannot decompress '%s': %s not available"
+		  % (InputFilePath, " or ".join(command[0] for command in self.commands)))
+	# open()
+
+# class DecompressorClass
+
+
+Decompressors = [
+	DecompressorClass('gzip', '\x1f\x8b',
+	  commands=[ [ 'pigz', '-dc' ], [ 'gzip', '-dc' ] ],
+	  opener=lambda Path: gzip.GzipFile(Path, 'rb')
+	  ),
+	DecompressorClass('bzip2', 'BZh',
+	  commands=[ [ 'lbzip2', '-dc' ], [ 'pbzip2', '-dc' ], [ 'bzip2', '-dc' ] ],
+	  opener=(lambda Path:
+	    StreamDecompressorFileClass(Path, bz2.BZ2Decompressor)) if bz2 else None
+	  ),
+	DecompressorClass('xz', '\xfd7zXZ\x00',
+	  commands=[ [ 'xz', '-dc', '-T0' ] ],
+	  opener=(lambda Path:
+	    StreamDecompressorFileClass(Path, lzma.LZMADecompressor)) if lzma else None
+	  ),
+	DecompressorClass('zstd', '\x28\xb5\x2f\xfd',
+	  commands=[ [ 'zstd', '-dcq' ] ],
+	  opener=(lambda Path: StreamDecompressorFileClass(Path,
+	    lambda: zstandard.ZstdDecompressor().decompressobj()))
+	    if zstandard else None
+	  ),
+	DecompressorClass('lz4', '\x04\x22\x4d\x18',
+	  commands=[ [ 'lz4', '-dc' ] ],
+	  opener=(lambda Path: lz4.frame.open(Path, 'rb')) if lz4 else None
+	  ),
+	] # Decompressors
+
+
+def DetectCompression(Path):
+	"""Returns the DecompressorClass for the format of the file, None if plain."""
+	with open(Path, 'rb') as InputFile: Header = InputFile.read(8)
+	for Decompressor in Decompressors:
+		if Header.startswith(Decompressor.magic): return Decompressor
+	return None
+# DetectCompression()
+
+
 def OPEN(Path, mode = 'r'):
 	"""Open a file (possibly a compressed one).
 
-	Support for modes other than 'r' (read-only) are questionable.
+	In read-only mode, the compression format is detected from the content of
+	the file, and the decompressed content is returned by a suitable
+	file-like object (see Decompressors); a plain file object is returned for
+	uncompressed files.
+	Support for modes other than 'r' (read-only) are questionable: for them, the
+	compression is chosen by the file name suffix, and only gzip and bzip2 are
+	supported.
 	"""
+	if mode in ( 'r', 'rb' ):
+		Decompressor = DetectCompression(Path)
+		if Decompressor is None: return open(Path, mode)
+		return Decompressor.open(Path)
+	# if read-only
 	if Path.endswith('.bz2'): return bz2.BZ2File(Path, mode)
 	if Path.endswith('.gz'): return gzip.GzipFile(Path, mode)
 	return open(Path, mode)
 # OPEN()
 
 
-def ParseInputFile(InputFilePath, AllStats, EventStats, options):
+def MapInputFile(InputFile):
+	"""Returns a read-only memory map of an uncompressed file, None if not possible.
+
+	InputFile is a file object, as returned by OPEN().
+	"""
+	if type(InputFile) is not file: return None
+	try:
+		if os.fstat(InputFile.fileno()).st_size == 0: return None
+		return mmap.mmap(InputFile.fileno(), 0, access=mmap.ACCESS_READ)
+	except (EnvironmentError, ValueError): return None
+# MapInputFile()
+
+
+def ReportFormatError(e, InputFilePath, iLine):
+	"""Prints on screen the information of a FormatError at line iLine (0-based)."""
+	msg = "Format error on '%s'@%d" % (InputFilePath, iLine + 1)
+	try: msg += " (%s)" % str(e.data['type'])
+	except KeyError: pass
+	try: msg += ", for event " + str(e.data['event'])
+	except KeyError: pass
+	try: msg += ", module " + str(e.data['module'])
+	except KeyError: pass
+	print >>sys.stderr, msg
+# ReportFormatError()
+
+
+@contextlib.contextmanager
+def GarbageCollectionPaused():
+	"""Context where the cyclic garbage collector is disabled.
+
+	Creating many objects (as the records of a block of the log) otherwise
+	triggers collection passes over all the objects alive, which can take
+	longer than the creation itself. The objects created in the context must
+	not form reference cycles.
+	"""
+	bEnabled = gc.isenabled()
+	gc.disable()
+	try: yield
+	finally:
+		if bEnabled: gc.enable()
+	# try ... finally
+# GarbageCollectionPaused()
+
+
+#
+# self-profiling
+#
+def ProcessCPUTime():
+	"""Returns the CPU time (user and system) used by this process so far."""
+	Times = os.times()
+	return Times[0] + Times[1]
+# ProcessCPUTime()
+
+
+def PeakMemoryMB(who = resource.RUSAGE_SELF):
+	"""Returns the peak resident memory in megabytes (of self or children)."""
+	return resource.getrusage(who).ru_maxrss / 1024.
+
+
+class ProfileRecordClass(object):
+	"""Wall and CPU time spent in each processing phase, and input counters.
+
+	The phases are: reading (including decompression), scanning of the
+	timing records, aggregation into the statistics (including the completion
+	of the events), merging of statistics from different inputs, and report.
+	The counters are the bytes read, the lines scanned, the timing records
+	accepted and the ones rejected because of format errors.
+	The peak memory is the one of the process which did the work, and it
+	includes all the work that process did before.
+	"""
+	Phases = ( 'read', 'scan', 'aggregate', 'merge', 'report' )
+	Counters = ( 'bytesRead', 'lines', 'records', 'rejected' )
+
+	def __init__(self, name):
+		self.name = name
+		self.wall = OrderedDict.fromkeys(self.Phases, 0.)
+		self.cpu = OrderedDict.fromkeys(self.Phases, 0.)
+		self.counters = OrderedDict.fromkeys(self.Counters, 0)
+		self.peakMemory = 0.
+	# __init__()
+
+	def start(self):
+		"""Returns a starting point for stop()."""
+		return time.time(), ProcessCPUTime()
+
+	def stop(self, phase, start):
+		"""Adds to phase the time elapsed since start (from start())."""
+		self.wall[phase] += time.time() - start[0]
+		self.cpu[phase] += ProcessCPUTime() - start[1]
+	# stop()
+
+	@contextlib.contextmanager
+	def timer(self, phase):
+		"""Context manager adding the time spent in its block to phase."""
+		start = self.start()
+		try: yield
+		finally: self.stop(phase, start)
+	# timer()
+
+	def timeIterator(self, phase, iterable):
+		"""Yields the items of iterable, adding the time to get them to phase."""
+		iterator = iter(iterable)
+		while True:
+			start = self.start()
+			try: item = next(iterator)
+			except StopIteration: break
+			finally: self.stop(phase, start)
+			yield item
+		# while
+	# timeIterator()
+
+	def count(self, **kargs):
+		"""Increments the specified counters."""
+		for counter, value in kargs.iteritems(): self.counters[counter] += value
+
+	def updatePeakMemory(self):
+		self.peakMemory = max(self.peakMemory, PeakMemoryMB())
+
+	def merge(self, other):
+		"""Adds the times and counters from another record."""
+		for phase in self.Phases:
+			self.wall[phase] += other.wall[phase]
+			self.cpu[phase] += other.cpu[phase]
+		# for
+		for counter in self.Counters: self.counters[counter] += other.counters[counter]
+		self.peakMemory = max(self.peakMemory, other.peakMemory)
+	# merge()
+
+	def toDict(self):
+		"""Returns the content as a dictionary, suitable for JSON."""
+		Data = OrderedDict()
+		Data['name'] = self.name
+		Data.update(self.counters)
+		Data['peakMemoryMB'] = self.peakMemory
+		Data['wall'] = self.wall
+		Data['cpu'] = self.cpu
+		return Data
+	# toDict()
+
+# class ProfileRecordClass
+
+
+class SelfProfileClass(object):
+	"""Collects the profile records of the job and of each input file.
+
+	The phases of the job which are not related to a single input (merging
+	and report) are recorded in the job record; the others, in a record for
+	each input file (see fileProfile()).
+	"""
+	Version = 1
+
+	def __init__(self):
+		self.job = ProfileRecordClass("(job)")
+		self.files = OrderedDict()
+	# __init__()
+
+	def fileProfile(self, InputFilePath):
+		"""Returns the record of the specified input file (created if needed)."""
+		try: return self.files[InputFilePath]
+		except KeyError:
+			Record = self.files[InputFilePath] = ProfileRecordClass(InputFilePath)
+			return Record
+		# try ... except
+	# fileProfile()
+
+	def popFileProfile(self, InputFilePath):
+		"""Removes and returns the record of a file (None if not present)."""
+		return self.files.pop(InputFilePath, None)
+
+	def addFileProfile(self, Record):
+		"""Adds the information of a file record (e.g. from another process)."""
+		if Record is None: return
+		try: self.files[Record.name].merge(Record)
+		except KeyError: self.files[Record.name] = Record
+	# addFileProfile()
+
+	def total(self):
+		"""Returns a record with the sum of all the others."""
+		Total = ProfileRecordClass("(total)")
+		for Record in itertools.chain(self.files.values(), ( self.job, )):
+			Total.merge(Record)
+		return Total
+	# total()
+
+	def toDict(self, **kargs):
+		"""Returns all the records as a dictionary, with kargs added to it."""
+		self.job.updatePeakMemory()
+		Data = OrderedDict()
+		Data['version'] = self.Version
+		Data['timestamp'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+		Data.update(kargs)
+		Data['total'] = self.total().toDict()
+		Data['job'] = self.job.toDict()
+		Data['files'] = [ Record.toDict() for Record in self.files.values() ]
+		Data['peakMemoryMB'] = OrderedDict([
+		  ( 'main', PeakMemoryMB() ),
+		  ( 'children', PeakMemoryMB(resource.RUSAGE_CHILDREN) ),
+		  ])
+		return Data
+	# toDict()
+
+	def report(self, stream = sys.stderr):
+		"""Prints a table with all the records."""
+		self.job.updatePeakMemory()
+		Table = TabularAlignmentClass()
+		Table.AddRow("input", "bytes", "lines", "records", "rejected", "peak MB",
+		  *[ "%s wall/CPU" % phase for phase in ProfileRecordClass.Phases ])
+		for Record in itertools.chain(
+		  self.files.values(), ( self.job, self.total() )
+		  ):
+			Table.AddRow(Record.name,
+			  *([ str(Record.counters[counter]) for counter in Record.Counters ]
+			    + [ "%.1f" % Record.peakMemory ]
+			    + [ "%.3f/%.3f" % (Record.wall[phase], Record.cpu[phase])
+			        for phase in Record.Phases ]
+			  ))
+		# for
+		print >>stream, "Self-profile (times in seconds):"
+		Table.Print(stream)
+		print >>stream, "Peak memory: %.1f MB (main process), %.1f MB (children)" \
+		  % (PeakMemoryMB(), PeakMemoryMB(resource.RUSAGE_CHILDREN))
+	# report()
+
+# class SelfProfileClass
+
+# the profile of this process
+SelfProfile = SelfProfileClass()
+
+
+class LogScannerClass(object):
+	"""Extracts the timing records from an art log.
+
+	Iterating through the scanner yields a tuple (eventKey, moduleKey, time)
+	for each valid TimeModule and TimeEvent line (moduleKey is None for the
+	latter), in the order they appear in the log. Consecutive duplicate lines
+	are skipped. The same records are also available from blocks(), in lists
+	(one per block of input).
+	Format errors are reported on screen and counted in nErrors; unless the
+	options.Permissive flag is set, the FormatError is also raised.
+
+	The log content is not split into lines: it is read in large blocks of raw
+	data (from a memory map, if the file is not compressed), and the timing
+	records are extracted directly from each block by a regular expression
+	matching the exact format written by art.
+	The event and module keys are shared among the records with the same value.
+	The time spent and the input counters are recorded in the profile record of
+	the input file (in SelfProfile).
+	The schedule and thread numbers of TimeEvent lines from multi-threaded jobs
+	are counted in the concurrency data member (ConcurrencyStatsClass).
+	If a block contains timing lines that are not matched that way (because of
+	format errors, or just different spacing) or duplicate lines, that block is
+	parsed line by line by ParseTimeModuleLine() and ParseTimeEventLine().
+
+	Scanning is about twice as fast as the line by line parsing of version 1.5
+	(measured on a single core: 350k against 200k lines per second on a log
+	made only of timing lines, 1.5M against 0.8M lines per second on a log
+	with much unrelated output). The regular expression search alone takes
+	more than half of the scanning time, and each record still requires one
+	tuple and one float object, so a larger gain would need a compiled
+	extension. Larger speedups come from the options that avoid or spread the
+	work: --jobs, --pipeline, --cache, --sidecar and --approx.
+	"""
+	# a valid timing line; starting the pattern with a literal string (rather
+	# than with a '^' anchor) makes the search for a match much faster;
+	# the groups are a flag for TimeModule lines, the text of the event key,
+	# the one of the module key (required for TimeModule lines only) and the
+	# time: they are converted for all the records of a block at once
+	RecordPattern = re.compile(
+	  r'\nTime(?:(M)odule|Event)> (run: \d+ subRun: \d+ event: \d+) '
+	  r'(?(1)(\S+ \S+) )([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\r?(?=\n|\Z)')
+	# schedule and thread numbers are looked for only in blocks which have them;
+	# as above, the module label and name are required for TimeModule lines
+	# only, so that malformed lines are left to the line by line parsing
+	ConcurrentRecordPattern = re.compile(
+	  r'\n(Time(?:(M)odule|Event)> run: (\d+) subRun: (\d+) event: (\d+)'
+	  r' (?:schedule: (\d+) )?(?:thread: (\d+) )?'
+	  r'(?(2)(\S+) (\S+) )([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?))'
+	  r'\r?(?=\n|\Z)')
+	MaxCachedEventKeys = 1 << 16
+	BlockSize = 1 << 22
+	SampleRegionSize = 1 << 20 # largest size of a sampled region
+	MinSampleRegionSize = 1 << 12
+	MinSampledRegions = 32 # regions are made smaller to sample at least these
+
+	def __init__(self, InputFilePath, options):
+		self.InputFilePath = InputFilePath
+		self.Permissive = getattr(options, 'Permissive', False)
+		self.nErrors = 0
+		self.moduleKeys = {} # last key for each label
+		self.allModuleKeys = {}
+		# keys from their text in the log ("run: R subRun: S event: E", "label
+		# name"), shared by all the records with them
+		self.eventKeyCache = {}
+		self.moduleKeyCache = { '': None }
+		self.lastEventTokens = None
+		self.lastEventKey = None
+		self.lastLine = None
+		self.blockFirstLine = 0
+		self.profile = SelfProfile.fileProfile(InputFilePath)
+		self.concurrency = ConcurrencyStatsClass()
+		self.bytesSampled = 0
+		self.bytesTotal = 0
+		self.offset = 0 # end of the data scanned by pipelinedBlocks()
+		self.partialLine = '' # incomplete last line left by pipelinedBlocks()
+	# __init__()
+
+	def __iter__(self):
+		for Records in self.blocks():
+			for record in Records: yield record
+	# __iter__()
+
+	def blocks(self):
+		"""Yields the records, in a list for each block of input."""
+		LogFile = OPEN(self.InputFilePath, 'r')
+		try:
+			for block in self.readTimedBlocks(LogFile):
+				yield self.processBlock(block)
+		finally: LogFile.close()
+	# blocks()
+
+	def sampledBlocks(self, fraction, seed = 0):
+		"""Yields the records from sampled regions of the log, a list per region.
+
+		The log is split in strata of equal size, and from each stratum a region
+		of about fraction of its size is read, from a random position (the
+		random generator is initialised with seed, so that the sampling is
+		reproducible). Each region is extended to start and end right after a
+		TimeEvent line, so that it holds only whole events (except in logs
+		with interleaved events).
+		Only uncompressed logs can be sampled: the other ones are read in full,
+		and so are the logs when fraction is 1 or larger; then each block of
+		input is yielded as a region.
+		The sampled and total bytes are counted in bytesSampled and bytesTotal.
+		"""
+		LogFile = OPEN(self.InputFilePath, 'r')
+		try:
+			Map = MapInputFile(LogFile) if fraction < 1. else None
+			if Map is None:
+				for block in self.readTimedBlocks(LogFile):
+					self.bytesSampled += len(block)
+					self.bytesTotal += len(block)
+					yield self.processBlock(block)
+				# for
+				return
+			# if not sampling
+			try:
+				size = self.bytesTotal = len(Map)
+				regionSize = max(self.MinSampleRegionSize, min(self.SampleRegionSize,
+				  int(size * fraction / self.MinSampledRegions)))
+				strideSize = max(regionSize, int(regionSize / fraction))
+				Random = random.Random(seed)
+				for stratumStart in xrange(0, size, strideSize):
+					with self.profile.timer('read'):
+						start = stratumStart + Random.randint(0, strideSize - regionSize)
+						end = self.eventBoundary(Map, start + regionSize)
+						start = self.eventBoundary(Map, start)
+						if start >= end: continue
+						block = Map[start:end]
+					# with
+					self.bytesSampled += len(block)
+					self.lastLine = None # the previous line was not read
+					yield self.processBlock(block)
+				# for
+			finally: Map.close()
+		finally: LogFile.close()
+	# sampledBlocks()
+
+	def pipelinedBlocks(self, Pool, nWorkers, queueDepth = 2, start = 0,
+	  bFullLines = False):
+		"""Yields the records from the log, in a list for each block of input.
+
+		The result is the same as blocks(), but the work is split in stages
+		running concurrently: a reader thread reads (and decompresses) the
+		blocks into a queue of at most queueDepth blocks, the nWorkers processes
+		of the multiprocessing Pool extract the records from them
+		(ScanBlockWorker()), and the caller consumes the records of each block
+		in the order of the input. The pool is owned by the caller, and can be
+		used for more logs; it must be created before this method is called
+		(see below).
+		At most 2 nWorkers blocks are being scanned at any time, so the memory
+		use is bounded independently of the size of the log.
+		The format error messages from the workers are printed in the order
+		of the input too, and a FormatError is raised when the block with it
+		is reached.
+		The log is read from the offset start (see readBlocks()). If bFullLines
+		is set, a last line without end of line is not scanned, but left in
+		partialLine (as done by ParseInputFileCached()). The end of the data
+		scanned so far is kept in offset, and the line counters are updated as
+		by processBlock().
+		"""
+		self.offset, self.partialLine = start, ''
+		BlockQueue = Queue.Queue(queueDepth)
+		Stop = threading.Event()
+
+		def Put(item):
+			"""Queues item, waiting for room; returns False if asked to stop."""
+			while not Stop.is_set():
+				try: BlockQueue.put(item, timeout=0.1)
+				except Queue.Full: continue
+				return True
+			# while
+			return False
+		# Put()
+
+		def Reader():
+			try:
+				LogFile = OPEN(self.InputFilePath, 'r')
+				try:
+					firstLine, lastLine = self.blockFirstLine, self.lastLine
+					for block in self.readTimedBlocks(LogFile, start):
+						if bFullLines and not block.endswith('\n'):
+							self.partialLine = block # read after the end marker
+							break
+						# if
+						if not Put(( block, firstLine, lastLine )): return
+						firstLine += block.count('\n')
+						lastLine \
+						  = block[block.rfind('\n', 0, len(block) - 1) + 1:].strip()
+					# for
+				finally: LogFile.close()
+			except Exception, e:
+				Put(e)
+				return
+			# try ... except
+			Put(None)
+		# Reader()
+
+		# the workers must have been started before the reader thread, so that
+		# they don't inherit the pipe from a decompression command
+		ReaderThread = threading.Thread(target=Reader)
+		ReaderThread.daemon = True
+		ReaderThread.start()
+		Pending = collections.deque()
+		try:
+			bEnd = False
+			while Pending or not bEnd:
+				while not bEnd and (len(Pending) < 2 * nWorkers):
+					item = BlockQueue.get()
+					if isinstance(item, Exception): raise item
+					if item is None:
+						bEnd = True
+						break
+					# if
+					Pending.append(( Pool.apply_async(ScanBlockWorker,
+					  (( self.InputFilePath, self.Permissive ) + item, )),
+					  len(item[0]) ))
+				# while
+				if not Pending: break
+				Result, blockSize = Pending.popleft()
+				PackedRecords, nErrors, messages, concurrency, Profile, Error, \
+				  self.blockFirstLine, self.lastLine = Result.get()
+				Records = UnpackRecords(PackedRecords)
+				sys.stderr.write(messages)
+				self.offset += blockSize
+				self.nErrors += nErrors
+				self.concurrency.merge(concurrency)
+				self.profile.merge(Profile)
+				if Error is not None: raise Error
+				yield Records
+			# while
+		finally:
+			Stop.set()
+			# leave the pool idle (terminating it while a worker is still sending
+			# its result may hang)
+			for Result, blockSize in Pending: Result.wait()
+			ReaderThread.join()
+		# try ... finally
+	# pipelinedBlocks()
+
+	@staticmethod
+	def eventBoundary(Map, offset):
+		"""Returns the offset right after the first TimeEvent line from offset."""
+		if offset <= 0: return 0
+		size = len(Map)
+		iLine = Map.find('\nTimeEvent> ', offset - 1)
+		if iLine < 0: return size
+		return Map.find('\n', iLine + 1) + 1 or size
+	# eventBoundary()
+
+	def readTimedBlocks(self, LogFile, start = 0):
+		"""Yields from readBlocks(), recording the time in the profile."""
+		return self.profile.timeIterator('read', self.readBlocks(LogFile, start))
+
+	def followBlocks(self, pollInterval = 1., idleTimeout = None):
+		"""Yields the records from a growing log, in a list for each read.
+
+		The log is read until its end, and then polled every pollInterval
+		seconds for new content; an empty list is yielded at each poll without
+		new content. The reading stops when no new content has been added for
+		idleTimeout seconds (if None, it never stops).
+		Only complete lines are parsed. Compressed logs are not supported.
+		"""
+		LogFile = open(self.InputFilePath, 'r')
+		try:
+			leftover = ''
+			lastDataTime = time.time()
+			while True:
+				data = LogFile.read(self.BlockSize)
+				if not data:
+					if (idleTimeout is not None) \
+					  and (time.time() - lastDataTime >= idleTimeout):
+						break
+					time.sleep(pollInterval)
+					yield []
+					continue
+				# if no data
+				lastDataTime = time.time()
+				block = leftover + data
+				iEnd = block.rfind('\n') + 1
+				block, leftover = block[:iEnd], block[iEnd:]
+				if block: yield self.processBlock(block)
+			# while
+			if leftover: yield self.processBlock(leftover)
+		finally: LogFile.close()
+	# followBlocks()
+
+	def processBlock(self, block):
+		"""Returns the records from the next block of input (full lines)."""
+		start = self.profile.start()
+		nErrors = self.nErrors
+		with GarbageCollectionPaused(): Records = self.scanBlock(block)
+		nLines = block.count('\n')
+		self.blockFirstLine += nLines
+		self.lastLine = block[block.rfind('\n', 0, len(block) - 1) + 1:].strip()
+		self.profile.count(bytesRead=len(block), lines=nLines,
+		  records=len(Records), rejected=self.nErrors - nErrors)
+		self.profile.stop('scan', start)
+		return Records
+	# processBlock()
+
+	def readBlocks(self, LogFile, start = 0):
+		"""Yields blocks of data from LogFile, each one ending with a full line.
+
+		The data is read starting from the offset start, which should be at the
+		beginning of a line. Only the last block may not end with a new line.
+		"""
+		Map = MapInputFile(LogFile)
+		if Map is not None:
+			try:
+				size = len(Map)
+				while start < size:
+					end = Map.rfind('\n', start, start + self.BlockSize) + 1
+					if end <= start: # no end of line within a block size
+						end = Map.find('\n', start + self.BlockSize) + 1 or size
+					yield Map[start:end]
+					start = end
+				# while
+			finally: Map.close()
+			return
+		# if memory map
+
+		if start > 0: LogFile.seek(start)
+		leftover = ''
+		while True:
+			data = LogFile.read(self.BlockSize)
+			if not data: break
+			block = leftover + data
+			iEnd = block.rfind('\n') + 1
+			if iEnd == 0:
+				leftover = block
+				continue
+			# if
+			if iEnd < len(block): block, leftover = block[:iEnd], block[iEnd:]
+			else:                 leftover = ''
+			yield block
+		# while
+		if leftover: yield leftover
+	# readBlocks()
+
+	def scanBlock(self, block):
+		"""Returns a list of the records from block (a sequence of full lines).
+
+		The records of a block without irregular or duplicate lines are built
+		without a loop in Python: the fields of all of them are converted in one
+		go, and the keys are looked up in the key caches from their text.
+		"""
+		bConcurrent = (' schedule: ' in block) or (' thread: ' in block)
+		Records = (self.ConcurrentRecordPattern if bConcurrent
+		  else self.RecordPattern).findall('\n' + block)
+		# consecutive records are the same only if their lines are
+		if (len(Records)
+		    != block.count('TimeModule> ') + block.count('TimeEvent> ')) \
+		  or any(itertools.imap \
+		    (operator.eq, Records, itertools.islice(Records, 1, None))) \
+		  or (block[:block.find('\n')].strip() == self.lastLine):
+			# irregular lines or duplicates: take the slow path
+			return self.scanBlockByLine(block)
+		# if
+		if not Records: return []
+		if bConcurrent: return self.scanConcurrentRecords(Records)
+
+		Flags, EventTexts, ModuleTexts, Times = zip(*Records)
+		self.addEventKeys(EventTexts)
+		for ModuleText in set(ModuleTexts).difference(self.moduleKeyCache):
+			self.moduleKeyCache[ModuleText] = self.moduleKey(*ModuleText.split(' '))
+		return zip(
+		  map(self.eventKeyCache.__getitem__, EventTexts),
+		  map(self.moduleKeyCache.__getitem__, ModuleTexts),
+		  map(float, Times),
+		  )
+	# scanBlock()
+
+	def addEventKeys(self, EventTexts):
+		"""Adds to the cache the keys of the new event texts, all in one go."""
+		if len(self.eventKeyCache) > self.MaxCachedEventKeys:
+			self.eventKeyCache.clear()
+		NewTexts = list(set(EventTexts).difference(self.eventKeyCache))
+		if not NewTexts: return
+		# "run: R subRun: S event: E run: ..." -> [ R, S, E, R, ... ]
+		Numbers = map(int, ' '.join(NewTexts).split()[1::2])
+		self.eventKeyCache.update(itertools.izip(NewTexts, itertools.imap(
+		  EventKeyClass, itertools.izip(Numbers[0::3], Numbers[1::3], Numbers[2::3])
+		  )))
+	# addEventKeys()
+
+	def scanConcurrentRecords(self, Records):
+		"""Returns the records from the matches of ConcurrentRecordPattern."""
+		# local copies of the state, for speed
+		moduleKeys = self.moduleKeys
+		lastRun, lastSubRun, lastEvent \
+		  = self.lastEventTokens or ( None, None, None )
+		lastEventKey = self.lastEventKey
+		Results = []
+		addResult = Results.append
+		for line, bModule, run, subRun, event, schedule, thread, label, name, time \
+		  in Records:
+			if (schedule or thread) and not label:
+				self.concurrency.addEvent(
+				  int(schedule) if schedule else None, int(thread) if thread else None)
+			# if
+			if label:
+				ModuleKey = moduleKeys.get(label)
+				if (ModuleKey is None) or (ModuleKey[1] != name):
+					ModuleKey = self.moduleKey(label, name)
+			else:
+				ModuleKey = None
+			if (event != lastEvent) or (subRun != lastSubRun) or (run != lastRun):
+				lastEventKey \
+				  = EventKeyClass((int(run), int(subRun), int(event)))
+				lastRun, lastSubRun, lastEvent = run, subRun, event
+			# if new event
+			addResult(( lastEventKey, ModuleKey, float(time) ))
+		# for
+		self.lastEventTokens = ( lastRun, lastSubRun, lastEvent )
+		self.lastEventKey = lastEventKey
+		return Results
+	# scanConcurrentRecords()
+
+	def moduleKey(self, label, name):
+		"""Returns the shared module key for the specified label and name."""
+		try: ModuleKey = self.allModuleKeys[label, name]
+		except KeyError:
+			ModuleKey = self.allModuleKeys[label, name] \
+			  = ModuleKeyClass(( label, name ))
+		# try ... except
+		self.moduleKeys[label] = ModuleKey
+		return ModuleKey
+	# moduleKey()
+
+	def scanBlockByLine(self, block):
+		"""Returns a list of the records from block, parsing it line by line."""
+		Results = []
+		lastLine = self.lastLine
+		Lines = block.split('\n')
+		if block.endswith('\n'): Lines.pop()
+		for iLine, line in enumerate(Lines, self.blockFirstLine):
+			line = line.strip()
+			if line == lastLine: continue # duplicate line
+			lastLine = line
+
+			if line.startswith("TimeModule> "):   parser = ParseTimeModuleLine
+			elif line.startswith("TimeEvent> "):  parser = ParseTimeEventLine
+			else: continue
+			try:
+				TimeData = parser(line)
+			except FormatError, e:
+				self.nErrors += 1
+				ReportFormatError(e, self.InputFilePath, iLine)
+				if not self.Permissive: raise
+				else:                   continue
+			# try ... except
+			if parser is ParseTimeEventLine:
+				schedule = getattr(TimeData, 'schedule', None)
+				thread = getattr(TimeData, 'thread', None)
+				if (schedule is not None) or (thread is not None):
+					self.concurrency.addEvent(schedule, thread)
+			# if
+			Results.append(( TimeData.eventKey,
+			  getattr(TimeData, 'module', None), TimeData.time() ))
+		# for
+		self.lastEventTokens = None
+		return Results
+	# scanBlockByLine()
+
+# class LogScannerClass
+
+
+def ScanBlockWorker(args):
+	"""Extracts the timing records from a block of a log.
+
+	This is the unit of work of LogScannerClass.pipelinedBlocks().
+	The argument is a tuple with the path of the log, the permissive flag, the
+	block, the number of lines before it and the last line before it.
+	It returns a tuple with the records (packed by PackRecords()), the number
+	of format errors, their messages, the concurrency information
+	(ConcurrencyStatsClass), the profile record of the work, the FormatError
+	raised (None if none), and the number of lines and the last line after
+	the block.
+	"""
+	InputFilePath, Permissive, block, firstLine, lastLine = args
+	Scanner = LogScannerClass(InputFilePath, None)
+	Scanner.Permissive = Permissive
+	Scanner.blockFirstLine, Scanner.lastLine = firstLine, lastLine
+	Records, Error = [], None
+	stderr, sys.stderr = sys.stderr, cStringIO.StringIO()
+	try:
+		try: Records = Scanner.processBlock(block)
+		except FormatError, e: Error = e
+		messages = sys.stderr.getvalue()
+	finally: sys.stderr = stderr
+	return PackRecords(Records), Scanner.nErrors, messages, \
+	  Scanner.concurrency, SelfProfile.popFileProfile(InputFilePath), Error, \
+	  Scanner.blockFirstLine, Scanner.lastLine
+# ScanBlockWorker()
+
+
+def PackRecords(Records):
+	"""Returns the records in a form faster to transfer between processes.
+
+	The records (eventKey, moduleKey, time) are stored as columns: the list of
+	the distinct event and module keys, arrays of the index of the keys of each
+	record in them, and the array of the times. UnpackRecords() restores them.
+	"""
+	EventKeys, ModuleKeys = OrderedDict(), OrderedDict(( ( None, 0 ), ))
+	EventIndices, ModuleIndices = array.array('l'), array.array('l')
+	for eventKey, moduleKey, time in Records:
+		EventIndices.append(EventKeys.setdefault(eventKey, len(EventKeys)))
+		ModuleIndices.append(ModuleKeys.setdefault(moduleKey, len(ModuleKeys)))
+	# for
+	return [ tuple(map(tuple, EventKeys)), list(ModuleKeys), EventIndices,
+	  ModuleIndices, array.array('d', ( record[2] for record in Records )) ]
+# PackRecords()
+
+
+def UnpackRecords(PackedRecords):
+	"""Returns the list of records packed by PackRecords()."""
+	EventKeys, ModuleKeys, EventIndices, ModuleIndices, times = PackedRecords
+	EventKeys = map(EventKeyClass, EventKeys)
+	ModuleKeys = [ None ] + map(ModuleKeyClass, ModuleKeys[1:])
+	return zip(map(EventKeys.__getitem__, EventIndices),
+	  map(ModuleKeys.__getitem__, ModuleIndices), times)
+# UnpackRecords()
+
+
+class TimingAggregatorClass(object):
+	"""Adds timing records to the module and event statistics.
+
+	The records are tuples (eventKey, moduleKey, time) as produced by
+	LogScannerClass, and they are added in order by addRecords(), that can be
+	called many times. The per-module statistics are added to the existing in
+	AllStats (an instance of JobStatsClass), creating new ones as needed.
+	Similarly, per-event statistics are added to EventStats (a
+	TimeModuleStatsClass instance). After the last record, finish() should be
+	called.
+
+	When the entries are tracked, the records of several events may be
+	interleaved (as in the logs of multi-threaded jobs): an event is open from
+	its first record until its TimeEvent record, when it is completed (that
+	is, all the modules which have not reported a time for it get an empty
+	entry). The modules which reported are collected for each open event, so
+	that completing it costs only the filling of its missing entries.
+	The events still open at finish() are completed then; if more than
+	MaxOpenEvents are open at the same time, the oldest one is completed.
+
+	The options are the same as for ParseInputFile(). When the limit of events
+	is reached, all the open events are completed and NoMoreInput is raised.
+	The time spent is recorded in the aggregate phase of the profile record,
+	if one is specified. The largest number of open events is recorded in the
+	concurrency record (a ConcurrencyStatsClass, e.g. from the scanner), which
+	is added to the event statistics by finish() if it shows concurrency.
+	"""
+	MaxOpenEvents = 256
+
+	def __init__(self, AllStats, EventStats, options, profile = None,
+	  concurrency = None):
+		self.profile = profile or ProfileRecordClass(None)
+		self.concurrency = concurrency or ConcurrencyStatsClass()
+		self.AllStats = AllStats
+		self.EventStats = EventStats
+		self.bTracking = options.CheckDuplicates
+		self.bQuantiles = getattr(options, 'Percentiles', False)
+		self.nSlowest = getattr(options, 'Slowest', 0)
+		self.MaxEvents = options.MaxEvents
+		self.AllModules = set(AllStats) # all the module statistics
+		self.OpenEvents = {} # event key -> modules reported in it
+	# __init__()
+
+	def sortedOpenEvents(self):
+		"""Returns the keys of the open events, in order of appearance."""
+		if not self.bTracking: return [] # no event is tracked
+		return sorted(self.OpenEvents, key=self.EventStats.eventIndex.index)
+
+	def openEvent(self, EventKey):
+		"""Starts tracking EventKey; returns its (empty) set of modules."""
+		ReportedModules = self.OpenEvents[EventKey] = set()
+		nOpenEvents = len(self.OpenEvents)
+		if nOpenEvents > self.concurrency.maxOpenEvents:
+			if nOpenEvents > self.MaxOpenEvents:
+				self.completeEvent(self.sortedOpenEvents()[0])
+			else: self.concurrency.observeOpenEvents(nOpenEvents)
+		# if
+		return ReportedModules
+	# openEvent()
+
+	def completeEvent(self, EventKey):
+		"""Adds an empty entry for EventKey to the stats still missing it."""
+		ReportedModules = self.OpenEvents.pop(EventKey, ())
+		self.EventStats.complete(( EventKey, ))
+		if len(ReportedModules) < len(self.AllModules):
+			for ModuleStats in self.AllModules.difference(ReportedModules):
+				ModuleStats.complete(( EventKey, ))
+		# if
+	# completeEvent()
+
+	def completeAllEvents(self):
+		"""Completes all the open events, in order of appearance."""
+		for EventKey in self.sortedOpenEvents(): self.completeEvent(EventKey)
+
+	def getOpenEvents(self):
+		"""Returns a list of open events with the keys of their modules."""
+		return [ ( EventKey,
+		    [ ModuleStats.key for ModuleStats in self.OpenEvents[EventKey] ] )
+		  for EventKey in self.sortedOpenEvents() ]
+	# getOpenEvents()
+
+	def setOpenEvents(self, OpenEvents):
+		"""Restores the open events from the output of getOpenEvents()."""
+		self.OpenEvents.clear()
+		for EventKey, ModuleKeys in OpenEvents:
+			self.OpenEvents[EventKey] \
+			  = set(self.AllStats[ModuleKey] for ModuleKey in ModuleKeys)
+		# for
+	# setOpenEvents()
+
+	def addRecords(self, Records):
+		"""Adds all the records in the specified sequence."""
+		# local copies, for speed
+		AllStats = self.AllStats
+		EventStats = self.EventStats
+		bTracking = self.bTracking
+		ModuleStatsByKey = AllStats.moduleStats
+		OpenEvents = self.OpenEvents
+		CurrentEvent = None # the event of the last module record
+		ReportedModules = None # the modules reported in CurrentEvent
+		start = self.profile.start()
+		try:
+			for EventKey, ModuleKey, time in Records:
+
+				if ModuleKey is not None:
+					try:
+						ModuleStats = ModuleStatsByKey[ModuleKey]
+					except KeyError:
+						ModuleStats = TimeModuleStatsClass(ModuleKey,
+						  bTrackEntries=bTracking, eventIndex=EventStats.eventIndex,
+						  bQuantiles=self.bQuantiles, nSlowest=self.nSlowest)
+						AllStats[ModuleKey] = ModuleStats
+						self.AllModules.add(ModuleStats)
+					#
+
+					ModuleStats.addTime(EventKey, time)
+					if bTracking:
+						if EventKey is not CurrentEvent:
+							ReportedModules = OpenEvents.get(EventKey)
+							if ReportedModules is None:
+								ReportedModules = self.openEvent(EventKey)
+							CurrentEvent = EventKey
+						# if
+						ReportedModules.add(ModuleStats)
+					# if
+				else:
+					EventStats.addTime(EventKey, time)
+					if bTracking:
+						self.completeEvent(EventKey)
+						CurrentEvent = None
+					# if
+					if (self.MaxEvents >= 0) and (EventStats.n() >= self.MaxEvents):
+						if bTracking: self.completeAllEvents()
+						raise NoMoreInput
+					# if
+				# if ... else
+			# for records
+		finally:
+			self.profile.stop('aggregate', start)
+		# try ... finally
+	# addRecords()
+
+	def finish(self):
+		"""Completes the events still open."""
+		with self.profile.timer('aggregate'):
+			if self.bTracking: self.completeAllEvents()
+			if self.concurrency.isConcurrent():
+				self.EventStats.mergeConcurrency(self.concurrency)
+		# with
+		self.profile.updatePeakMemory()
+	# finish()
+
+# class TimingAggregatorClass
+
+
+def ParseInputFile(InputFilePath, AllStats, EventStats, options,
+  PipelinePool = None):
 	"""Parses a log file.
 
 	The art log file at InputFilePath is parsed.
@@ -523,91 +2530,1173 @@ def ParseInputFile(InputFilePath, AllStats, EventStats, options):
 	  events (always the first ones)
 	- CheckDuplicates (default: false): enables the single-event tracking, that
 	  allows to check for duplicates
+	- Pipeline (default: 0): if positive, the log is read, scanned by
+	  that many worker processes of PipelinePool (a multiprocessing pool, as
+	  created by ParseInputFiles()), and aggregated at the same time (see
+	  LogScannerClass.pipelinedBlocks()); can't be used with Approx
+	- Approx (default: None): if set, only about that fraction of the log is
+	  read, in regions (see LogScannerClass.sampledBlocks()), and the number
+	  of entries and total time that each region adds to each statistics are
+	  recorded for the estimation of the uncertainty on the averages (see
+	  SamplingStatsClass)
 
 	It returns the number of errors encountered.
 	"""
-	def CompleteEvent(CurrentEvent, EventStats, AllStats):
-		"""Make sure that CurrentEvent is known to all stats."""
-		EventStats.complete(( CurrentEvent, ))
-		for ModuleStats in AllStats:
-			ModuleStats.complete(EventStats.getEvents())
-	# CompleteEvent()
-
+	Scanner = LogScannerClass(InputFilePath, options)
+	Aggregator = TimingAggregatorClass(AllStats, EventStats, options,
+	  profile=Scanner.profile, concurrency=Scanner.concurrency)
+	Approx = getattr(options, 'Approx', None)
+	nPipelineWorkers = getattr(options, 'Pipeline', 0)
+	if (Approx is not None) and (nPipelineWorkers > 0):
+		raise RuntimeError("Sampled logs can't be pipelined")
+	if (nPipelineWorkers > 0) and (PipelinePool is None):
+		raise RuntimeError("Pipelined parsing requires a pool of workers")
+	if nPipelineWorkers > 0:
+		for Records in Scanner.pipelinedBlocks(PipelinePool, nPipelineWorkers):
+			Aggregator.addRecords(Records)
+	elif Approx is None:
+		for Records in Scanner.blocks(): Aggregator.addRecords(Records)
+	else:
+		try:
+			for Records in Scanner.sampledBlocks(Approx):
+				Before = dict(( stats.key, ( stats.n(), stats.sum() ) )
+				  for stats in itertools.chain(AllStats, ( EventStats, )))
+				try: Aggregator.addRecords(Records)
+				finally: AddSampledRegion(AllStats, EventStats, Before)
+			# for
+		finally:
+			if EventStats.sampling is None: EventStats.sampling = SamplingStatsClass()
+			EventStats.sampling.addInput(Scanner.bytesSampled, Scanner.bytesTotal)
+		# try ... finally
+	# if ... else
+	Aggregator.finish()
+	return Scanner.nErrors
+# ParseInputFile()
 
-	LogFile = OPEN(InputFilePath, 'r')
 
-	nErrors = 0
-	LastLine = None
-	CurrentEvent = None
-	for iLine, line in enumerate(LogFile):
+def AddSampledRegion(AllStats, EventStats, Before):
+	"""Records a sampled region in the statistics which got entries from it.
 
-		line = line.strip()
-		if line == LastLine: continue # duplicate line
-		LastLine = line
+	Before maps the key of each statistics to its number of entries and total
+	time before the region was added.
+	"""
+	for stats in itertools.chain(AllStats, ( EventStats, )):
+		n, T = Before.get(stats.key, ( 0, 0. ))
+		if stats.n() > n: stats.addSampledRegion(stats.n() - n, stats.sum() - T)
+	# for
+# AddSampledRegion()
 
-		if line.startswith("TimeModule> "):
 
-			try:
-				TimeData = ParseTimeModuleLine(line)
-			except FormatError, e:
-				nErrors += 1
-				msg = "Format error on '%s'@%d" % (InputFilePath, iLine + 1)
-				try: msg += " (%s)" % str(e.data['type'])
-				except KeyError: pass
-				try: msg += ", for event " + str(e.data['event'])
-				except KeyError: pass
-				try: msg += ", module " + str(e.data['module'])
-				except KeyError: pass
-				print >>sys.stderr, msg
-				if not options.Permissive: raise
-				else:                      continue
-			# try ... except
+#
+# partial aggregates
+#
+PartialAggregateHeader = "# SortModuleTimes partial aggregate"
+PartialAggregateVersion = 1
+PartialAggregateSuffix = ".modtimes.json"
 
-			try:
-				ModuleStats = AllStats[TimeData.module]
-			except KeyError:
-				ModuleStats = TimeModuleStatsClass \
-				  (TimeData.module, bTrackEntries=options.CheckDuplicates)
-				AllStats[TimeData.module] = ModuleStats
-			#
+def IsPartialAggregateFile(Path):
+	"""Returns whether the file at Path is a partial aggregate file."""
+	try:
+		with open(Path, 'rb') as File:
+			return File.read(len(PartialAggregateHeader)) == PartialAggregateHeader
+	except IOError: return False
+# IsPartialAggregateFile()
 
-			ModuleStats.add(TimeData)
-		elif line.startswith("TimeEvent> "):
-			try:
-				TimeData = ParseTimeEventLine(line)
-			except FormatError, e:
-				nErrors += 1
-				msg = "Format error on '%s'@%d" % (InputFilePath, iLine + 1)
-				try: msg += " (%s)" % str(e.data['type'])
-				except KeyError: pass
-				try: msg += ", for event " + str(e.data['event'])
-				except KeyError: pass
-				try: msg += ", module " + str(e.data['module'])
-				except KeyError: pass
-				print >>sys.stderr, msg
-				if not options.Permissive: raise
-				else:                      continue
-			# try ... except
 
-			EventStats.add(TimeData)
-			if (options.MaxEvents >= 0) \
-			  and (EventStats.n() >= options.MaxEvents):
-				if CurrentEvent: CompleteEvent(CurrentEvent, EventStats, AllStats)
-				raise NoMoreInput
-		else:
-			TimeData = None
-			continue
+def WritePartialAggregate(OutputFilePath, AllStats, EventStats):
+	"""Writes the statistics from AllStats and EventStats into a file.
 
-		if (CurrentEvent != TimeData.eventKey):
-			if TimeData and CurrentEvent:
-				CompleteEvent(CurrentEvent, EventStats, AllStats)
-			CurrentEvent = TimeData.eventKey
+	The file holds only the summary statistics (no single event entry), in a
+	JSON format preceded by a header line. It can be read back by
+	ReadPartialAggregate(), and it is accepted as input in place of a log.
+	The quantile sketches and slowest entries are also saved, when present.
+	"""
+	Data = OrderedDict()
+	Data['version'] = PartialAggregateVersion
+	Data['events'] = EventStats.getState()
+	Data['eventExtras'] = EventStats.getExtraState()
+	Data['modules'] = [
+	  list(stats.key) + [ stats.getState(), stats.getExtraState() ]
+	  for stats in AllStats
+	  ]
+	with open(OutputFilePath, 'w') as OutputFile:
+		print >>OutputFile, "%s v%d" \
+		  % (PartialAggregateHeader, PartialAggregateVersion)
+		json.dump(Data, OutputFile, separators=(',', ':'))
+		print >>OutputFile
+	# with
+# WritePartialAggregate()
+
+
+def ReadPartialAggregate(InputFilePath):
+	"""Reads a file written by WritePartialAggregate().
+
+	It returns a tuple with the module statistics (JobStatsClass) and the event
+	statistics (TimeModuleStatsClass), none of them tracking the entries.
+	A FormatError is raised if the file is not a valid partial aggregate.
+	"""
+	with open(InputFilePath, 'r') as InputFile:
+		Header = InputFile.readline()
+		if not Header.startswith(PartialAggregateHeader):
+			raise FormatError("'%s' is not a partial aggregate file"
+			  % InputFilePath, type="Aggregate")
 		# if
-	# for line in log file
-	if CurrentEvent: CompleteEvent(CurrentEvent, EventStats, AllStats)
+		try:
+			Data = json.load(InputFile)
+		except ValueError, e:
+			raise FormatError("Partial aggregate '%s' is corrupted (%s)"
+			  % (InputFilePath, e), type="Aggregate")
+		# try ... except
+	# with
+	if Data.get('version') != PartialAggregateVersion:
+		raise FormatError("Partial aggregate '%s' has unsupported version %r"
+		  % (InputFilePath, Data.get('version')), type="Aggregate")
+	# if
+
+	def RestoreStats(key, state, extraState):
+		stats = TimeModuleStatsClass(key)
+		stats.setState(state)
+		stats.setExtraState(extraState)
+		return stats
+	# RestoreStats()
+
+	AllStats = JobStatsClass()
+	for ModuleData in Data['modules']:
+		ModuleKey = ModuleKeyClass((str(ModuleData[0]), str(ModuleData[1])))
+		AllStats[ModuleKey] = RestoreStats(ModuleKey, ModuleData[2],
+		  ModuleData[3] if len(ModuleData) > 3 else None)
+	# for
+	EventStats = RestoreStats("=== events ===", Data['events'],
+	  Data.get('eventExtras', (Data.get('eventQuantiles') or [ None ])[0]))
+	return AllStats, EventStats
+# ReadPartialAggregate()
+
+
+def NeedsSingleEvents(options):
+	"""Returns whether the options require tracking the single events."""
+	return (getattr(options, 'PresentMode', None) == 'EventTable') \
+	  or bool(getattr(options, 'GroupBy', None)) \
+	  or (getattr(options, 'TimeSeries', 0) > 0) \
+	  or getattr(options, 'SkipWarmup', False)
+# NeedsSingleEvents()
+
+
+def MergePartialAggregate(InputFilePath, AllStats, EventStats, options):
+	"""Adds the statistics of a partial aggregate file to the existing ones.
+
+	The aggregate carries no information on the single events, so it can't be
+	checked for duplicate events and the event limit (options.MaxEvents) is
+	checked only after the whole file is added.
+	"""
+	if NeedsSingleEvents(options):
+		raise RuntimeError("Partial aggregate '%s' has no per-event information,"
+		  " required by the event table, grouping, time series and warm-up"
+		  " options" % InputFilePath)
+	# if
+	with SelfProfile.fileProfile(InputFilePath).timer('read'):
+		FileStats, FileEventStats = ReadPartialAggregate(InputFilePath)
+	with SelfProfile.job.timer('merge'):
+		EventStats.merge(FileEventStats)
+		AllStats.merge(FileStats)
+	# with
+	if (options.MaxEvents >= 0) and (EventStats.n() >= options.MaxEvents):
+		raise NoMoreInput
+	return 0
+# MergePartialAggregate()
+
+
+#
+# columnar export
+#
+ColumnarExportMagic = "SMTCOLS\x00"
+ColumnarExportVersion = 1
+ColumnarExportSuffix = ".modtimes.bin"
+
+def IsColumnarExportFile(Path):
+	"""Returns whether the file at Path is a columnar export file."""
+	try:
+		with open(Path, 'rb') as File:
+			return File.read(len(ColumnarExportMagic)) == ColumnarExportMagic
+	except IOError: return False
+# IsColumnarExportFile()
+
+
+def ColumnarExportLayout(Header):
+	"""Returns the offsets of the event key, event time and module columns.
+
+	The columns follow the header, each one aligned to 8 bytes: first the run,
+	subrun and event numbers (unsigned 32-bit integers), then the event times
+	and the times of each module (64-bit floating point, NaN when missing).
+	"""
+	def Align(offset): return (offset + 7) & ~7
+	nEvents = Header['nEvents']
+	offset = Align(Header['dataOffset'])
+	keyOffsets = []
+	for i in xrange(3):
+		keyOffsets.append(offset)
+		offset = Align(offset + 4 * nEvents)
+	# for
+	timeOffsets = [ offset + 8 * nEvents * i
+	  for i in xrange(len(Header['modules']) + 1) ]
+	return keyOffsets, timeOffsets[0], timeOffsets[1:]
+# ColumnarExportLayout()
+
+
+def WriteColumnarExport(OutputFilePath, AllStats, EventStats):
+	"""Writes the times of all the events and modules into a binary file.
+
+	The file holds the event keys and the matrix of the times of each module in
+	each event, stored by column (see ColumnarExportLayout()), in the native
+	byte order; it is preceded by a JSON header with the module keys and the
+	summary statistics. It can be read back by ReadColumnarExport(), and it is
+	accepted as input in place of a log.
+	The single events must be tracked, or RuntimeError is raised.
+	"""
+	if not EventStats.isTrackingEntries():
+		raise RuntimeError("Columnar export requires the single events to be"
+		  " tracked")
+	# if
+	nEvents = len(EventStats.eventIndex)
+	Header = OrderedDict()
+	Header['version'] = ColumnarExportVersion
+	Header['byteorder'] = sys.byteorder
+	Header['nEvents'] = nEvents
+	Header['modules'] = [ list(stats.key) for stats in AllStats ]
+	Header['stats'] = [ [ stats.getState(), stats.getExtraState() ]
+	  for stats in itertools.chain(( EventStats, ), AllStats) ]
+	Header['dataOffset'] = 0
+	HeaderData = json.dumps(Header, separators=(',', ':'))
+	# the header size depends on the offset written in it: iterate until stable
+	while Header['dataOffset'] \
+	  != len(ColumnarExportMagic) + 4 + len(HeaderData):
+		Header['dataOffset'] = len(ColumnarExportMagic) + 4 + len(HeaderData)
+		HeaderData = json.dumps(Header, separators=(',', ':'))
+	# while
+	keyOffsets, eventTimesOffset, moduleOffsets = ColumnarExportLayout(Header)
+
+	def WriteAt(OutputFile, offset, data):
+		OutputFile.write('\x00' * (offset - OutputFile.tell()))
+		data.tofile(OutputFile)
+	# WriteAt()
+
+	with open(OutputFilePath, 'wb') as OutputFile:
+		OutputFile.write(ColumnarExportMagic)
+		OutputFile.write(struct.pack('<I', len(HeaderData)))
+		OutputFile.write(HeaderData)
+		for iKey, offset in enumerate(keyOffsets):
+			WriteAt(OutputFile, offset, array.array('I',
+			  ( eventKey[iKey] for eventKey in EventStats.eventIndex )))
+		# for
+		for stats, offset in zip(itertools.chain(( EventStats, ), AllStats),
+		  [ eventTimesOffset ] + moduleOffsets):
+			times = array.array('d', stats.getTimes()[:nEvents])
+			times.extend(MissingTimes(nEvents - len(times)))
+			WriteAt(OutputFile, offset, times)
+		# for
+	# with
+# WriteColumnarExport()
+
+
+def ReadColumnarExport(InputFilePath):
+	"""Reads a file written by WriteColumnarExport().
+
+	The file is memory-mapped, and each column is copied into the times of a
+	TimeModuleStatsClass in one go. It returns a tuple with the module
+	statistics (JobStatsClass) and the event statistics (TimeModuleStatsClass),
+	all of them tracking the entries with a shared event index.
+	A FormatError is raised if the file is not a valid columnar export.
+	"""
+	with open(InputFilePath, 'rb') as InputFile:
+		if InputFile.read(len(ColumnarExportMagic)) != ColumnarExportMagic:
+			raise FormatError("'%s' is not a columnar export file"
+			  % InputFilePath, type="Export")
+		# if
+		Map = mmap.mmap(InputFile.fileno(), 0, access=mmap.ACCESS_READ)
+	# with
+	try:
+		offset = len(ColumnarExportMagic)
+		try:
+			HeaderSize = struct.unpack('<I', Map[offset:offset+4])[0]
+			Header = json.loads(Map[offset+4:offset+4+HeaderSize])
+		except (struct.error, ValueError), e:
+			raise FormatError("Columnar export '%s' is corrupted (%s)"
+			  % (InputFilePath, e), type="Export")
+		# try ... except
+		if Header.get('version') != ColumnarExportVersion:
+			raise FormatError("Columnar export '%s' has unsupported version %r"
+			  % (InputFilePath, Header.get('version')), type="Export")
+		# if
+		nEvents = Header['nEvents']
+		keyOffsets, eventTimesOffset, moduleOffsets \
+		  = ColumnarExportLayout(Header)
+		if (moduleOffsets or [ eventTimesOffset ])[-1] + 8 * nEvents > len(Map):
+			raise FormatError("Columnar export '%s' is truncated"
+			  % InputFilePath, type="Export")
+		# if
+		bSwap = Header['byteorder'] != sys.byteorder
+
+		def ReadColumn(typecode, offset):
+			column = array.array(typecode)
+			column.fromstring(Map[offset:offset + column.itemsize * nEvents])
+			if bSwap: column.byteswap()
+			return column
+		# ReadColumn()
+
+		EventIndex = EventIndexClass()
+		EventIndex.keys = map(EventKeyClass, itertools.izip(
+		  *[ ReadColumn('I', offset) for offset in keyOffsets ]))
+		EventIndex.positions = dict(itertools.izip(EventIndex.keys, itertools.count()))
+
+		def RestoreStats(key, offset, (state, extraState)):
+			stats = TimeModuleStatsClass \
+			  (key, bTrackEntries=True, eventIndex=EventIndex)
+			stats.times = ReadColumn('d', offset)
+			stats.setState(state)
+			stats.setExtraState(extraState)
+			return stats
+		# RestoreStats()
+
+		EventStats = RestoreStats \
+		  ("=== events ===", eventTimesOffset, Header['stats'][0])
+		AllStats = JobStatsClass()
+		for (instance, name), offset, state \
+		  in zip(Header['modules'], moduleOffsets, Header['stats'][1:]):
+			ModuleKey = ModuleKeyClass((str(instance), str(name)))
+			AllStats[ModuleKey] = RestoreStats(ModuleKey, offset, state)
+		# for
+	finally: Map.close()
+	return AllStats, EventStats
+# ReadColumnarExport()
+
+
+def MergeColumnarExport(InputFilePath, AllStats, EventStats, options):
+	"""Adds the statistics of a columnar export file to the existing ones.
+
+	If the limit of events (options.MaxEvents) is reached within the file, only
+	the first events are added, and NoMoreInput is raised.
+	"""
+	with SelfProfile.fileProfile(InputFilePath).timer('read'):
+		FileStats, FileEventStats = ReadColumnarExport(InputFilePath)
+	bLimitReached = False
+	if options.MaxEvents >= 0:
+		nLeft = options.MaxEvents - EventStats.n()
+		if FileEventStats.n() >= nLeft:
+			# keep only the entries up to the nLeft-th event with time
+			nEntries = 0
+			for time in FileEventStats.getTimes():
+				if nLeft <= 0: break
+				nEntries += 1
+				if not math.isnan(time): nLeft -= 1
+			# for
+			for stats in itertools.chain(( FileEventStats, ), FileStats):
+				del stats.times[nEntries:]
+				stats.recomputeStats()
+			# for
+			bLimitReached = True
+		# if
+	# if
+	MergeFileStats(AllStats, EventStats, FileStats, FileEventStats)
+	if bLimitReached: raise NoMoreInput
+	return 0
+# MergeColumnarExport()
+
+
+#
+# art TimeTracker and MemoryTracker databases
+#
+SQLiteMagic = "SQLite format 3\x00"
+
+def IsSQLiteDatabase(Path):
+	"""Returns whether the file at Path is a SQLite database."""
+	try:
+		with open(Path, 'rb') as File:
+			return File.read(len(SQLiteMagic)) == SQLiteMagic
+	except IOError: return False
+# IsSQLiteDatabase()
+
+
+def OpenSQLiteDatabase(InputFilePath, RequiredTables, kind):
+	"""Opens a SQLite database, and checks that it has the required tables.
+
+	It returns the connection. A FormatError is raised if the file is not a
+	valid database with all the RequiredTables, and RuntimeError if the sqlite3
+	module is not available.
+	"""
+	if sqlite3 is None:
+		raise RuntimeError("Reading %s database '%s' requires sqlite3 module"
+		  % (kind, InputFilePath))
+	# if
+	Connection = sqlite3.connect(InputFilePath)
+	Connection.text_factory = str
+	try:
+		try:
+			Tables = set(row[0] for row in Connection.execute
+			  ("SELECT name FROM sqlite_master WHERE type = 'table'"))
+		except sqlite3.DatabaseError, e:
+			raise FormatError("'%s' is not a valid SQLite database (%s)"
+			  % (InputFilePath, e), type=kind)
+		# try ... except
+		if not Tables.issuperset(RequiredTables):
+			raise FormatError("'%s' is not an art %s database"
+			  % (InputFilePath, kind), type=kind)
+		# if
+	except:
+		Connection.close()
+		raise
+	# try ... except
+	return Connection
+# OpenSQLiteDatabase()
+
+
+def SQLiteTables(Path):
+	"""Returns the names of the tables in a SQLite database (empty if n/a)."""
+	if sqlite3 is None: return set()
+	Connection = sqlite3.connect(Path)
+	try:
+		return set(str(row[0]) for row in Connection.execute
+		  ("SELECT name FROM sqlite_master WHERE type = 'table'"))
+	except sqlite3.DatabaseError: return set()
+	finally: Connection.close()
+# SQLiteTables()
+
+
+def QueryColumnStats(Connection, Table, Column, Keys = ()):
+	"""Yields the statistics of a column in a table, grouped by some columns.
+
+	The count, sum, mean and extremes are computed by SQLite; the second central
+	moment is computed too, in a second pass against the mean of each group
+	(avoiding, as Stats does, the subtraction of the squared average from the
+	average of the squares).
+	Each group yields a tuple with the values of the Keys columns and the state
+	of the statistics (see Stats.getState()), in order of first appearance
+	(the table must have a Row column with the original order).
+	"""
+	KeyList = ", ".join(Keys)
+	if Keys:
+		Means = "JOIN (SELECT %(keys)s, AVG(%(value)s) AS Mean FROM %(table)s" \
+		  " GROUP BY %(keys)s) USING (%(keys)s)" \
+		  " GROUP BY %(keys)s ORDER BY MIN(Row)"
+	else:
+		Means = "JOIN (SELECT AVG(%(value)s) AS Mean FROM %(table)s)"
+	Query = ("SELECT " + (KeyList + ", " if Keys else "")
+	  + "COUNT(%(value)s), SUM(%(value)s), Mean, MIN(%(value)s),"
+	  " MAX(%(value)s), SUM((%(value)s - Mean) * (%(value)s - Mean))"
+	  " FROM %(table)s " + Means) \
+	  % { 'table': Table, 'keys': KeyList, 'value': Column }
+	for row in Connection.execute(Query):
+		n, sum_, mean, min_, max_, m2 = row[len(Keys):]
+		if n == 0: continue
+		yield tuple(row[:len(Keys)]) \
+		  + ([ n, float(n), sum_, mean, m2, min_, max_ ], )
+	# for
+# QueryColumnStats()
+
+
+def ReadTimeTrackerDatabase(InputFilePath, options, nLeft = -1):
+	"""Reads the statistics from a database of the art TimeTracker service.
+
+	The TimeEvent and TimeModule tables are read, with the times of each event
+	and module in each event respectively. The summary statistics are computed
+	by SQL queries; if options.CheckDuplicates is set, the times of the single
+	events are also read (only the first time of each module in each event is
+	used), and the statistics track the entries with a shared event index.
+	The events are in order of first appearance; if nLeft is not negative, only
+	the events up to the nLeft-th with a time are read.
+	It returns a tuple with the module statistics (JobStatsClass), the event
+	statistics (TimeModuleStatsClass) and whether the event limit was reached.
+	A FormatError is raised if the file is not a TimeTracker database.
+	"""
+	bTracking = options.CheckDuplicates
+	bQuantiles = getattr(options, 'Percentiles', False)
+	nSlowest = getattr(options, 'Slowest', 0)
+
+	Connection = OpenSQLiteDatabase \
+	  (InputFilePath, ( 'TimeEvent', 'TimeModule' ), "TimeTracker")
+	try:
+		# the position of each event is assigned in order of first appearance
+		Connection.executescript("""
+		  CREATE TEMP TABLE EventPositions (Position INTEGER PRIMARY KEY,
+		    Run INTEGER, SubRun INTEGER, Event INTEGER,
+		    UNIQUE (Run, SubRun, Event));
+		  INSERT OR IGNORE INTO EventPositions (Run, SubRun, Event)
+		    SELECT Run, SubRun, Event FROM main.TimeModule ORDER BY rowid;
+		  INSERT OR IGNORE INTO EventPositions (Run, SubRun, Event)
+		    SELECT Run, SubRun, Event FROM main.TimeEvent ORDER BY rowid;
+		  """)
+		# the rows are copied once with their event position; when tracking,
+		# only the first time of each event and module is kept (as from logs)
+		Unique = {
+		  'events': ", UNIQUE (Position)",
+		  'modules': ", UNIQUE (Position, ModuleLabel, ModuleType)",
+		  } if bTracking else { 'events': "", 'modules': "" }
+		Connection.executescript("""
+		  CREATE TEMP TABLE Events (Row INTEGER, Position INTEGER,
+		    Run INTEGER, SubRun INTEGER, Event INTEGER, Time REAL %(events)s);
+		  INSERT OR IGNORE INTO Events SELECT T.rowid, E.Position,
+		    Run, SubRun, Event, T.Time
+		    FROM main.TimeEvent AS T JOIN EventPositions AS E
+		    USING (Run, SubRun, Event) ORDER BY T.rowid;
+		  """ % Unique)
+
+		bLimitReached = False
+		if nLeft >= 0:
+			LastEvent = Connection.execute("SELECT Position FROM Events"
+			  " WHERE Time IS NOT NULL ORDER BY Position LIMIT 1 OFFSET ?",
+			  ( max(nLeft - 1, 0), )).fetchone()
+			if LastEvent is not None:
+				for Table in ( "EventPositions", "Events" ):
+					Connection.execute("DELETE FROM %s WHERE Position > ?" % Table,
+					  ( LastEvent[0] if nLeft > 0 else 0, ))
+				# for
+				bLimitReached = True
+			# if
+		# if
+
+		Connection.executescript("""
+		  CREATE TEMP TABLE Modules (Row INTEGER, Position INTEGER,
+		    Run INTEGER, SubRun INTEGER, Event INTEGER,
+		    ModuleLabel TEXT, ModuleType TEXT, Time REAL %(modules)s);
+		  INSERT OR IGNORE INTO Modules SELECT T.rowid, E.Position,
+		    Run, SubRun, Event, T.ModuleLabel, T.ModuleType, T.Time
+		    FROM main.TimeModule AS T JOIN EventPositions AS E
+		    USING (Run, SubRun, Event) ORDER BY T.rowid;
+		  """ % Unique)
+
+		EventIndex = None
+		if bTracking:
+			EventIndex = EventIndexClass()
+			EventIndex.keys = map(EventKeyClass, Connection.execute
+			  ("SELECT Run, SubRun, Event FROM EventPositions ORDER BY Position"))
+			EventIndex.positions \
+			  = dict(itertools.izip(EventIndex.keys, itertools.count()))
+		# if
+
+		def CreateStats(key, state):
+			stats = TimeModuleStatsClass(key, bTrackEntries=bTracking,
+			  eventIndex=EventIndex, bQuantiles=bQuantiles, nSlowest=nSlowest)
+			if bTracking: stats.times = MissingTimes(len(EventIndex))
+			stats.setState(state)
+			return stats
+		# CreateStats()
+
+		EventStats = CreateStats("=== events ===", [ 0, 0., 0., 0., 0., None, None ])
+		for (state, ) in QueryColumnStats(Connection, "Events", "Time"):
+			EventStats.setState(state)
+		AllStats = JobStatsClass()
+		for label, name, state in QueryColumnStats \
+		  (Connection, "Modules", "Time", ( "ModuleLabel", "ModuleType" )):
+			ModuleKey = ModuleKeyClass(( label, name ))
+			AllStats[ModuleKey] = CreateStats(ModuleKey, state)
+		# for
+
+		# single entries, quantiles and slowest entries, where needed
+		StatsByName = dict(
+		  ( ( stats.key.instance(), stats.key.name() ), stats )
+		  for stats in AllStats
+		  )
+		if bTracking:
+			for position, time in Connection.execute \
+			  ("SELECT Position, Time FROM Events WHERE Time IS NOT NULL"):
+				EventStats.times[position - 1] = time
+			Columns = dict(( name, stats.times )
+			  for name, stats in StatsByName.items())
+			for label, name, position, time in Connection.execute(
+			  "SELECT ModuleLabel, ModuleType, Position, Time FROM Modules"
+			  " WHERE Time IS NOT NULL"
+			  ):
+				Columns[label, name][position - 1] = time
+			# for
+		# if
+		if bQuantiles:
+			for (time, ) in Connection.execute \
+			  ("SELECT Time FROM Events WHERE Time IS NOT NULL"):
+				EventStats.quantiles.add(time)
+			for label, name, time in Connection.execute(
+			  "SELECT ModuleLabel, ModuleType, Time FROM Modules"
+			  " WHERE Time IS NOT NULL"
+			  ):
+				StatsByName[label, name].quantiles.add(time)
+			# for
+		# if
+		if nSlowest > 0:
+			for run, subRun, event, time in Connection.execute(
+			  "SELECT Run, SubRun, Event, Time FROM Events WHERE Time IS NOT NULL"
+			  " ORDER BY Time DESC LIMIT ?", ( nSlowest, )
+			  ):
+				EventStats.slowest.add(time, EventKeyClass(( run, subRun, event )))
+			# for
+			for stats in AllStats:
+				for run, subRun, event, time in Connection.execute(
+				  "SELECT Run, SubRun, Event, Time FROM Modules"
+				  " WHERE ModuleLabel = ? AND ModuleType = ? AND Time IS NOT NULL"
+				  " ORDER BY Time DESC LIMIT ?",
+				  ( stats.key.instance(), stats.key.name(), nSlowest )
+				  ):
+					stats.slowest.add(time, EventKeyClass(( run, subRun, event )))
+			# for
+		# if
+	finally: Connection.close()
+	return AllStats, EventStats, bLimitReached
+# ReadTimeTrackerDatabase()
+
+
+def MergeTimeTrackerDatabase(InputFilePath, AllStats, EventStats, options):
+	"""Adds the statistics of an art TimeTracker database to the existing ones.
+
+	See ReadTimeTrackerDatabase() for the details. If the limit of events
+	(options.MaxEvents) is reached within the database, only the first events
+	are added, and NoMoreInput is raised.
+	"""
+	Profile = SelfProfile.fileProfile(InputFilePath)
+	nLeft = (options.MaxEvents - EventStats.n()) \
+	  if options.MaxEvents >= 0 else -1
+	with Profile.timer('read'):
+		FileStats, FileEventStats, bLimitReached \
+		  = ReadTimeTrackerDatabase(InputFilePath, options, nLeft=nLeft)
+	# with
+	Profile.count(bytesRead=os.path.getsize(InputFilePath),
+	  records=FileEventStats.n() + sum(stats.n() for stats in FileStats))
+	if options.CheckDuplicates:
+		MergeFileStats(AllStats, EventStats, FileStats, FileEventStats)
+	else:
+		with SelfProfile.job.timer('merge'):
+			EventStats.merge(FileEventStats)
+			AllStats.merge(FileStats)
+		# with
+	# if ... else
+	if bLimitReached: raise NoMoreInput
+	return 0
+# MergeTimeTrackerDatabase()
+
+
+def ReadMemoryTrackerDatabase(InputFilePath):
+	"""Reads the memory usage from a database of the art MemoryTracker service.
+
+	The EventInfo table (with the virtual memory size and resident set size of
+	the process after each event, and their increments) and the ModuleInfo
+	table (with the increments in each module and event) are read; all the
+	values are in MB. The statistics are computed by SQL queries.
+	It returns a tuple with the module statistics (JobStatsClass) and the event
+	statistics (TimeModuleStatsClass), with no timing information and the
+	memory usage in their memory data member (MemoryStatsClass).
+	A FormatError is raised if the file is not a MemoryTracker database.
+	"""
+	Connection = OpenSQLiteDatabase \
+	  (InputFilePath, ( 'EventInfo', 'ModuleInfo' ), "MemoryTracker")
+	try:
+		Connection.executescript("""
+		  CREATE TEMP VIEW Events AS SELECT rowid AS Row, * FROM main.EventInfo;
+		  CREATE TEMP VIEW Modules AS SELECT rowid AS Row, * FROM main.ModuleInfo;
+		  """)
+
+		def QueryMemory(Table, Keys = ()):
+			"""Yields keys and MemoryStatsClass with increments in Table."""
+			Memories = OrderedDict()
+			for Column, attrName in ( ( "DeltaVsize", 'vsize' ), ( "DeltaRSS", 'rss' ) ):
+				for row in QueryColumnStats(Connection, Table, Column, Keys):
+					memory = Memories.setdefault(row[:-1], MemoryStatsClass())
+					getattr(memory, attrName).setState(row[-1])
+				# for
+			# for
+			# the event with the largest increment (SQLite picks its other columns)
+			for row in Connection.execute(
+			  "SELECT %s Run, SubRun, Event, MAX(DeltaRSS) FROM %s %s" % (
+			    "".join(key + ", " for key in Keys), Table,
+			    ("GROUP BY " + ", ".join(Keys)) if Keys else ""
+			  )):
+				if row[-1] is None: continue
+				Memories[tuple(row[:len(Keys)])].maxRSSEvent \
+				  = EventKeyClass(row[len(Keys):-1])
+			# for
+			return Memories
+		# QueryMemory()
+
+		EventStats = TimeModuleStatsClass("=== events ===")
+		for memory in QueryMemory("Events").values():
+			EventStats.memory = memory
+		PeakEvent = Connection.execute("SELECT Run, SubRun, Event, RSS FROM Events"
+		  " WHERE RSS IS NOT NULL ORDER BY RSS DESC LIMIT 1").fetchone()
+		if PeakEvent is not None:
+			if EventStats.memory is None: EventStats.memory = MemoryStatsClass()
+			EventStats.memory.addPeak(EventKeyClass(PeakEvent[:3]), PeakEvent[3])
+		# if
+
+		AllStats = JobStatsClass()
+		for (label, name), memory \
+		  in QueryMemory("Modules", ( "ModuleLabel", "ModuleType" )).items():
+			ModuleKey = ModuleKeyClass(( label, name ))
+			AllStats[ModuleKey] = TimeModuleStatsClass(ModuleKey)
+			AllStats[ModuleKey].memory = memory
+		# for
+	finally: Connection.close()
+	return AllStats, EventStats
+# ReadMemoryTrackerDatabase()
 
-	return nErrors
-# ParseInputFile()
+
+def MergeMemoryTrackerDatabase(InputFilePath, AllStats, EventStats, options):
+	"""Adds the memory usage from an art MemoryTracker database.
+
+	See ReadMemoryTrackerDatabase() for the details. Only the memory usage
+	information of the existing statistics is changed; the modules not known
+	yet are added with no timing information. The event limit does not apply.
+	"""
+	with SelfProfile.fileProfile(InputFilePath).timer('read'):
+		FileStats, FileEventStats = ReadMemoryTrackerDatabase(InputFilePath)
+	with SelfProfile.job.timer('merge'):
+		if FileEventStats.hasMemory(): EventStats.mergeMemory(FileEventStats.memory)
+		for stats in FileStats:
+			try: ModuleStats = AllStats[stats.key]
+			except KeyError:
+				ModuleStats = TimeModuleStatsClass(stats.key,
+				  bTrackEntries=EventStats.isTrackingEntries(),
+				  eventIndex=EventStats.eventIndex,
+				  bQuantiles=getattr(options, 'Percentiles', False),
+				  nSlowest=getattr(options, 'Slowest', 0))
+				ModuleStats.completeAll(EventStats.getEvents())
+				AllStats[stats.key] = ModuleStats
+			# try ... except
+			ModuleStats.mergeMemory(stats.memory)
+		# for
+	# with
+	return 0
+# MergeMemoryTrackerDatabase()
+
+
+def MergeSQLiteDatabase(InputFilePath, AllStats, EventStats, options):
+	"""Adds the information from a TimeTracker and/or MemoryTracker database."""
+	Tables = SQLiteTables(InputFilePath)
+	bTimes = Tables.issuperset(( 'TimeEvent', 'TimeModule' ))
+	bMemory = Tables.issuperset(( 'EventInfo', 'ModuleInfo' ))
+	nErrors = 0
+	if bMemory or not bTimes:
+		nErrors += MergeMemoryTrackerDatabase \
+		  (InputFilePath, AllStats, EventStats, options)
+	if bTimes:
+		nErrors += MergeTimeTrackerDatabase \
+		  (InputFilePath, AllStats, EventStats, options)
+	return nErrors
+# MergeSQLiteDatabase()
+
+
+def ReadInputFile(InputFilePath, AllStats, EventStats, options,
+  PipelinePool = None):
+	"""Adds the information from an input file to the existing statistics.
+
+	The input can be either an art log (see ParseInputFile()), a partial
+	aggregate file (see MergePartialAggregate()), a columnar export file
+	(see MergeColumnarExport()) or a database from the art TimeTracker or
+	MemoryTracker services (see MergeSQLiteDatabase()).
+	If a cache directory is specified in options.CacheDir, logs are parsed
+	through the cache (see ParseInputFileCached()), unless there is a limit to
+	the number of events or they are sampled (options.Approx).
+	PipelinePool is the pool of workers for the pipelined parsing of logs
+	(see ParseInputFile()).
+	It returns the number of errors encountered; a compressed log which can't
+	be decompressed is reported on screen and counted as one error.
+	"""
+	try:
+		if IsPartialAggregateFile(InputFilePath):
+			return MergePartialAggregate(InputFilePath, AllStats, EventStats, options)
+		elif IsColumnarExportFile(InputFilePath):
+			return MergeColumnarExport(InputFilePath, AllStats, EventStats, options)
+		elif IsSQLiteDatabase(InputFilePath):
+			return MergeSQLiteDatabase(InputFilePath, AllStats, EventStats, options)
+		elif getattr(options, 'CacheDir', None) and (options.MaxEvents < 0) \
+		  and (getattr(options, 'Approx', None) is None):
+			return ParseInputFileCached(InputFilePath, AllStats, EventStats, options,
+			  PipelinePool=PipelinePool)
+		else:
+			return ParseInputFile(InputFilePath, AllStats, EventStats, options,
+			  PipelinePool=PipelinePool)
+	except DecompressionError, e:
+		print >>sys.stderr, str(e)
+		return 1
+	# try ... except
+# ReadInputFile()
+
+
+def CreateEventStats(options):
+	"""Returns a new TimeModuleStatsClass for per-event statistics."""
+	return TimeModuleStatsClass("=== events ===",
+	  bTrackEntries=options.CheckDuplicates,
+	  bQuantiles=getattr(options, 'Percentiles', False),
+	  nSlowest=getattr(options, 'Slowest', 0))
+# CreateEventStats()
+
+
+def MergeFileStats(AllStats, EventStats, FileStats, FileEventStats):
+	"""Adds the statistics from a single file to the cumulative ones."""
+	with SelfProfile.job.timer('merge'):
+		knownEvents = EventStats.getEvents()
+		EventStats.merge(FileEventStats)
+		AllStats.merge(FileStats,
+		  knownEvents=knownEvents, newEvents=FileEventStats.getEvents(),
+		  eventIndex=EventStats.eventIndex)
+	# with
+# MergeFileStats()
+
+
+def ParseInputFileWorker(args):
+	"""Parses a single log file into new statistics objects.
+
+	This is the unit of work of the parallel parsing in ParseInputFiles().
+	The argument is a tuple (InputFilePath, options, PipelinePool), as in
+	ReadInputFile().
+	It returns a tuple with the module statistics (JobStatsClass), the event
+	statistics (TimeModuleStatsClass), the number of errors and the profile
+	record of the file (ProfileRecordClass).
+	If the limit of events is reached, the number of errors is not reported
+	(the caller is expected to parse such a file again anyway).
+	If options.WriteSidecar is set, the statistics of a log which is parsed
+	completely are also written in a partial aggregate file next to it.
+	"""
+	InputFilePath, options, PipelinePool = args
+	AllStats = JobStatsClass()
+	EventStats = CreateEventStats(options)
+	try:
+		nErrors = ReadInputFile(InputFilePath, AllStats, EventStats, options,
+		  PipelinePool=PipelinePool)
+	except NoMoreInput:
+		return AllStats, EventStats, 0, SelfProfile.popFileProfile(InputFilePath)
+	if getattr(options, 'WriteSidecar', False) \
+	  and not IsPartialAggregateFile(InputFilePath) \
+	  and not IsColumnarExportFile(InputFilePath):
+		WritePartialAggregate \
+		  (InputFilePath + PartialAggregateSuffix, AllStats, EventStats)
+	# if
+	return AllStats, EventStats, nErrors, \
+	  SelfProfile.popFileProfile(InputFilePath)
+# ParseInputFileWorker()
+
+
+def ParseInputFiles(InputFilePaths, AllStats, EventStats, options,
+  InputStarts = None):
+	"""Parses a list of log files.
+
+	The files are parsed in order and their information added to AllStats and
+	EventStats as in ReadInputFile().
+	If InputStarts is a list, a pair with the path of each file and the number
+	of events in the event index before it was added is appended to it.
+	If options.Jobs is larger than 1, the files are parsed by a pool of
+	options.Jobs processes, each file into its own statistics, that are then
+	merged in the order of the files. The result is the same as parsing all
+	the files in sequence: when a file would reach the limit of events
+	(options.MaxEvents), that file is parsed again, directly into the
+	cumulative statistics. The same happens, serially, when sidecar partial
+	aggregate files are requested (options.WriteSidecar).
+	If options.Pipeline is positive, the logs are parsed one after the other
+	by a single pool of that many processes (see ParseInputFile()).
+
+	It returns the number of errors encountered; NoMoreInput is raised when
+	the limit of events is reached.
+	"""
+	nErrors = 0
+	nJobs = min(getattr(options, 'Jobs', 1), len(InputFilePaths))
+	def RecordStart(InputFilePath):
+		if (InputStarts is not None) and EventStats.isTrackingEntries():
+			InputStarts.append(( InputFilePath, len(EventStats.eventIndex) ))
+	# RecordStart()
+
+	nPipelineWorkers = getattr(options, 'Pipeline', 0)
+	PipelinePool = multiprocessing.Pool(nPipelineWorkers) \
+	  if nPipelineWorkers > 0 else None
+	Pool = multiprocessing.Pool(nJobs) if nJobs > 1 else None
+	try:
+		if (nJobs <= 1) and not getattr(options, 'WriteSidecar', False):
+			for InputFilePath in InputFilePaths:
+				RecordStart(InputFilePath)
+				nErrors += ReadInputFile(InputFilePath, AllStats, EventStats, options,
+				  PipelinePool=PipelinePool)
+			# for
+			return nErrors
+		# if serial
+
+		Results = (Pool.imap if Pool else itertools.imap)(ParseInputFileWorker,
+		  [ ( InputFilePath, options, PipelinePool )
+		    for InputFilePath in InputFilePaths ])
+		for InputFilePath, Result in zip(InputFilePaths, Results):
+			FileStats, FileEventStats, nFileErrors, FileProfile = Result
+			SelfProfile.addFileProfile(FileProfile)
+			RecordStart(InputFilePath)
+			if (options.MaxEvents >= 0) \
+			  and (EventStats.n() + FileEventStats.n() >= options.MaxEvents):
+				nErrors += ReadInputFile(InputFilePath, AllStats, EventStats, options,
+				  PipelinePool=PipelinePool)
+				continue
+			# if
+			MergeFileStats(AllStats, EventStats, FileStats, FileEventStats)
+			nErrors += nFileErrors
+		# for
+	finally:
+		for WorkerPool in ( Pool, PipelinePool ):
+			if WorkerPool is None: continue
+			WorkerPool.terminate()
+			WorkerPool.join()
+		# for
+	# try ... finally
+	return nErrors
+# ParseInputFiles()
+
+
+#
+# persistent parse cache
+#
+ParseCacheVersion = 2
+ParseCacheSuffix = ".parsecache"
+ParseCacheTailCheck = 4096 # bytes before the end of parsed input to verify
+
+def ParseCacheEntryPath(CacheDir, InputFilePath, options):
+	"""Returns the path of the cache entry for the specified log and options.
+
+	The entry is specific to the log path, to the parser version and to the
+	options which affect the parsing result.
+	"""
+	Key = repr((
+	  ParseCacheVersion, Version, os.path.abspath(InputFilePath),
+	  bool(options.CheckDuplicates), bool(getattr(options, 'Percentiles', False)),
+	  bool(getattr(options, 'Permissive', False)),
+	  getattr(options, 'Slowest', 0),
+	  ))
+	return os.path.join(CacheDir, hashlib.sha1(Key).hexdigest() + ParseCacheSuffix)
+# ParseCacheEntryPath()
+
+
+def ReadTailCheck(InputFilePath, endOffset):
+	"""Returns the content of the file just before endOffset (plain files)."""
+	start = max(0, endOffset - ParseCacheTailCheck)
+	with open(InputFilePath, 'rb') as InputFile:
+		InputFile.seek(start)
+		return InputFile.read(endOffset - start)
+	# with
+# ReadTailCheck()
+
+
+def LoadParseCacheEntry(EntryPath):
+	"""Returns the content of a cache entry, None if not available or invalid."""
+	try:
+		with open(EntryPath, 'rb') as EntryFile: Entry = pickle.load(EntryFile)
+	except (EnvironmentError, EOFError, pickle.UnpicklingError,
+	  AttributeError, ImportError, ValueError, IndexError):
+		return None
+	# try ... except
+	if not isinstance(Entry, dict) or (Entry.get('version') != ParseCacheVersion):
+		return None
+	try: os.utime(EntryPath, None) # mark as recently used
+	except EnvironmentError: pass
+	return Entry
+# LoadParseCacheEntry()
+
+
+def SaveParseCacheEntry(EntryPath, Entry, MaxCacheSize):
+	"""Writes a cache entry, then trims the cache to MaxCacheSize bytes.
+
+	Writing to the cache is best effort: failures are silently ignored.
+	"""
+	CacheDir = os.path.dirname(EntryPath)
+	TempPath = "%s.%d.tmp" % (EntryPath, os.getpid())
+	try:
+		if not os.path.isdir(CacheDir): os.makedirs(CacheDir)
+		with open(TempPath, 'wb') as EntryFile:
+			pickle.dump(Entry, EntryFile, pickle.HIGHEST_PROTOCOL)
+		os.rename(TempPath, EntryPath)
+	except EnvironmentError:
+		try: os.remove(TempPath)
+		except EnvironmentError: pass
+		return
+	# try ... except
+	PruneParseCache(CacheDir, MaxCacheSize, keep=EntryPath)
+# SaveParseCacheEntry()
+
+
+def PruneParseCache(CacheDir, MaxCacheSize, keep = None):
+	"""Removes the least recently used cache entries beyond MaxCacheSize bytes.
+
+	The entry at the path keep is not removed, even if it alone is too large.
+	"""
+	Entries = []
+	for FileName in os.listdir(CacheDir):
+		if not FileName.endswith(ParseCacheSuffix): continue
+		EntryPath = os.path.join(CacheDir, FileName)
+		try: Info = os.stat(EntryPath)
+		except EnvironmentError: continue # removed by someone else
+		Entries.append(( Info.st_mtime, Info.st_size, EntryPath ))
+	# for
+	TotalSize = sum(Entry[1] for Entry in Entries)
+	for mtime, size, EntryPath in sorted(Entries):
+		if TotalSize <= MaxCacheSize: break
+		if EntryPath == keep: continue
+		try: os.remove(EntryPath)
+		except EnvironmentError: pass
+		TotalSize -= size
+	# for
+# PruneParseCache()
+
+
+def ParseInputFileCached(InputFilePath, AllStats, EventStats, options,
+  PipelinePool = None):
+	"""Parses a log file as ParseInputFile(), using the cache in options.CacheDir.
+
+	The result of the parsing of each log is stored in a cache entry, together
+	with the identity of the file (inode, size and modification time).
+	If the log has not changed, the result is taken from the cache.
+	If an uncompressed log has only grown, only the new content is parsed, and
+	added to the cached result: for this, the cache keeps the state of the
+	parsing up to the last complete line and before the completion of the last
+	event, which can then be continued.
+	Otherwise, the log is parsed in full.
+	The cache is trimmed to options.CacheSize megabytes, removing the entries
+	used least recently.
+	"""
+	EntryPath = ParseCacheEntryPath(options.CacheDir, InputFilePath, options)
+	Info = os.stat(InputFilePath)
+	Identity = ( Info.st_dev, Info.st_ino )
+	# only plain files can be parsed from the middle
+	bPlain = DetectCompression(InputFilePath) is None
+	with SelfProfile.fileProfile(InputFilePath).timer('read'):
+		Entry = LoadParseCacheEntry(EntryPath)
+	if Entry is None: pass
+	elif Entry['identity'] != Identity: Entry = None
+	elif (Entry['fileSize'] == Info.st_size) \
+	  and (Entry['mtime'] == Info.st_mtime):
+		pass # unchanged
+	elif not bPlain or (Entry['offset'] > Info.st_size) \
+	  or (ReadTailCheck(InputFilePath, Entry['offset']) != Entry['tailCheck']):
+		Entry = None # changed, and not just by appending data
+	# if ... else
+
+	Scanner = LogScannerClass(InputFilePath, options)
+	if Entry is None:
+		FileStats = JobStatsClass()
+		FileEventStats = CreateEventStats(options)
+		Aggregator = TimingAggregatorClass(FileStats, FileEventStats, options,
+		  profile=Scanner.profile, concurrency=Scanner.concurrency)
+		offset = 0
+	else:
+		FileStats, FileEventStats = Entry['stats']
+		Scanner.nErrors = Entry['nErrors']
+		Scanner.blockFirstLine = Entry['nLines']
+		Scanner.lastLine = Entry['lastLine']
+		Scanner.concurrency.setState(Entry['concurrency'])
+		Aggregator = TimingAggregatorClass(FileStats, FileEventStats, options,
+		  profile=Scanner.profile, concurrency=Scanner.concurrency)
+		Aggregator.setOpenEvents(Entry['openEvents'])
+		if Entry['nErrors'] > 0:
+			print >>sys.stderr, "'%s': %d format errors (from the cache)" \
+			  % (InputFilePath, Entry['nErrors'])
+		# if
+		offset = Entry['offset']
+	# if ... else
+
+	if (Entry is not None) and (Entry['fileSize'] == Info.st_size) \
+	  and (Entry['mtime'] == Info.st_mtime):
+		PartialLine = Entry['partialLine']
+	else:
+		# parse the new full lines; the last partial line is not cached
+		PartialLine = ''
+		nPipelineWorkers = getattr(options, 'Pipeline', 0)
+		if (nPipelineWorkers > 0) and (PipelinePool is None):
+			raise RuntimeError("Pipelined parsing requires a pool of workers")
+		if nPipelineWorkers > 0:
+			for Records in Scanner.pipelinedBlocks(PipelinePool, nPipelineWorkers,
+			  start=offset, bFullLines=True):
+				Aggregator.addRecords(Records)
+			offset, PartialLine = Scanner.offset, Scanner.partialLine
+		else:
+			with contextlib.closing(OPEN(InputFilePath, 'r')) as LogFile:
+				for block in Scanner.readTimedBlocks(LogFile, offset):
+					if not block.endswith('\n'):
+						PartialLine = block
+						break
+					# if
+					Aggregator.addRecords(Scanner.processBlock(block))
+					offset += len(block)
+				# for
+			# with
+		# if ... else
+		bComplete = (offset + len(PartialLine) == Info.st_size)
+		Entry = {
+		  'version': ParseCacheVersion,
+		  'path': os.path.abspath(InputFilePath),
+		  'identity': Identity,
+		  'fileSize': Info.st_size,
+		  # if the file grew while parsing, it will be seen as changed next time
+		  'mtime': Info.st_mtime if bComplete or not bPlain else None,
+		  'offset': offset,
+		  'tailCheck': ReadTailCheck(InputFilePath, offset) if bPlain else '',
+		  'partialLine': PartialLine,
+		  'nErrors': Scanner.nErrors,
+		  'nLines': Scanner.blockFirstLine,
+		  'lastLine': Scanner.lastLine,
+		  'openEvents': Aggregator.getOpenEvents(),
+		  'concurrency': Scanner.concurrency.getState(),
+		  'stats': ( FileStats, FileEventStats ),
+		  }
+		SaveParseCacheEntry(EntryPath, Entry,
+		  MaxCacheSize=getattr(options, 'CacheSize', 1024) * 1024 * 1024)
+	# if
+
+	if PartialLine: Aggregator.addRecords(Scanner.processBlock(PartialLine))
+	Aggregator.finish()
+	MergeFileStats(AllStats, EventStats, FileStats, FileEventStats)
+	return Scanner.nErrors
+# ParseInputFileCached()
+
+
+def FollowInputFile(InputFilePath, AllStats, EventStats, options, Report):
+	"""Parses a log file while it is being written.
+
+	The statistics are collected as in ParseInputFile(), and the Report
+	callable is called with no argument every options.ReportInterval seconds
+	(if positive) and every options.ReportEvents events (if positive), if new
+	events have been added since the last call.
+	The file is followed until no new content is added for options.IdleTimeout
+	seconds (if positive), or until the user interrupts it, or until the process
+	is asked to terminate (SIGTERM, e.g. from a batch system or timeout); in all
+	cases, the function returns normally, after completing the last event.
+	It returns the number of errors encountered.
+	"""
+	Scanner = LogScannerClass(InputFilePath, options)
+	Aggregator = TimingAggregatorClass(AllStats, EventStats, options,
+	  profile=Scanner.profile, concurrency=Scanner.concurrency)
+	ReportInterval = getattr(options, 'ReportInterval', 0)
+	ReportEvents = getattr(options, 'ReportEvents', 0)
+	IdleTimeout = getattr(options, 'IdleTimeout', 0)
+
+	LastReportTime = time.time()
+	LastReportEvents = EventStats.n()
+
+	# a termination request ends the following the same way as an interrupt;
+	# further requests are then ignored while the last statistics are completed
+	# (timeout, for example, signals both the process and its process group)
+	def Terminate(signum, frame):
+		signal.signal(signal.SIGTERM, signal.SIG_IGN)
+		raise KeyboardInterrupt
+	# Terminate()
+	PreviousHandler = signal.signal(signal.SIGTERM, Terminate)
+	try:
+		for Records in Scanner.followBlocks(
+		  pollInterval=min(1., ReportInterval) if ReportInterval > 0 else 1.,
+		  idleTimeout=IdleTimeout if IdleTimeout > 0 else None
+		  ):
+			Aggregator.addRecords(Records)
+			nNewEvents = EventStats.n() - LastReportEvents
+			if nNewEvents <= 0: continue
+			if ((ReportEvents > 0) and (nNewEvents >= ReportEvents)) \
+			  or ((ReportInterval > 0) \
+			    and (time.time() - LastReportTime >= ReportInterval)):
+				Report()
+				LastReportTime = time.time()
+				LastReportEvents = EventStats.n()
+			# if
+		# for
+	except KeyboardInterrupt: pass
+	finally:
+		if signal.getsignal(signal.SIGTERM) is Terminate:
+			signal.signal(signal.SIGTERM, PreviousHandler)
+	# try ... finally
+	Aggregator.finish()
+	return Scanner.nErrors
+# FollowInputFile()
 
 
 #
@@ -845,11 +3934,776 @@ class TabularAlignmentClass:
 		return [ separator.join(RowContent) for RowContent in self.FormatTable() ]
 
 	def Print(self, stream = sys.stdout):
-		print "\n".join(self.ToStrings())
+		print >>stream, "\n".join(self.ToStrings())
 
 # class TabularAlignmentClass
 
 
+def BuildReportTable(AllStats, EventStats, options):
+	"""Returns a TabularAlignmentClass with the statistics to be printed.
+
+	The content depends on the presentation mode options.PresentMode.
+	"""
+	OutputTable = TabularAlignmentClass()
+
+	# present results
+	if options.PresentMode == "ModTable":
+		# fill the module stat data into the table, then the event data
+		Rows = [ stats.FormatStatsAsList()
+		  for stats in itertools.chain(AllStats, ( EventStats, )) ]
+		# uncertainties on the averages of sampled inputs are in their own column
+		if EventStats.sampling is not None:
+			nColumns = max(map(len, Rows))
+			for row, stats in zip(Rows, itertools.chain(AllStats, ( EventStats, ))):
+				row.extend([ "" ] * (nColumns - len(row)))
+				halfWidth = stats.meanHalfWidth()
+				if (halfWidth is not None) and (stats.average() > 0.):
+					row.append("mean +/- %g\" (%.1f%%)"
+					  % (halfWidth, halfWidth / stats.average() * 100.))
+				# if
+			# for
+		# if
+		# memory usage follows the timing, aligned in its own columns
+		if any(stats.hasMemory() for stats in itertools.chain(AllStats, ( EventStats, ))):
+			nColumns = max(map(len, Rows))
+			for row, stats in zip(Rows, itertools.chain(AllStats, ( EventStats, ))):
+				row.extend([ "" ] * (nColumns - len(row)))
+				if stats.hasMemory(): row.extend(stats.memory.FormatAsList())
+			# for
+		# if
+		OutputTable.AddData(Rows)
+	elif options.PresentMode == "EventTable":
+		# set some table formatting options
+		OutputTable.SetRowFormats \
+		  (OutputTable.LineNo(0), [ None, { 'align': 'center' }])
+		# header row
+		OutputTable.AddRow("Module", *range(AllStats.MaxEvents()))
+		# fill the module stat data into the table
+		OutputTable.AddData([ stats.FormatTimesAsList() for stats in AllStats ])
+		# then the event data
+		OutputTable.AddRow(*EventStats.FormatTimesAsList())
+	else:
+		raise RuntimeError("Presentation mode %r not known" % options.PresentMode)
+
+	return OutputTable
+# BuildReportTable()
+
+
+def WriteEventRows(AllStats, EventStats, stream = sys.stdout, delimiter = ','):
+	"""Writes the time of each module in each event, one event per row.
+
+	The output is in CSV format (with the specified delimiter): after a header
+	row, each row has the run, subrun and event numbers, the times of each
+	module and the time of the whole event; missing times are left empty.
+	Rows are written as soon as they are formatted, so that the memory needed
+	does not depend on the number of events.
+	"""
+	Writer = csv.writer(stream, delimiter=delimiter, lineterminator='\n')
+	ModuleTimes = [ stats.getTimes() for stats in AllStats ]
+	Writer.writerow([ "run", "subRun", "event" ]
+	  + [ str(stats.key) for stats in AllStats ] + [ "total" ])
+	for iEvent, eventKey in enumerate(EventStats.getEvents()):
+		row = list(eventKey)
+		for times in itertools.chain(ModuleTimes, ( EventStats.getTimes(), )):
+			time = times[iEvent] if iEvent < len(times) else float('nan')
+			row.append("" if math.isnan(time) else repr(time))
+		# for
+		Writer.writerow(row)
+	# for
+# WriteEventRows()
+
+
+def PrintReport(AllStats, EventStats, options, stream = sys.stdout):
+	"""Prints the statistics in the presentation mode options.PresentMode.
+
+	In the event table mode, if options.EventTableFormat is 'csv' or 'tsv', the
+	table is written one event per row by WriteEventRows().
+	"""
+	EventTableFormat = getattr(options, 'EventTableFormat', 'table')
+	if (options.PresentMode == "EventTable") and (EventTableFormat != 'table'):
+		WriteEventRows(AllStats, EventStats, stream,
+		  delimiter={ 'csv': ',', 'tsv': '\t' }[EventTableFormat])
+	else:
+		BuildReportTable(AllStats, EventStats, options).Print(stream)
+	if (options.PresentMode == "ModTable") and EventStats.concurrency:
+		print >>stream, "Concurrency: %s" % EventStats.concurrency
+	if (options.PresentMode == "ModTable") and EventStats.sampling:
+		sampling = EventStats.sampling
+		print >>stream, ("Approximate: %d regions sampled, %.3g of %.3g MB"
+		  " (%.1f%%); totals are of the sampled events only, intervals on the"
+		  " averages at 95%% confidence level") % (sampling.regions,
+		  sampling.bytesSampled / 1048576., sampling.bytesTotal / 1048576.,
+		  100. * sampling.bytesSampled / max(sampling.bytesTotal, 1))
+	# if
+	if (options.PresentMode == "ModTable") and getattr(options, 'Slowest', 0):
+		print >>stream
+		PrintSlowestReport(AllStats, EventStats, stream)
+	# if
+	if (options.PresentMode == "ModTable") and getattr(options, 'GroupBy', None):
+		print >>stream
+		PrintGroupReport(AllStats, EventStats, options.GroupBy, stream)
+	# if
+# PrintReport()
+
+
+class EventGroupIndexClass(object):
+	"""Index of the positions of the tracked events, by run and subrun.
+
+	The index is nested: runs maps each run number to an ordered dictionary
+	from subrun number to the array of the positions of its events in the
+	event index, so that the statistics of a run or of a subrun can be
+	extracted from the tracked times without parsing again.
+	Runs and subruns are kept in the order they first appear.
+	"""
+	def __init__(self, eventKeys):
+		self.runs = OrderedDict()
+		for pos, eventKey in enumerate(eventKeys):
+			subRuns = self.runs.setdefault(eventKey.run(), OrderedDict())
+			subRuns.setdefault(eventKey.subRun(), array.array('l')).append(pos)
+		# for
+	# __init__()
+
+	def runPositions(self, run):
+		"""Returns the positions of all the events of the run."""
+		return list(itertools.chain(*self.runs[run].values()))
+
+# class EventGroupIndexClass
+
+
+def GroupStats(times, positions):
+	"""Returns the Stats of the times at the specified positions (NaN skipped)."""
+	stats = Stats()
+	nTimes = len(times)
+	for pos in positions:
+		if pos >= nTimes: continue
+		time = times[pos]
+		if not math.isnan(time): stats.add(time)
+	# for
+	return stats
+# GroupStats()
+
+
+def PrintGroupReport(AllStats, EventStats, GroupBy, stream = sys.stdout):
+	"""Prints the average time of each module in each run (or subrun).
+
+	Each row describes a group of events, with its number of events and the
+	average time of the whole event and of each module in the group.
+	If GroupBy is 'subrun', each run row is followed by the rows of its
+	subruns. The per-event information must have been tracked.
+	"""
+	Index = EventGroupIndexClass(EventStats.getEvents())
+	AllTimes = [ EventStats.getTimes() ] + [ stats.getTimes() for stats in AllStats ]
+
+	def GroupRow(label, positions):
+		row = [ label ]
+		for iColumn, times in enumerate(AllTimes):
+			stats = GroupStats(times, positions)
+			if iColumn == 0: row.append(str(stats.n()))
+			row.append(("%g\"" % stats.average()) if stats.n() > 0 else "n/a")
+		# for
+		return row
+	# GroupRow()
+
+	OutputTable = TabularAlignmentClass()
+	OutputTable.AddRow("Group", "events", "event",
+	  *[ str(stats.key) for stats in AllStats ])
+	for run, subRuns in Index.runs.items():
+		OutputTable.AddRow(*GroupRow("run %d" % run, Index.runPositions(run)))
+		if GroupBy != 'subrun': continue
+		for subRun, positions in subRuns.items():
+			OutputTable.AddRow(*GroupRow("  subRun %d" % subRun, positions))
+	# for
+	print >>stream, "Average times by %s:" % GroupBy
+	OutputTable.Print(stream)
+# PrintGroupReport()
+
+
+class WarmupDetectorClass(object):
+	"""Detects the end of the warm-up in a sequence of values (MSER-5 rule).
+
+	The values are added in order by add(), in a single pass; they are grouped
+	in batches of batchSize, and only the mean of each batch and the position
+	of its last value are kept. The end of the warm-up is after the number d
+	of batches (at most half of them) which minimises the Marginal Standard
+	Error of the means of the remaining k - d batches,
+	  sum_{j > d} (Y_j - <Y>_{j > d})^2 / (k - d)^2
+	(the values of an incomplete last batch are ignored).
+	"""
+	def __init__(self, batchSize = 5):
+		self.batchSize = batchSize
+		self.batchMeans = array.array('d')
+		self.batchEnds = []
+		self.batch = Stats()
+	# __init__()
+
+	def add(self, value, position):
+		"""Adds the value at the specified position."""
+		self.batch.add(value)
+		if self.batch.n() < self.batchSize: return
+		self.batchMeans.append(self.batch.average())
+		self.batchEnds.append(position + 1)
+		self.batch.clear()
+	# add()
+
+	def warmupBatches(self):
+		"""Returns the number of batches in the warm-up."""
+		k = len(self.batchMeans)
+		remaining = Stats() # statistics of the batches from d on
+		bestD, bestMSE = 0, None
+		for d in xrange(k - 1, -1, -1):
+			remaining.add(self.batchMeans[d])
+			if d > k // 2: continue
+			MSE = remaining.rms2() / remaining.n()
+			if (bestMSE is None) or (MSE <= bestMSE): bestD, bestMSE = d, MSE
+		# for
+		return bestD
+	# warmupBatches()
+
+	def warmupEnd(self, start = 0):
+		"""Returns the position of the first value after the warm-up."""
+		d = self.warmupBatches()
+		return self.batchEnds[d - 1] if d > 0 else start
+	# warmupEnd()
+
+# class WarmupDetectorClass
+
+
+def FindWarmups(EventStats, InputStarts):
+	"""Detects the warm-up events of each input from the event times.
+
+	InputStarts is a list of pairs (input path, first event position), as
+	filled by ParseInputFiles(). It returns a list with a tuple for each input:
+	path, first and end position of its events and end position of its warm-up.
+	"""
+	times = EventStats.getTimes()
+	Bounds = [ start for path, start in InputStarts[1:] ] + [ len(times) ]
+	Warmups = []
+	for (path, start), end in zip(InputStarts, Bounds):
+		Detector = WarmupDetectorClass()
+		for pos in xrange(start, end):
+			if not math.isnan(times[pos]): Detector.add(times[pos], pos)
+		Warmups.append(( path, start, end, Detector.warmupEnd(start) ))
+	# for
+	return Warmups
+# FindWarmups()
+
+
+def ExcludeWarmups(AllStats, EventStats, Warmups):
+	"""Recomputes all the statistics without the warm-up events."""
+	skip = [ ( start, warmupEnd ) for path, start, end, warmupEnd in Warmups ]
+	for stats in itertools.chain(AllStats, ( EventStats, )):
+		stats.recomputeStats(skip=skip)
+# ExcludeWarmups()
+
+
+def PrintTimeSeriesReport(AllStats, EventStats, BinSize, Warmups,
+  stream = sys.stdout):
+	"""Prints the throughput and module costs in bins of BinSize events.
+
+	For each input (see FindWarmups()), the events are split in bins in their
+	order, and for each bin the number of events per second of event time, the
+	average event time and the average time of each module are printed; the
+	bins including warm-up events are marked with '*'.
+	"""
+	AllTimes = [ EventStats.getTimes() ] + [ stats.getTimes() for stats in AllStats ]
+	OutputTable = TabularAlignmentClass()
+	OutputTable.AddRow("Events", "event/s", "event",
+	  *[ str(stats.key) for stats in AllStats ])
+	for path, start, end, warmupEnd in Warmups:
+		if len(Warmups) > 1: OutputTable.AddRow("[%s]" % path)
+		for begin in xrange(start, end, BinSize):
+			positions = xrange(begin, min(begin + BinSize, end))
+			row = [ "%d-%d%s" % (positions[0] - start + 1, positions[-1] - start + 1,
+			  "*" if begin < warmupEnd else "") ]
+			for iColumn, times in enumerate(AllTimes):
+				stats = GroupStats(times, positions)
+				if iColumn == 0:
+					row.append(("%.3g" % (stats.n() / stats.sum()))
+					  if stats.sum() > 0. else "n/a")
+				# if
+				row.append(("%g\"" % stats.average()) if stats.n() > 0 else "n/a")
+			# for
+			OutputTable.AddRow(*row)
+		# for
+	# for
+	print >>stream, "Time series (bins of %d events; * = warm-up):" % BinSize
+	OutputTable.Print(stream)
+# PrintTimeSeriesReport()
+
+
+def PrintWarmupReport(Warmups, EventStats, bExcluded, stream = sys.stdout):
+	"""Prints the extent of the warm-up of each input."""
+	for path, start, end, warmupEnd in Warmups:
+		if warmupEnd > start:
+			print >>stream, "Warm-up of '%s': %d events, until %s%s" % (
+			  path, warmupEnd - start, EventStats.eventIndex[warmupEnd - 1],
+			  " (excluded from the statistics)" if bExcluded else "")
+		else:
+			print >>stream, "Warm-up of '%s': not detected" % path
+	# for
+# PrintWarmupReport()
+
+
+def PrintSlowestReport(AllStats, EventStats, stream = sys.stdout):
+	"""Prints the slowest events kept for each module and for whole events."""
+	OutputTable = TabularAlignmentClass()
+	for stats in itertools.chain(AllStats, ( EventStats, )):
+		name = str(stats.key)
+		for rank, (time, eventKey) in enumerate(stats.getSlowest(), 1):
+			OutputTable.AddRow(name, "#%d" % rank, "%g\"" % time, str(eventKey))
+			name = ""
+		# for
+	# for
+	print >>stream, "Slowest events:"
+	OutputTable.Print(stream)
+# PrintSlowestReport()
+
+
+#
+# performance budget
+#
+BudgetReportVersion = 1
+BudgetFailureExitCode = 3
+BudgetRegressionMetrics = ( "mean", "p99" )
+
+def ReadBudgetFile(BudgetFilePath):
+	"""Reads and checks a performance budget file (JSON).
+
+	The budget is a dictionary which can contain:
+	- 'modules': limits for each module, keyed by module name and instance
+	  ('Name[instance]'), by instance label alone, or '*' for all the modules
+	  not matched otherwise
+	- 'event': limits for the whole event
+	- 'baseline': path of a partial aggregate or columnar export file with the
+	  reference statistics (relative to the budget file directory)
+	- 'maxRegression': default largest allowed relative increase of the mean
+	  and p99 times with respect to the baseline
+	The limits are dictionaries with the largest allowed values of the metrics
+	(see StatsMetric()), in seconds, and optionally 'maxRegression'.
+	A FormatError is raised if the file is not valid.
+	"""
+	try:
+		with open(BudgetFilePath, 'r') as BudgetFile:
+			Budget = json.load(BudgetFile, object_pairs_hook=OrderedDict)
+	except ValueError, e:
+		raise FormatError("Budget file '%s' is not valid JSON (%s)"
+		  % (BudgetFilePath, e), type="Budget")
+	# try ... except
+	if not isinstance(Budget, dict):
+		raise FormatError("Budget file '%s' does not hold a dictionary"
+		  % BudgetFilePath, type="Budget")
+	# if
+	if not isinstance(Budget.get('modules', {}), dict):
+		raise FormatError("Budget file '%s': 'modules' is not a dictionary"
+		  % BudgetFilePath, type="Budget")
+	# if
+	if not isinstance(Budget.get('maxRegression', 0.), (int, float)):
+		raise FormatError("Budget file '%s': 'maxRegression' is not a number"
+		  % BudgetFilePath, type="Budget")
+	# if
+	if not isinstance(Budget.get('baseline', ""), basestring):
+		raise FormatError("Budget file '%s': 'baseline' is not a path"
+		  % BudgetFilePath, type="Budget")
+	# if
+	Limits = Budget.get('modules', {}).items()
+	if 'event' in Budget: Limits.append(( 'event', Budget['event'] ))
+	for name, limits in Limits:
+		if not isinstance(limits, dict):
+			raise FormatError("Budget file '%s': limits of '%s' are not a"
+			  " dictionary" % (BudgetFilePath, name), type="Budget")
+		# if
+		for metric, limit in limits.items():
+			if (metric != 'maxRegression') and not IsStatsMetric(metric):
+				raise FormatError("Budget file '%s': metric '%s' not supported"
+				  % (BudgetFilePath, metric), type="Budget")
+			# if
+			if not isinstance(limit, (int, float)):
+				raise FormatError("Budget file '%s': limit of '%s' is not a number"
+				  % (BudgetFilePath, metric), type="Budget")
+			# if
+		# for
+	# for
+	if Budget.get('baseline'):
+		Budget['baseline'] = os.path.join(
+		  os.path.dirname(BudgetFilePath), Budget['baseline'])
+	# if
+	return Budget
+# ReadBudgetFile()
+
+
+def IsStatsMetric(metric):
+	"""Returns whether metric is supported by StatsMetric()."""
+	return (metric in ( 'mean', 'max', 'total' )) or (metric
+	  in [ label for label, q in TimeModuleStatsClass.ReportedQuantiles ])
+# IsStatsMetric()
+
+
+def BudgetNeedsQuantiles(Budget):
+	"""Returns whether the budget has limits on quantiles of the times."""
+	Limits = Budget.get('modules', {}).values() + [ Budget.get('event', {}) ]
+	return bool(Budget.get('baseline')) or any(
+	  metric not in ( 'mean', 'max', 'total', 'maxRegression' )
+	  for limits in Limits for metric in limits)
+# BudgetNeedsQuantiles()
+
+
+def StatsMetric(stats, metric):
+	"""Returns the value of metric from stats (None if not available).
+
+	The metrics are 'mean', 'max', 'total' and the quantiles (e.g. 'p99', see
+	TimeModuleStatsClass.ReportedQuantiles). Without the quantile sketch, the
+	quantiles are computed from the single times, if tracked.
+	"""
+	if stats.n() == 0: return None
+	if metric == 'mean': return stats.average()
+	if metric == 'max': return stats.max()
+	if metric == 'total': return stats.sum()
+	q = dict(TimeModuleStatsClass.ReportedQuantiles)[metric]
+	value = stats.quantile(q)
+	if (value is None) and stats.isTrackingEntries():
+		times = sorted(time for time in stats.getTimes() if not math.isnan(time))
+		if times:
+			value = times[min(max(int(math.ceil(q * len(times))) - 1, 0),
+			  len(times) - 1)]
+		# if
+	# if
+	return value
+# StatsMetric()
+
+
+def ReadBaselineStats(BaselinePath):
+	"""Returns module and event statistics from a partial aggregate or export."""
+	if IsPartialAggregateFile(BaselinePath):
+		return ReadPartialAggregate(BaselinePath)
+	if IsColumnarExportFile(BaselinePath):
+		return ReadColumnarExport(BaselinePath)
+	raise FormatError("Baseline '%s' is neither a partial aggregate nor a"
+	  " columnar export file" % BaselinePath, type="Budget")
+# ReadBaselineStats()
+
+
+def CheckBudget(AllStats, EventStats, Budget):
+	"""Compares the statistics with a budget (see ReadBudgetFile()).
+
+	It returns the report of the check, as a dictionary with the overall
+	status ('pass' or 'fail'), the number of violations, the list of the
+	checks performed (each with module, metric, kind of check, value, limit
+	and status), and the modules of the budget which were not found.
+	A check of a metric which is not available (e.g. a quantile of a baseline
+	without them) has status 'unevaluated', and it counts as a violation.
+	"""
+	ModuleLimits = Budget.get('modules', {})
+	Baseline = ReadBaselineStats(Budget['baseline']) \
+	  if Budget.get('baseline') else None
+	BaselineStats = dict(( stats.key, stats ) for stats in Baseline[0]) \
+	  if Baseline else {}
+
+	def CheckStatus(value, limit):
+		if (value is None) or (limit is None): return 'unevaluated'
+		return 'pass' if value <= limit else 'fail'
+	# CheckStatus()
+
+	Checks = []
+	def Check(name, stats, limits, baselineStats):
+		for metric, limit in limits.items():
+			if metric == 'maxRegression': continue
+			value = StatsMetric(stats, metric)
+			Checks.append(OrderedDict([ ( 'module', name ), ( 'metric', metric ),
+			  ( 'kind', 'budget' ), ( 'value', value ), ( 'limit', limit ),
+			  ( 'status', CheckStatus(value, limit) ),
+			  ]))
+		# for
+		maxRegression = limits.get('maxRegression', Budget.get('maxRegression'))
+		if (baselineStats is None) or (maxRegression is None): return
+		for metric in BudgetRegressionMetrics:
+			value = StatsMetric(stats, metric)
+			reference = StatsMetric(baselineStats, metric)
+			limit = None if reference is None else reference * (1. + maxRegression)
+			Checks.append(OrderedDict([ ( 'module', name ), ( 'metric', metric ),
+			  ( 'kind', 'regression' ), ( 'value', value ), ( 'limit', limit ),
+			  ( 'baseline', reference ),
+			  ( 'status', CheckStatus(value, limit) ),
+			  ]))
+		# for
+	# Check()
+
+	Found = set()
+	for stats in AllStats:
+		for name in ( str(stats.key), stats.key.instance(), '*' ):
+			if name in ModuleLimits: break
+		else: name = None
+		Found.add(name)
+		limits = ModuleLimits.get(name, {})
+		if not limits and (Budget.get('maxRegression') is None): continue
+		Check(str(stats.key), stats, limits, BaselineStats.get(stats.key))
+	# for
+	if ('event' in Budget) or (Baseline and Budget.get('maxRegression')):
+		Check(str(EventStats.key), EventStats, Budget.get('event', {}),
+		  Baseline[1] if Baseline else None)
+	# if
+
+	nViolations = sum(1 for check in Checks if check['status'] != 'pass')
+	Report = OrderedDict()
+	Report['version'] = BudgetReportVersion
+	Report['status'] = 'fail' if nViolations else 'pass'
+	Report['violations'] = nViolations
+	Report['unevaluated'] = \
+	  sum(1 for check in Checks if check['status'] == 'unevaluated')
+	Report['events'] = EventStats.n()
+	Report['checks'] = Checks
+	Report['missing'] = [ name for name in ModuleLimits
+	  if (name != '*') and (name not in Found) ]
+	return Report
+# CheckBudget()
+
+
+def WriteBudgetReport(Report, stream = sys.stdout):
+	"""Writes the report from CheckBudget() in JSON format."""
+	json.dump(Report, stream, indent=1, separators=(',', ': '))
+	print >>stream
+# WriteBudgetReport()
+
+
+#
+# A/B comparison
+#
+# two-sided 95% quantiles of the Student t distribution with few d.o.f.
+StudentT95Table = ( None, 12.706, 4.303, 3.182, 2.776 )
+
+def StudentT95(dof):
+	"""Returns the two-sided 95% quantile of Student t with dof d.o.f.
+
+	Beyond the table, the Cornish-Fisher expansion around the normal quantile
+	is used (better than 1% from 5 degrees of freedom on).
+	"""
+	if dof < 1.: return None
+	if dof < len(StudentT95Table): return StudentT95Table[int(dof)]
+	z = 1.959964
+	return z + (z**3 + z) / (4. * dof) \
+	  + (5. * z**5 + 16. * z**3 + 3. * z) / (96. * dof**2)
+# StudentT95()
+
+
+def PairedEventPositions(BaselineEvents, CandidateEvents,
+  BaselineSkip = (), CandidateSkip = ()):
+	"""Returns the positions of the events present in both groups.
+
+	The arguments are the per-event statistics of the two groups (which must
+	be tracking the entries); the events in the skip ranges (as in
+	TimeModuleStatsClass.recomputeStats()) of either group are excluded.
+	The result is a pair of arrays, with the positions of the common events in
+	the baseline and in the candidate event index.
+	"""
+	def Skipped(skip):
+		return set(itertools.chain(*[ xrange(*range_) for range_ in skip ]))
+	BaselineSkipped = Skipped(BaselineSkip)
+	CandidateSkipped = Skipped(CandidateSkip)
+	BaselineIndex = BaselineEvents.eventIndex
+	nBaseline = BaselineEvents.nEntries()
+	BaselinePositions, CandidatePositions = array.array('l'), array.array('l')
+	for pos, eventKey in enumerate(CandidateEvents.getEvents()):
+		if pos in CandidateSkipped: continue
+		basePos = BaselineIndex.find(eventKey)
+		if (basePos is None) or (basePos >= nBaseline) \
+		  or (basePos in BaselineSkipped):
+			continue
+		# if
+		BaselinePositions.append(basePos)
+		CandidatePositions.append(pos)
+	# for
+	return BaselinePositions, CandidatePositions
+# PairedEventPositions()
+
+
+def PairedDifferences(BaselineTimes, CandidateTimes, Pairs):
+	"""Returns the Stats of the time differences (candidate minus baseline).
+
+	Pairs are the positions of the same events in the two arrays of times, as
+	from PairedEventPositions(); events missing in either are skipped.
+	"""
+	differences = Stats()
+	nBaseline, nCandidate = len(BaselineTimes), len(CandidateTimes)
+	for basePos, pos in itertools.izip(*Pairs):
+		if (basePos >= nBaseline) or (pos >= nCandidate): continue
+		delta = CandidateTimes[pos] - BaselineTimes[basePos]
+		if not math.isnan(delta): differences.add(delta)
+	# for
+	return differences
+# PairedDifferences()
+
+
+class StatsComparisonClass(object):
+	"""Comparison of the times of a module between baseline and candidate.
+
+	The difference is between the average times, candidate minus baseline,
+	with the half width of its 95% confidence interval. If enough of the
+	events are in both groups (differences is the Stats of their paired time
+	differences), the difference and its interval are from the paired
+	differences, which cancel the variations due to the content of the events;
+	otherwise the groups are treated as independent samples (Welch interval,
+	or the intervals of sampled inputs combined).
+	The impact is the change in the time the module adds to the average event
+	of the job. The statistics of a group where the module is missing are None.
+	"""
+	MinPairedFraction = 0.5 # of the events in the smaller group
+
+	def __init__(self, key, baseline, candidate,
+	  nBaselineEvents, nCandidateEvents, differences = None):
+		self.key = key
+		self.baseline = baseline
+		self.candidate = candidate
+		self.nPaired = 0
+		self.delta = None
+		self.halfWidth = None
+		self.impact = self.costPerEvent(candidate, nCandidateEvents) \
+		  - self.costPerEvent(baseline, nBaselineEvents)
+		if (baseline is None) or (candidate is None) \
+		  or (baseline.n() == 0) or (candidate.n() == 0):
+			return
+		# if
+		if (differences is not None) and (differences.n() >= 2) \
+		  and (differences.n()
+		    >= self.MinPairedFraction * min(baseline.n(), candidate.n())):
+			self.nPaired = differences.n()
+			self.delta = differences.average()
+			self.halfWidth = StudentT95(differences.n() - 1) \
+			  * differences.stdev() / math.sqrt(differences.n())
+		else:
+			self.delta = candidate.average() - baseline.average()
+			self.halfWidth = self.independentHalfWidth(baseline, candidate)
+		# if ... else
+	# __init__()
+
+	@staticmethod
+	def costPerEvent(stats, nEvents):
+		"""Returns the time the module adds to the average event."""
+		if (stats is None) or (nEvents == 0): return 0.
+		return stats.sum() / nEvents
+	# costPerEvent()
+
+	@staticmethod
+	def independentHalfWidth(baseline, candidate):
+		"""Returns the interval half width of the difference of the averages."""
+		if (baseline.sampling is not None) or (candidate.sampling is not None):
+			halfWidths = ( baseline.meanHalfWidth(), candidate.meanHalfWidth() )
+			if None in halfWidths: return None
+			return math.sqrt(halfWidths[0]**2 + halfWidths[1]**2)
+		# if
+		if (baseline.n() < 2) or (candidate.n() < 2): return None
+		baseVar = baseline.stdev()**2 / baseline.n()
+		candVar = candidate.stdev()**2 / candidate.n()
+		if baseVar + candVar == 0.: return 0.
+		dof = (baseVar + candVar)**2 / (baseVar**2 / (baseline.n() - 1)
+		  + candVar**2 / (candidate.n() - 1))
+		return StudentT95(dof) * math.sqrt(baseVar + candVar)
+	# independentHalfWidth()
+
+	def isPaired(self): return self.nPaired > 0
+
+	def relative(self):
+		"""Returns the difference relative to the baseline average (or None)."""
+		if (self.delta is None) or (self.baseline.average() == 0.): return None
+		return self.delta / self.baseline.average()
+	# relative()
+
+	def verdict(self):
+		"""Returns a short description of the change."""
+		if (self.baseline is None) or (self.baseline.n() == 0): return "new"
+		if (self.candidate is None) or (self.candidate.n() == 0): return "removed"
+		if self.halfWidth is None: return "?"
+		if self.delta - self.halfWidth > 0.: return "slower"
+		if self.delta + self.halfWidth < 0.: return "faster"
+		return ""
+	# verdict()
+
+	def FormatAsList(self):
+		def Average(stats):
+			return ("%g\"" % stats.average()) \
+			  if (stats is not None) and (stats.n() > 0) else "n/a"
+		# Average()
+		relative = self.relative()
+		return [
+		  str(self.key),
+		  Average(self.baseline), Average(self.candidate),
+		  ("%+g\"" % self.delta) if self.delta is not None else "n/a",
+		  ("+/- %g\"" % self.halfWidth) if self.halfWidth is not None else "",
+		  ("%+.1f%%" % (relative * 100.)) if relative is not None else "",
+		  "%+g\"" % self.impact,
+		  ("paired (%d)" % self.nPaired) if self.isPaired() else "independent",
+		  self.verdict(),
+		  ]
+	# FormatAsList()
+
+# class StatsComparisonClass
+
+
+def CompareStats(BaselineStats, BaselineEvents, CandidateStats, CandidateEvents,
+  BaselineSkip = (), CandidateSkip = ()):
+	"""Compares the statistics of the candidate with the ones of the baseline.
+
+	The events of the two groups are matched by their key (EventKeyClass), and
+	the modules tracking the single events are compared event by event on the
+	common ones (excluding the ones in the skip ranges).
+	It returns the list of StatsComparisonClass for the modules, sorted by
+	decreasing absolute impact, and the one for the whole events.
+	"""
+	Pairs = None
+	if BaselineEvents.isTrackingEntries() and CandidateEvents.isTrackingEntries():
+		Pairs = PairedEventPositions(BaselineEvents, CandidateEvents,
+		  BaselineSkip=BaselineSkip, CandidateSkip=CandidateSkip)
+	# if
+
+	def Compare(key, baseline, candidate):
+		differences = None
+		if Pairs and (baseline is not None) and (candidate is not None) \
+		  and baseline.isTrackingEntries() and candidate.isTrackingEntries() \
+		  and (baseline.eventIndex is BaselineEvents.eventIndex) \
+		  and (candidate.eventIndex is CandidateEvents.eventIndex):
+			differences = PairedDifferences \
+			  (baseline.getTimes(), candidate.getTimes(), Pairs)
+		# if
+		return StatsComparisonClass(key, baseline, candidate,
+		  BaselineEvents.n(), CandidateEvents.n(), differences)
+	# Compare()
+
+	Keys = [ stats.key for stats in CandidateStats ] + [ stats.key
+	  for stats in BaselineStats if stats.key not in CandidateStats.moduleStats ]
+	Comparisons = [ Compare(key, BaselineStats.moduleStats.get(key),
+	  CandidateStats.moduleStats.get(key)) for key in Keys ]
+	Comparisons.sort(key=lambda comparison: -abs(comparison.impact))
+	return Comparisons, \
+	  Compare(CandidateEvents.key, BaselineEvents, CandidateEvents)
+# CompareStats()
+
+
+def PrintCompareReport(Comparisons, EventComparison, stream = sys.stdout):
+	"""Prints the comparisons from CompareStats(), the whole events last."""
+	OutputTable = TabularAlignmentClass()
+	OutputTable.AddRow("Module", "baseline", "candidate", "difference",
+	  "95% C.L.", "relative", "impact/event", "events", "")
+	OutputTable.AddData([ comparison.FormatAsList()
+	  for comparison in itertools.chain(Comparisons, ( EventComparison, )) ])
+	print >>stream, ("Comparison of %d candidate events with %d baseline events"
+	  " (%d paired), modules sorted by impact on the event time:") % (
+	  EventComparison.candidate.n(), EventComparison.baseline.n(),
+	  EventComparison.nPaired)
+	OutputTable.Print(stream)
+# PrintCompareReport()
+
+
+def RewriteReport(OutputFilePath, AllStats, EventStats, options):
+	"""Replaces the content of OutputFilePath with a new report.
+
+	The report is written into a temporary file first, which then replaces the
+	old one, so that the file is never seen half-written.
+	"""
+	TempFilePath = OutputFilePath + ".tmp"
+	with open(TempFilePath, 'w') as OutputFile:
+		PrintReport(AllStats, EventStats, options, stream=OutputFile)
+	os.rename(TempFilePath, OutputFilePath)
+# RewriteReport()
+
+
 ################################################################################
 ### main program
 ###
@@ -864,23 +4718,148 @@ if __name__ == "__main__":
 
 	# positional arguments
 	Parser.add_argument("LogFiles", metavar="LogFile", nargs="+",
-	  help="log file to be parsed")
+	  help="log file to be parsed (or art TimeTracker or MemoryTracker database,"
+	  " partial aggregate or columnar export file)")
 
 	# options
 	Parser.add_argument("--eventtable", dest="PresentMode", action="store_const",
 	  const="EventTable", help="do not group the pages by node")
+	Parser.add_argument("--eventtable-format", dest="EventTableFormat",
+	  choices=[ 'table', 'csv', 'tsv' ], default='table',
+	  help="format of the event table: an aligned table with a row per module,"
+	  " or CSV or TSV with a row per event, written while formatted"
+	  " [%(default)s]")
 	Parser.add_argument("--allowduplicates", '-D', dest="CheckDuplicates",
 	  action="store_false", help="do not check for duplicate entries")
 	Parser.add_argument("--maxevents", dest="MaxEvents", type=int, default=-1,
 	  help="limit the number of parsed events to this (negative: no limit)")
 	Parser.add_argument("--permissive", dest="Permissive", action="store_true",
 	  help="treats input errors as non-fatal [%(default)s]")
+	Parser.add_argument("--jobs", "-j", dest="Jobs", type=int, default=1,
+	  help="number of input files parsed in parallel [%(default)s]")
+	Parser.add_argument("--pipeline", dest="Pipeline", metavar="N", type=int,
+	  default=0, help="read, scan (with N worker processes) and aggregate each"
+	  " log at the same time, e.g. to overlap decompression and parsing; also"
+	  " applies to the logs parsed through the cache (--cache); can't be used"
+	  " with --jobs or --approx")
+	Parser.add_argument("--sidecar", dest="WriteSidecar", action="store_true",
+	  help="write the statistics of each log in a partial aggregate file next"
+	  " to it (LogFile" + PartialAggregateSuffix + "), that can be used as"
+	  " input in place of the log")
+	Parser.add_argument("--writepartial", dest="PartialOutput", metavar="FILE",
+	  help="write the statistics of all the input in a partial aggregate file")
+	Parser.add_argument("--export", dest="ColumnarOutput", metavar="FILE",
+	  help="write the time of each module in each event in a binary columnar"
+	  " file (e.g. " + ColumnarExportSuffix + "), that can be used as input in"
+	  " place of the logs")
+	Parser.add_argument("--groupby", dest="GroupBy",
+	  choices=[ 'run', 'subrun' ], help="also report the average times of each"
+	  " module in each run (with 'subrun', also in each subrun of each run)")
+	Parser.add_argument("--timeseries", dest="TimeSeries", metavar="N",
+	  type=int, default=0, help="also report throughput and average module"
+	  " times in bins of N events along each input, marking the warm-up")
+	Parser.add_argument("--skipwarmup", dest="SkipWarmup", action="store_true",
+	  help="detect the warm-up events at the beginning of each input (MSER-5"
+	  " rule on the event times) and exclude them from the statistics")
+	Parser.add_argument("--slowest", dest="Slowest", metavar="K", type=int,
+	  default=0, help="also report the K slowest events of each module and"
+	  " of the whole job")
+	Parser.add_argument("--approx", dest="Approx", metavar="FRACTION",
+	  type=float, help="read only about this fraction of each uncompressed log,"
+	  " in regions spread along it, and report a confidence interval on the"
+	  " averages (compressed logs are read in full)")
+	Parser.add_argument("--budget", dest="BudgetFile", metavar="FILE",
+	  help="check the times against the limits in this JSON file, print a JSON"
+	  " report instead of the usual one and exit with code %d on violations"
+	  " (including limits on metrics which are not available)"
+	  % BudgetFailureExitCode)
+	Parser.add_argument("--budgetreport", dest="BudgetReport", metavar="FILE",
+	  help="write the JSON report of the budget check into FILE, and print the"
+	  " usual report")
+	Parser.add_argument("--compare", dest="CompareFiles", metavar="LOG",
+	  action="append", help="compare the times with the ones from this input"
+	  " (the baseline; the option can be repeated): the difference of the"
+	  " average time of each module is reported with its confidence interval,"
+	  " from the single differences of the events found in both")
+	Parser.add_argument("--percentiles", "-p", dest="Percentiles",
+	  action="store_true", help="also show approximate median, 90%%, 99%% and"
+	  " 99.9%% percentiles of the times (within 1%%)")
+	Parser.add_argument("--cache", dest="CacheDir", metavar="DIR",
+	  default=os.environ.get("SORTMODULETIMES_CACHE", None),
+	  help="keep the parsing results of each log in DIR, and reuse them while"
+	  " the log is unchanged (or only grown) [from SORTMODULETIMES_CACHE"
+	  " environment variable: %(default)s]")
+	Parser.add_argument("--cachesize", dest="CacheSize", metavar="MB",
+	  type=float, default=1024.,
+	  help="maximum size of the cache, in megabytes [%(default)s]")
+	Parser.add_argument("--follow", "-f", dest="Follow", action="store_true",
+	  help="keep reading the (uncompressed) log while it grows, and print the"
+	  " statistics periodically; the final statistics are printed also when"
+	  " interrupted (Ctrl-C) or terminated (SIGTERM)")
+	Parser.add_argument("--reportinterval", dest="ReportInterval", type=float,
+	  default=60., help="in follow mode, print the statistics every this many"
+	  " seconds (0 to disable) [%(default)s]")
+	Parser.add_argument("--reportevents", dest="ReportEvents", type=int,
+	  default=0, help="in follow mode, print the statistics every this many"
+	  " events (0 to disable) [%(default)s]")
+	Parser.add_argument("--idletimeout", dest="IdleTimeout", type=float,
+	  default=0., help="in follow mode, stop when the log does not grow for"
+	  " this many seconds (0: follow until interrupted) [%(default)s]")
+	Parser.add_argument("--reportfile", dest="ReportFile", metavar="FILE",
+	  help="in follow mode, rewrite the statistics into FILE rather than"
+	  " printing them")
+	Parser.add_argument("--self-profile", dest="SelfProfileReport",
+	  action="store_true", help="print on screen the time spent in each"
+	  " processing phase and the input counters, for each input file")
+	Parser.add_argument("--self-profile-log", dest="SelfProfileLog",
+	  metavar="FILE", help="append the self-profile information to FILE, as a"
+	  " JSON record in a single line")
 	Parser.add_argument('--version', action='version', version=Version)
 
 	options = Parser.parse_args()
 
-	if options.PresentMode in ( 'EventTable', ):
-		options.CheckDuplicates = True
+	if options.Follow and (len(options.LogFiles) != 1):
+		Parser.error("--follow requires exactly one log file")
+	if options.Follow:
+		try: Decompressor = DetectCompression(options.LogFiles[0])
+		except EnvironmentError: Decompressor = None # reported when parsing
+		if Decompressor is not None:
+			Parser.error("--follow requires an uncompressed log ('%s' is %s data)"
+			  % (options.LogFiles[0], Decompressor.name))
+		# if
+	# if
+	if options.ColumnarOutput and not options.CheckDuplicates:
+		Parser.error("--export requires the single events, and it can't be used"
+		  " with --allowduplicates")
+	# if
+	if ((options.TimeSeries > 0) or options.SkipWarmup) \
+	  and not options.CheckDuplicates:
+		Parser.error("--timeseries and --skipwarmup require the single events,"
+		  " and they can't be used with --allowduplicates")
+	# if
+
+	if (options.Pipeline > 0) and (options.Jobs > 1):
+		Parser.error("--pipeline can't be used with --jobs")
+	if (options.Pipeline > 0) and (options.Approx is not None):
+		Parser.error("--pipeline can't be used with --approx")
+	if (options.Approx is not None) and not (0. < options.Approx <= 1.):
+		Parser.error("--approx requires a fraction larger than 0 and up to 1")
+	if (options.Approx is not None) and (options.Follow or options.ColumnarOutput):
+		Parser.error("--approx can't be used with --follow or --export")
+	if options.CompareFiles and options.Follow:
+		Parser.error("--compare can't be used with --follow")
+	# if
+
+	if options.BudgetReport and not options.BudgetFile:
+		Parser.error("--budgetreport requires --budget")
+	Budget = None
+	if options.BudgetFile:
+		try: Budget = ReadBudgetFile(options.BudgetFile)
+		except (EnvironmentError, FormatError), e: Parser.error(str(e))
+		if BudgetNeedsQuantiles(Budget): options.Percentiles = True
+	# if
+
+	if NeedsSingleEvents(options): options.CheckDuplicates = True
 
 	###
 	### parse all inputs, collect the information
@@ -889,57 +4868,141 @@ if __name__ == "__main__":
 	# per-module statistics
 	AllStats = JobStatsClass( )
 	# per-event statistics
-	EventStats = TimeModuleStatsClass \
-	  ("=== events ===", bTrackEntries=options.CheckDuplicates)
+	EventStats = CreateEventStats(options)
 
-	class NoMoreInput: pass
+	def PeriodicReport():
+		with SelfProfile.job.timer('report'):
+			if options.ReportFile:
+				RewriteReport(options.ReportFile, AllStats, EventStats, options)
+			else:
+				print "=== %s: %d events ===" \
+				  % (time.strftime("%Y-%m-%d %H:%M:%S"), EventStats.n())
+				PrintReport(AllStats, EventStats, options)
+				print
+				sys.stdout.flush()
+			# if ... else
+		# with
+	# PeriodicReport()
+
+	def EmitSelfProfile():
+		if options.SelfProfileReport: SelfProfile.report(sys.stderr)
+		if options.SelfProfileLog:
+			Record = SelfProfile.toDict(
+			  analyzer=Version % { 'prog': os.path.basename(sys.argv[0]) },
+			  argv=sys.argv[1:], jobs=options.Jobs,
+			  )
+			with open(options.SelfProfileLog, 'a') as ProfileLog:
+				json.dump(Record, ProfileLog, separators=(',', ':'))
+				print >>ProfileLog
+			# with
+		# if
+	# EmitSelfProfile()
 
 	nErrors = 0
+	InputStarts = []
 	try:
 		if options.MaxEvents == 0: raise NoMoreInput # wow, that was quick!
-		for LogFilePath in options.LogFiles:
-			nErrors += ParseInputFile(LogFilePath, AllStats, EventStats, options)
-
+		if options.Follow:
+			InputStarts.append(( options.LogFiles[0], 0 ))
+			nErrors += FollowInputFile(options.LogFiles[0],
+			  AllStats, EventStats, options, PeriodicReport)
+		else:
+			nErrors += ParseInputFiles(options.LogFiles, AllStats, EventStats,
+			  options, InputStarts=InputStarts)
+		# if ... else
 	except NoMoreInput: pass
 
+	Warmups = None
+	if (options.TimeSeries > 0) or options.SkipWarmup:
+		Warmups = FindWarmups(EventStats, InputStarts)
+		if options.SkipWarmup: ExcludeWarmups(AllStats, EventStats, Warmups)
+	# if
+
+	# the baseline of the comparison is collected in the same way
+	if options.CompareFiles:
+		BaselineStats = JobStatsClass()
+		BaselineEvents = CreateEventStats(options)
+		BaselineStarts = []
+		try:
+			if options.MaxEvents == 0: raise NoMoreInput
+			nErrors += ParseInputFiles(options.CompareFiles,
+			  BaselineStats, BaselineEvents, options, InputStarts=BaselineStarts)
+		except NoMoreInput: pass
+		BaselineWarmups = []
+		if options.SkipWarmup:
+			BaselineWarmups = FindWarmups(BaselineEvents, BaselineStarts)
+			ExcludeWarmups(BaselineStats, BaselineEvents, BaselineWarmups)
+		# if
+	# if
+
 	# give a bit of separation between error messages and actual output
 	if nErrors > 0: print >>sys.stderr
 
+	if options.PartialOutput:
+		WritePartialAggregate(options.PartialOutput, AllStats, EventStats)
+	if options.ColumnarOutput:
+		WriteColumnarExport(options.ColumnarOutput, AllStats, EventStats)
+
 	###
 	### print the results
 	###
-	if (AllStats.MaxEvents() == 0) and (EventStats.nEntries() == 0):
+	if (AllStats.MaxEvents() == 0) and (EventStats.nEntries() == 0) \
+	  and not EventStats.hasMemory():
 		print "No time statistics found."
+		EmitSelfProfile()
 		sys.exit(1)
 	# if
 
-	OutputTable = TabularAlignmentClass()
-
-	# present results
-	if options.PresentMode == "ModTable":
-		# fill the module stat data into the table
-		OutputTable.AddData([ stats.FormatStatsAsList() for stats in AllStats ])
-		# then the event data
-		OutputTable.AddRow(*EventStats.FormatStatsAsList())
-	elif options.PresentMode == "EventTable":
-		# set some table formatting options
-		OutputTable.SetRowFormats \
-		  (OutputTable.LineNo(0), [ None, { 'align': 'center' }])
-		# header row
-		OutputTable.AddRow("Module", *range(AllStats.MaxEvents()))
-		# fill the module stat data into the table
-		OutputTable.AddData([ stats.FormatTimesAsList() for stats in AllStats ])
-		# then the event data
-		OutputTable.AddRow(*EventStats.FormatTimesAsList())
-	else:
-		raise RuntimeError("Presentation mode %r not known" % options.PresentMode)
+	BudgetReport = None
+	if Budget is not None:
+		with SelfProfile.job.timer('report'):
+			BudgetReport = CheckBudget(AllStats, EventStats, Budget)
+			if options.BudgetReport:
+				with open(options.BudgetReport, 'w') as ReportFile:
+					WriteBudgetReport(BudgetReport, ReportFile)
+			else:
+				WriteBudgetReport(BudgetReport)
+		# with
+	# if
 
-	OutputTable.Print()
+	# the budget report on screen replaces the usual one
+	if (Budget is None) or options.BudgetReport:
+		with SelfProfile.job.timer('report'):
+			if options.CompareFiles:
+				PrintCompareReport(*CompareStats(
+				  BaselineStats, BaselineEvents, AllStats, EventStats,
+				  BaselineSkip=[ ( start, warmupEnd )
+				    for path, start, end, warmupEnd in BaselineWarmups ],
+				  CandidateSkip=[ ( start, warmupEnd ) for path, start, end, warmupEnd
+				    in (Warmups if options.SkipWarmup else []) ],
+				  ))
+			elif options.Follow and options.ReportFile:
+				RewriteReport(options.ReportFile, AllStats, EventStats, options)
+			else:
+				PrintReport(AllStats, EventStats, options)
+			if options.TimeSeries > 0:
+				print
+				PrintTimeSeriesReport \
+				  (AllStats, EventStats, options.TimeSeries, Warmups)
+			# if
+			if Warmups is not None:
+				print
+				PrintWarmupReport(Warmups, EventStats, options.SkipWarmup)
+			# if
+		# with
+	# if
+	EmitSelfProfile()
 
 	###
 	### say goodbye
 	###
 	if nErrors > 0:
 		print >>sys.stderr, "%d errors were found in the input files." % nErrors
+	if BudgetReport and (BudgetReport['status'] != 'pass'):
+		print >>sys.stderr, "%d violations of the performance budget" \
+		  " (%d checks could not be evaluated)." \
+		  % (BudgetReport['violations'], BudgetReport['unevaluated'])
+		sys.exit(BudgetFailureExitCode)
+	# if
 	sys.exit(nErrors)
 # main
@@ -0,0 +1,462 @@
+#!/usr/bin/env python2
+#
+# Brief:  finds mangled or demangled symbols in the libraries in LD_LIBRARY_PATH
+# Date:   20261018
+#
+# Run with '--help' argument for usage instructions.
+#
+# The symbols of the libraries are kept in a persistent index (an SQLite
+# database), which is updated at each call, scanning again with `nm` only the
+# libraries that were added or changed since the last time; the libraries are
+# scanned by a pool of processes. The lookups are then answered from the index.
+#
+# This is a replacement of find_global_symbol.sh, with the same options.
+#
+# Version:
+# 1.0 (20261018)
+#   first version, with the options of find_global_symbol.sh
+# 1.1 (20261018)
+#   index in memory when the one on disk is not usable; libraries changed
+#   during their scan are scanned again at the next update
+#
+
+import sys, os
+import subprocess
+import multiprocessing
+import sqlite3
+import glob
+
+
+__doc__ = """Finds mangled or demangled symbols in the libraries within
+LD_LIBRARY_PATH (and DYLD_LIBRARY_PATH), using an index of their symbols."""
+Version = "%(prog)s 1.1"
+
+IndexVersion = 1 # version of the schema of the index database
+
+LibraryPatterns = ( "*.so", "*.dylib" )
+
+bDarwin = os.uname()[0] == "Darwin"
+
+# on Mac OS X, only the external symbols are listed (as the script always did)
+NMCommand = [ "nm", "-g" ] if bDarwin else [ "nm" ]
+# for stripped libraries, which have only the dynamic symbol table
+NMDynamicCommand = None if bDarwin else [ "nm", "-D" ]
+DemangleCommand = [ "c++filt" ]
+
+SymbolTypes = [
+	( "A", "the value is absolute, and will not be changed by further linking" ),
+	( "B", "in the uninitialized data section (BSS)" ),
+	( "C", "common (uninitialized data)" ),
+	( "D", "in the initialized data section" ),
+	( "G", "in an initialized data section for small objects" ),
+	( "I", "an indirect reference to another symbol" ),
+	( "N", "a debugging symbol" ),
+	( "R", "in a read only data section" ),
+	( "S", "in an uninitialized data section for small objects"
+	       " (Mac OS X: other section, e.g. typeinfo)" ),
+	( "T", "in the text (code) section" ),
+	( "U", "undefined (required here, defined elsewhere)" ),
+	( "V", "a weak object" ),
+	( "W", "a weak symbol that has not been specifically tagged as a weak"
+	       " object symbol" ),
+	( "-", "a stabs symbol in an a.out object file" ),
+	( "?", "of unknown type, or object file format specific" ),
+	]
+
+
+def DefaultIndexPath():
+	"""Returns the default path of the symbol index database."""
+	CacheDir = os.environ.get("XDG_CACHE_HOME") \
+	  or os.path.join(os.path.expanduser("~"), ".cache")
+	return os.path.join(CacheDir, "find_global_symbol", "index.sqlite")
+# DefaultIndexPath()
+
+
+def LibraryDirectories(options):
+	"""Returns the list of directories to be searched, in order.
+
+	The directories are from LD_LIBRARY_PATH and DYLD_LIBRARY_PATH; '.', the
+	non-existing ones, the duplicates and (unless options.AllLibs is set)
+	/usr/lib are skipped.
+	"""
+	Dirs = []
+	for Path in ":".join(( os.environ.get("LD_LIBRARY_PATH", ""),
+	  os.environ.get("DYLD_LIBRARY_PATH", "") )).split(":"):
+		if not Path or (Path in Dirs): continue
+		if (Path == ".") or not os.path.isdir(Path) \
+		  or (not options.AllLibs and (Path == "/usr/lib")):
+			if options.Verbose > 0: print "Skipping %s" % Path
+			continue
+		# if
+		Dirs.append(Path)
+	# for
+	return Dirs
+# LibraryDirectories()
+
+
+def ListLibraries(Dir):
+	"""Returns the sorted list of the paths of the libraries in Dir."""
+	Libraries = set()
+	for Pattern in LibraryPatterns:
+		Libraries.update(glob.glob(os.path.join(Dir, Pattern)))
+	return sorted(Libraries)
+# ListLibraries()
+
+
+def ParseNMOutput(Output):
+	"""Returns a list of ( type, mangled name ) from the output of nm."""
+	Symbols = []
+	for line in Output.splitlines():
+		Tokens = line.split()
+		if len(Tokens) == 2: # undefined symbols have no address
+			Symbols.append(( Tokens[0], Tokens[1] ))
+		elif len(Tokens) == 3:
+			Symbols.append(( Tokens[1], Tokens[2] ))
+	# for
+	return Symbols
+# ParseNMOutput()
+
+
+def Demangle(Names):
+	"""Returns the list of the demangled Names (unchanged if not possible)."""
+	if not Names: return []
+	try:
+		Process = subprocess.Popen(DemangleCommand,
+		  stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+		Output = Process.communicate("\n".join(Names) + "\n")[0]
+	except OSError: return list(Names)
+	Demangled = Output.splitlines()
+	if (Process.returncode != 0) or (len(Demangled) != len(Names)):
+		return list(Names)
+	return Demangled
+# Demangle()
+
+
+def RunNM(Command, Path):
+	"""Returns the symbols listed by the nm Command, and an error message."""
+	try:
+		Process = subprocess.Popen(Command + [ Path ],
+		  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		Output, Error = Process.communicate()
+	except OSError, e:
+		return [], "can't run %s (%s)" % (Command[0], e)
+	if Process.returncode != 0:
+		return [], Error.strip() or ("%s failed" % " ".join(Command))
+	return ParseNMOutput(Output), None
+# RunNM()
+
+
+def ScanLibrary(Path):
+	"""Returns the symbols of the library at Path.
+
+	This is the unit of work of the pool of processes in UpdateIndex().
+	The result is a tuple with the path, the ( modification time, size ) of
+	the library before the scan (None if it is not there any more), an error
+	message (None on success), and a list of ( type, mangled name, demangled
+	name ) for each symbol.
+	If the library has no symbol table (it was stripped), the symbols from the
+	dynamic symbol table are returned instead.
+	"""
+	# the library may be rebuilt during the scan: what is recorded in the index
+	# is the state it was in before, so that the next update scans it again
+	try: Info = os.stat(Path)
+	except OSError: return Path, None, None, []
+	State = ( Info.st_mtime, Info.st_size )
+	Symbols, Error = RunNM(NMCommand, Path)
+	if Error is not None: return Path, State, Error, []
+	if not Symbols and NMDynamicCommand:
+		Symbols, Error = RunNM(NMDynamicCommand, Path)
+		if Error is not None: return Path, State, Error, []
+	# if
+	Demangled = Demangle([ name for type_, name in Symbols ])
+	return Path, State, None, [ ( type_, name, demangled )
+	  for ( type_, name ), demangled in zip(Symbols, Demangled) ]
+# ScanLibrary()
+
+
+class SymbolIndexClass(object):
+	"""Persistent index of the symbols of libraries.
+
+	The index is an SQLite database with a table of the libraries (path,
+	modification time and size when they were scanned) and one of their
+	symbols (type, mangled and demangled name).
+	If the index can't be created or written at IndexPath (e.g. read-only or
+	missing home directory), a warning is printed and an index in memory is
+	used instead, which is filled by scanning all the libraries.
+	"""
+	def __init__(self, IndexPath):
+		try: self.open(IndexPath)
+		except (OSError, sqlite3.Error), e:
+			print >>sys.stderr, "Warning: can't use the index at '%s' (%s):" \
+			  " scanning all the libraries" % (IndexPath, e)
+			self.open(":memory:")
+		# try ... except
+	# __init__()
+
+	def open(self, IndexPath):
+		"""Opens the index at IndexPath, checking that it can be written."""
+		if IndexPath != ":memory:":
+			Dir = os.path.dirname(IndexPath)
+			if Dir and not os.path.isdir(Dir): os.makedirs(Dir)
+		# if
+		self.connection = sqlite3.connect(IndexPath)
+		self.connection.text_factory = str
+		try:
+			if self.connection.execute("PRAGMA user_version").fetchone()[0] \
+			  != IndexVersion:
+				self.createSchema()
+			else: # still, make sure we can write it
+				with self.connection:
+					self.connection.execute("PRAGMA user_version = %d" % IndexVersion)
+			# if ... else
+		except sqlite3.Error:
+			self.connection.close()
+			raise
+		# try ... except
+	# open()
+
+	def createSchema(self):
+		"""(Re)creates the tables of the index, empty."""
+		with self.connection:
+			self.connection.executescript("""
+			  DROP TABLE IF EXISTS Symbols;
+			  DROP TABLE IF EXISTS Libraries;
+			  CREATE TABLE Libraries (
+			    ID INTEGER PRIMARY KEY, Path TEXT UNIQUE, MTime REAL, Size INTEGER,
+			    Error TEXT
+			    );
+			  CREATE TABLE Symbols (
+			    Library INTEGER, Type TEXT, Mangled TEXT, Demangled TEXT
+			    );
+			  CREATE INDEX SymbolsByMangled ON Symbols (Mangled);
+			  CREATE INDEX SymbolsByDemangled ON Symbols (Demangled);
+			  CREATE INDEX SymbolsByLibrary ON Symbols (Library);
+			""")
+			self.connection.execute("PRAGMA user_version = %d" % IndexVersion)
+		# with
+	# createSchema()
+
+	def staleLibraries(self, Paths):
+		"""Returns the paths which are not in the index as they are now."""
+		Known = dict(( Path, ( MTime, Size ) ) for Path, MTime, Size
+		  in self.connection.execute("SELECT Path, MTime, Size FROM Libraries"))
+		Stale = []
+		for Path in Paths:
+			try: Info = os.stat(Path)
+			except OSError: continue
+			if Known.get(Path) != ( Info.st_mtime, Info.st_size ):
+				Stale.append(Path)
+		# for
+		return Stale
+	# staleLibraries()
+
+	def storeLibrary(self, Path, State, Error, Symbols):
+		"""Replaces the symbols of the library at Path in the index.
+
+		State is ( modification time, size ) of the library when it was scanned.
+		"""
+		MTime, Size = State
+		with self.connection:
+			self.removeLibraries([ Path ])
+			LibraryID = self.connection.execute(
+			  "INSERT INTO Libraries (Path, MTime, Size, Error) VALUES (?, ?, ?, ?)",
+			  ( Path, MTime, Size, Error )).lastrowid
+			self.connection.executemany(
+			  "INSERT INTO Symbols (Library, Type, Mangled, Demangled)"
+			  " VALUES (?, ?, ?, ?)",
+			  ( ( LibraryID, ) + Symbol for Symbol in Symbols ))
+		# with
+	# storeLibrary()
+
+	def removeLibraries(self, Paths):
+		"""Removes the libraries at Paths and their symbols from the index."""
+		for Path in Paths:
+			self.connection.execute("DELETE FROM Symbols WHERE Library IN"
+			  " (SELECT ID FROM Libraries WHERE Path = ?)", ( Path, ))
+			self.connection.execute("DELETE FROM Libraries WHERE Path = ?",
+			  ( Path, ))
+		# for
+	# removeLibraries()
+
+	def removeMissingLibraries(self, Dirs, Paths):
+		"""Removes the libraries in Dirs which are not in Paths any more."""
+		Current = set(Paths)
+		Missing = [ Path for ( Path, ) \
+		  in self.connection.execute("SELECT Path FROM Libraries")
+		  if (os.path.dirname(Path) in Dirs) and (Path not in Current) ]
+		if Missing:
+			with self.connection: self.removeLibraries(Missing)
+	# removeMissingLibraries()
+
+	def find(self, Paths, Name, bDemangled = False, bFragment = False,
+	  bUndefined = False):
+		"""Returns the symbols matching Name in the libraries at Paths.
+
+		The result is a list of ( library path, type, mangled, demangled ), in
+		the order of the libraries in Paths and of the symbols in each library.
+		Name is matched with the demangled names if bDemangled is set, with the
+		mangled ones otherwise; if bFragment is set, the name needs only contain
+		Name. Undefined symbols are included only if bUndefined is set.
+		"""
+		Column = "Demangled" if bDemangled else "Mangled"
+		if bFragment: Condition = "instr(S.%s, ?) > 0" % Column
+		else:         Condition = "S.%s = ?" % Column
+		if not bUndefined: Condition += " AND S.Type != 'U'"
+		Order = dict(( Path, iPath ) for iPath, Path in enumerate(Paths))
+		Matches = [ Match for Match in self.connection.execute(
+		  "SELECT L.Path, S.Type, S.Mangled, S.Demangled"
+		  " FROM Symbols AS S JOIN Libraries AS L ON S.Library = L.ID"
+		  " WHERE " + Condition + " ORDER BY S.rowid", ( Name, ))
+		  if Match[0] in Order ]
+		Matches.sort(key=lambda Match: Order[Match[0]]) # stable
+		return Matches
+	# find()
+
+	def errors(self, Paths):
+		"""Returns a list of ( path, error ) for the libraries that failed."""
+		Selected = set(Paths)
+		return [ ( Path, Error ) for Path, Error in self.connection.execute(
+		  "SELECT Path, Error FROM Libraries WHERE Error IS NOT NULL")
+		  if Path in Selected ]
+	# errors()
+
+	def close(self): self.connection.close()
+
+# class SymbolIndexClass
+
+
+def UpdateIndex(Index, Dirs, options):
+	"""Scans the libraries in Dirs which are new or changed since indexed.
+
+	The libraries are scanned by options.Jobs processes.
+	It returns the list of the paths of all the libraries in Dirs.
+	"""
+	Paths = []
+	for Dir in Dirs:
+		if options.Verbose > 0: print "Checking libraries in %s..." % Dir
+		Paths.extend(ListLibraries(Dir))
+	# for
+	Index.removeMissingLibraries(Dirs, Paths)
+	Stale = Paths if options.Rescan else Index.staleLibraries(Paths)
+	if not Stale: return Paths
+
+	if options.Verbose > 0:
+		print "Scanning %d of %d libraries" % (len(Stale), len(Paths))
+	nJobs = min(options.Jobs, len(Stale))
+	Pool = multiprocessing.Pool(nJobs) if nJobs > 1 else None
+	try:
+		Results = (Pool.imap_unordered if Pool else map)(ScanLibrary, Stale)
+		for Path, State, Error, Symbols in Results:
+			if State is None: continue # removed in the meanwhile
+			if options.Verbose > 1:
+				print "  %s: %d symbols%s" % (Path, len(Symbols),
+				  (" (%s)" % Error) if Error else "")
+			# if
+			Index.storeLibrary(Path, State, Error, Symbols)
+		# for
+	finally:
+		if Pool:
+			Pool.terminate()
+			Pool.join()
+		# if
+	# try ... finally
+	return Paths
+# UpdateIndex()
+
+
+def PrintSymbolTypes():
+	print "Symbol types are a single character from the following list:"
+	for Type, Description in SymbolTypes:
+		print "  %s  %s" % (Type, Description)
+	print "If the symbol is local (non-external), its type is the corresponding" \
+	  " lowercase letter."
+# PrintSymbolTypes()
+
+
+def PrintMatches(Matches, bDemangled, options):
+	"""Prints the symbols found, grouped by directory and library."""
+	LastDir, LastPath = None, None
+	for Path, Type, Mangled, Demangled in Matches:
+		Dir, FileName = os.path.split(Path)
+		if (Dir != LastDir) and (options.Verbose == 0):
+			print "Found in path %s/..." % Dir
+		if Path != LastPath: print "    Found in %s" % FileName
+		LastDir, LastPath = Dir, Path
+		Entry, Translation = ( Demangled, Mangled ) if bDemangled \
+		  else ( Mangled, Demangled )
+		print "        Entry: %s %s" % (Type, Entry)
+		print "        Translates to %s %s" % (Type, Translation)
+	# for
+# PrintMatches()
+
+
+################################################################################
+### main program
+###
+if __name__ == "__main__":
+	import argparse
+
+	Parser = argparse.ArgumentParser(description=__doc__)
+	Parser.add_argument("Symbol", nargs="?",
+	  help="name of the symbol to be found")
+	Parser.add_argument("-a", dest="AllLibs", action="store_true",
+	  help="search all libraries (by default, /usr/lib is excluded)")
+	Parser.add_argument("-d", dest="Demangled", action="store_true",
+	  help="treat the name as demangled (by default, it is treated as mangled"
+	  " unless it contains a '(')")
+	Parser.add_argument("-f", dest="Fragment", action="store_true",
+	  help="the name is a fragment: match any symbol containing it")
+	Parser.add_argument("-u", dest="Undefined", action="store_true",
+	  help="also print undefined symbols (U)")
+	Parser.add_argument("-v", dest="Verbose", action="count", default=0,
+	  help="increase verbosity (-v: directories searched; -v -v: libraries"
+	  " scanned)")
+	Parser.add_argument("-t", dest="PrintTypes", action="store_true",
+	  help="print the list of symbol types")
+	Parser.add_argument("--index", dest="IndexPath", default=DefaultIndexPath(),
+	  help="symbol index database [%(default)s]")
+	Parser.add_argument("--rescan", dest="Rescan", action="store_true",
+	  help="scan again all the libraries, even if unchanged")
+	Parser.add_argument("--jobs", "-j", dest="Jobs", type=int,
+	  default=multiprocessing.cpu_count(),
+	  help="number of processes scanning the libraries [%(default)s]")
+	Parser.add_argument('--version', action='version', version=Version)
+
+	options = Parser.parse_args()
+
+	if options.PrintTypes:
+		PrintSymbolTypes()
+		sys.exit(0)
+	# if
+	if not options.Symbol:
+		Parser.print_help()
+		sys.exit(0)
+	# if
+
+	bDemangled = options.Demangled or ("(" in options.Symbol)
+	print "Searching for %s symbol '%s'" \
+	  % ("demangled" if bDemangled else "mangled", options.Symbol)
+
+	Index = SymbolIndexClass(options.IndexPath)
+	try:
+		Paths = UpdateIndex(Index, LibraryDirectories(options), options)
+		if options.Verbose > 1:
+			for Path, Error in Index.errors(Paths):
+				print "  %s could not be scanned: %s" % (Path, Error)
+		# if
+		Matches = Index.find(Paths, options.Symbol, bDemangled=bDemangled,
+		  bFragment=options.Fragment, bUndefined=options.Undefined)
+	finally: Index.close()
+
+	PrintMatches(Matches, bDemangled, options)
+
+	print
+	print "Note that  U       <symbol>    means the symbol is undefined (required) here"
+	print "           T, W, V <symbol>    is defined here"
+	print
+	print "For a full list of codes type"
+	print
+	print "    %s -t" % os.path.basename(sys.argv[0])
+	print
+	sys.exit(0)
+# main
@@ -22,7 +22,14 @@
 #    Program Notes:-
 #    =============
 
-#    None.
+#    The search is performed by find_global_symbol.py, which keeps an index
+#    of the symbols of the libraries and rescans only the changed ones.
+#    The implementation below is used only when that is not available.
+
+pyscript="$(dirname "$0")/find_global_symbol.py"
+if [ -x "$pyscript" ] && command -v python2 > /dev/null 2>&1 ; then
+  exec "$pyscript" "$@"
+fi
 
 symbol=""
 all_libs=0
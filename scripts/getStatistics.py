@@ -0,0 +1,336 @@
+#!/usr/bin/env python2
+#
+# Brief:  collects statistics (modules, authors, code, recent changes) from
+#         git repositories
+# Date:   20261018
+#
+# Run with '--help' argument for usage instructions.
+#
+# The repositories are queried concurrently, and the result for each of them
+# is kept in a cache, keyed by the commit the repository is at (and by the
+# other state the statistics depend on, see StatisticsTypes): repeated reports
+# query again only the repositories which have moved.
+#
+# This is a replacement of getStatistics.sh, with the same statistics types.
+#
+# Version:
+# 1.0 (20261018)
+#   first version, with the statistics types of getStatistics.sh
+# 1.1 (20261018)
+#   the cache key of the working tree covers the content of the changes and
+#   the untracked and ignored files
+# 1.2 (20261018)
+#   a repository which can't be queried is reported, and the others are still
+#   included in the report (exit code 1)
+#
+# Differences from getStatistics.sh:
+# - `-t code` prints a table with the sum of the counts of cloc on each
+#   repository, instead of the output of a single cloc run on all of them:
+#   files which are in more than one repository are counted once for each
+#   (cloc would count them once);
+# - `-t this_year` reports on the line of a repository the error which
+#   prevented the count (e.g. no origin/master), instead of an empty count.
+#
+
+import sys, os
+import subprocess
+import multiprocessing.pool
+import hashlib
+import json
+import time
+import fnmatch
+from collections import OrderedDict
+
+
+__doc__ = "Searches the listed git repositories for information."
+Version = "%(prog)s 1.2"
+
+CacheVersion = 2
+
+
+class GitError(RuntimeError): pass
+
+
+def Run(Command, Dir):
+	"""Runs the command in Dir and returns its output; GitError on failure.
+
+	The message of the GitError has only the first line of the error output
+	of the command (git follows it with hints).
+	"""
+	try:
+		Process = subprocess.Popen(Command, cwd=Dir,
+		  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		Output, Error = Process.communicate()
+	except OSError, e:
+		raise GitError("can't run '%s' (%s)" % (Command[0], e))
+	if Process.returncode != 0:
+		raise GitError("'%s' failed in '%s': %s"
+		  % (" ".join(Command), Dir, (Error.strip().splitlines() or [ "" ])[0]))
+	# if
+	return Output
+# Run()
+
+
+def Git(Dir, *args):
+	"""Runs a git command in the repository at Dir and returns its output."""
+	return Run([ "git" ] + list(args), Dir)
+
+
+def HeadCommit(Dir):
+	return Git(Dir, "rev-parse", "HEAD").strip()
+
+
+def WorkingTreeState(Dir):
+	"""Returns the HEAD commit, and a digest of the local changes if any.
+
+	The digest covers the content of the changes to the tracked files, and the
+	path, size and modification time of all the files git does not track,
+	including the ignored ones (which the directory walk and cloc do see).
+	"""
+	Head = HeadCommit(Dir)
+	Changes = Git(Dir, "diff", "HEAD", "--binary")
+	Others = Git(Dir, "ls-files", "--others", "-z").split("\0")
+	if not Changes and not any(Others): return Head
+	Digest = hashlib.sha1(Changes)
+	for Path in sorted(filter(None, Others)):
+		try: Stat = os.lstat(os.path.join(Dir, Path))
+		except OSError: continue
+		Digest.update("\0%s\0%d\0%r" % (Path, Stat.st_size, Stat.st_mtime))
+	# for
+	return Head + "+" + Digest.hexdigest()
+# WorkingTreeState()
+
+
+#
+# statistics of a single repository
+#
+def CountModules(Dir):
+	"""Returns the number of module source files ('*_*.cc', not in tests)."""
+	nModules = 0
+	for SubDir, SubDirs, FileNames in os.walk(Dir):
+		if ".git" in SubDirs: SubDirs.remove(".git")
+		RelDir = os.path.relpath(SubDir, Dir)
+		for FileName in fnmatch.filter(FileNames, "*_*.cc"):
+			if "test" not in os.path.join(RelDir, FileName): nModules += 1
+	# for
+	return nModules
+# CountModules()
+
+
+def ListAuthors(Dir):
+	"""Returns the sorted list of the committers in all the branches."""
+	return sorted(set(Git(Dir, "log", "--all", "--format=%cN").splitlines()))
+
+
+def CountCode(Dir):
+	"""Returns the cloc count of the lines of code, by language (not in ups)."""
+	Output = Run([ "cloc", "--json", "--quiet", "--exclude-dir=ups", "." ], Dir)
+	Counts = json.loads(Output or "{}")
+	return dict(( Language, Count ) for Language, Count in Counts.items()
+	  if Language not in ( "header", "SUM" ))
+# CountCode()
+
+
+def CountLinesThisYear(Dir):
+	"""Returns the number of lines added on origin/master in the last year.
+
+	Binary files and the files in ups directories are not counted.
+	"""
+	nLines = 0
+	for line in Git(Dir, "log", "--pretty=", "--numstat", "--since=1.year",
+	  "origin/master").splitlines():
+		try: Added, Removed, Path = line.split("\t", 2)
+		except ValueError: continue
+		if Added == "-": continue # binary file
+		if "ups" in Path.split("/")[:-1]: continue
+		nLines += int(Added)
+	# for
+	return nLines
+# CountLinesThisYear()
+
+
+# for each type of statistics: the function computing it for one repository,
+# and the one returning the state of the repository the result depends on
+StatisticsTypes = OrderedDict([
+	( "modules", ( CountModules, WorkingTreeState ) ),
+	( "authors", ( ListAuthors,
+	    lambda Dir: hashlib.sha1(Git(Dir, "show-ref", "--head")).hexdigest() ) ),
+	( "code", ( CountCode, WorkingTreeState ) ),
+	( "this_year", ( CountLinesThisYear, lambda Dir: "%s@%s" % (
+	    Git(Dir, "rev-parse", "origin/master").strip(), time.strftime("%Y%m%d")
+	    ) ) ),
+	])
+
+
+#
+# cache
+#
+def DefaultCachePath():
+	"""Returns the default path of the cache file."""
+	CacheDir = os.environ.get("XDG_CACHE_HOME") \
+	  or os.path.join(os.path.expanduser("~"), ".cache")
+	return os.path.join(CacheDir, "getStatistics", "cache.json")
+# DefaultCachePath()
+
+
+def LoadCache(CachePath):
+	"""Returns the content of the cache file (empty if not available)."""
+	try:
+		with open(CachePath, 'r') as CacheFile: Cache = json.load(CacheFile)
+	except (IOError, ValueError): return {}
+	if not isinstance(Cache, dict) or (Cache.get("version") != CacheVersion):
+		return {}
+	return Cache.get("entries", {})
+# LoadCache()
+
+
+def SaveCache(CachePath, Entries):
+	"""Writes the cache file; failures are silently ignored."""
+	TempPath = "%s.%d.tmp" % (CachePath, os.getpid())
+	try:
+		CacheDir = os.path.dirname(CachePath)
+		if CacheDir and not os.path.isdir(CacheDir): os.makedirs(CacheDir)
+		with open(TempPath, 'w') as CacheFile:
+			json.dump({ "version": CacheVersion, "entries": Entries }, CacheFile)
+		os.rename(TempPath, CachePath)
+	except EnvironmentError:
+		try: os.remove(TempPath)
+		except EnvironmentError: pass
+	# try ... except
+# SaveCache()
+
+
+def CollectStatistics(Dirs, Type, Cache, nJobs):
+	"""Returns the statistics of Type for each repository in Dirs, in order.
+
+	The repositories are queried by nJobs threads (each query runs external
+	commands). The results in the Cache dictionary are used when the state of
+	the repository is unchanged, and the new results are added to it.
+	The result for a repository which can't be queried is the GitError
+	describing the failure (and nothing is cached for it).
+	"""
+	Compute, State = StatisticsTypes[Type]
+
+	def Query(Dir):
+		Key = "%s:%s" % (Type, os.path.abspath(Dir))
+		try:
+			RepoState = State(Dir)
+			Entry = Cache.get(Key)
+			if (Entry is None) or (Entry["state"] != RepoState):
+				Entry = { "state": RepoState, "result": Compute(Dir) }
+		except GitError, e: return Key, None, e
+		return Key, Entry, None
+	# Query()
+
+	Pool = multiprocessing.pool.ThreadPool(max(1, min(nJobs, len(Dirs))))
+	try: Results = Pool.map(Query, Dirs)
+	finally:
+		Pool.terminate()
+		Pool.join()
+	# try ... finally
+	Cache.update(( Key, Entry ) for Key, Entry, Error in Results
+	  if Entry is not None)
+	return [ Error if Entry is None else Entry["result"]
+	  for Key, Entry, Error in Results ]
+# CollectStatistics()
+
+
+#
+# report
+#
+def ValidResults(Dirs, Results):
+	"""Prints the errors among Results, and returns the other results."""
+	for Dir, Result in zip(Dirs, Results):
+		if isinstance(Result, GitError):
+			print >>sys.stderr, "ERROR: %s: %s" % (Dir, Result)
+	# for
+	return [ Result for Result in Results if not isinstance(Result, GitError) ]
+# ValidResults()
+
+
+def PrintModules(Dirs, Results):
+	print "found %d modules" % sum(ValidResults(Dirs, Results))
+
+
+def PrintAuthors(Dirs, Results):
+	for Authors in ValidResults(Dirs, Results):
+		for Author in Authors: print '"%s"' % Author
+# PrintAuthors()
+
+
+def PrintCode(Dirs, Results):
+	Languages = {}
+	for Counts in ValidResults(Dirs, Results):
+		for Language, Count in Counts.items():
+			Total = Languages.setdefault(Language,
+			  { "nFiles": 0, "blank": 0, "comment": 0, "code": 0 })
+			for Column in Total: Total[Column] += Count.get(Column, 0)
+		# for
+	# for
+	Columns = ( "nFiles", "blank", "comment", "code" )
+	print "lines of code excluding fcl files and anything in the ups directory"
+	print "%-20s %10s %10s %10s %10s" % (( "Language", "files" ) + Columns[1:])
+	for Language, Total in sorted(Languages.items(),
+	  key=lambda item: (-item[1]["code"], item[0])):
+		print "%-20s %10d %10d %10d %10d" \
+		  % (( Language, ) + tuple(Total[Column] for Column in Columns))
+	# for
+	print "%-20s %10d %10d %10d %10d" % (( "SUM", ) + tuple(
+	  sum(Total[Column] for Total in Languages.values()) for Column in Columns))
+# PrintCode()
+
+
+def PrintThisYear(Dirs, Results):
+	for Dir, nLines in zip(Dirs, Results):
+		if isinstance(nLines, GitError): print "%s: ERROR: %s" % (Dir, nLines)
+		else: print "%s: %d lines changed in the last year" % (Dir, nLines)
+	# for
+# PrintThisYear()
+
+
+Printers = {
+	"modules": PrintModules,
+	"authors": PrintAuthors,
+	"code": PrintCode,
+	"this_year": PrintThisYear,
+	}
+
+
+################################################################################
+### main program
+###
+if __name__ == "__main__":
+	import argparse
+
+	Parser = argparse.ArgumentParser(description=__doc__)
+	Parser.add_argument("Dirs", metavar="directory", nargs="+",
+	  help="top directory of a git repository")
+	Parser.add_argument("-t", dest="Type", required=True,
+	  choices=StatisticsTypes.keys(), help="type of information")
+	Parser.add_argument("--jobs", "-j", dest="Jobs", type=int, default=8,
+	  help="number of repositories queried at the same time [%(default)s]")
+	Parser.add_argument("--cache", dest="CachePath", default=DefaultCachePath(),
+	  help="file with the cached results [%(default)s]")
+	Parser.add_argument("--nocache", dest="UseCache", action="store_false",
+	  help="do not use nor update the cache")
+	Parser.add_argument('--version', action='version', version=Version)
+
+	options = Parser.parse_args()
+
+	for Dir in options.Dirs:
+		if not os.path.isdir(Dir):
+			Parser.error("%s is not a directory" % Dir)
+		if not os.path.isdir(os.path.join(Dir, ".git")):
+			Parser.error("cannot find %s/.git: %s must be the top of a git"
+			  " repository" % (Dir, Dir))
+		# if
+	# for
+
+	Cache = LoadCache(options.CachePath) if options.UseCache else {}
+	Results = CollectStatistics(options.Dirs, options.Type, Cache, options.Jobs)
+	if options.UseCache: SaveCache(options.CachePath, Cache)
+
+	Printers[options.Type](options.Dirs, Results)
+	sys.exit(1 if any(isinstance(Result, GitError) for Result in Results)
+	  else 0)
+# main
@@ -1,5 +1,13 @@
 #!/usr/bin/env bash
 
+# The statistics are collected by getStatistics.py, which queries the
+# repositories concurrently and caches the results; the implementation below
+# is used only when that is not available.
+pyscript="$(dirname "$0")/getStatistics.py"
+if [ -x "$pyscript" ] && command -v python2 > /dev/null 2>&1 ; then
+  exec "$pyscript" "$@"
+fi
+
 # Usage function
 function usage() {
   echo "$(basename $0) [-h] -t <modules|authors|code|this_year> <directory list>"
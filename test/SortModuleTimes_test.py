@@ -0,0 +1,745 @@
+#!/usr/bin/env python2
+#
+# Brief:  tests of the behaviour of SortModuleTimes.py
+# Date:   20261018
+#
+# Run without arguments; unittest options are accepted (e.g. '-v').
+#
+# Each test runs the script on synthetic logs (see
+# benchmarks/GenerateTimingLog.py) and checks one of its features; the reports
+# of the ways to get to the same statistics (e.g. parsing the logs in parallel)
+# are checked to be byte-identical to the one of a plain serial parsing.
+# The path of the script can be set with the SORTMODULETIMES_SCRIPT
+# environment variable (default: the one in the source tree).
+#
+
+import sys, os
+import time
+import math
+import random
+import re
+import json
+import csv
+import cStringIO
+import shutil
+import gzip
+import bz2
+import sqlite3
+import tempfile
+import subprocess
+import unittest
+
+TestDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TestDir, "benchmarks"))
+import GenerateTimingLog
+
+
+ScriptPath = os.environ.get("SORTMODULETIMES_SCRIPT",
+  os.path.join(TestDir, "..", "scripts", "SortModuleTimes.py"))
+
+# exit code of the script when the performance budget is not met
+BudgetFailureExitCode = 3
+
+
+def ReadModuleTimes(LogPath):
+	"""Returns the times of each module in the log, keyed "Type[label]"."""
+	Times = {}
+	with open(LogPath, 'r') as LogFile:
+		for line in LogFile:
+			Tokens = line.split()
+			if (len(Tokens) != 10) or (Tokens[0] != "TimeModule>"): continue
+			Times.setdefault("%s[%s]" % (Tokens[8], Tokens[7]), []) \
+			  .append(float(Tokens[9]))
+		# for
+	# with
+	return Times
+# ReadModuleTimes()
+
+
+def ReadEventTimes(LogPath):
+	"""Returns the times in each event of the log.
+
+	The result maps the ( run, subRun, event ) key of each event to a
+	dictionary of the times of its modules (keyed "Type[label]") and of the
+	whole event (keyed "total").
+	"""
+	Events = {}
+	with open(LogPath, 'r') as LogFile:
+		for line in LogFile:
+			Tokens = line.split()
+			if (len(Tokens) == 10) and (Tokens[0] == "TimeModule>"):
+				Name = "%s[%s]" % (Tokens[8], Tokens[7])
+			elif (len(Tokens) == 8) and (Tokens[0] == "TimeEvent>"):
+				Name = "total"
+			else: continue
+			EventKey = ( int(Tokens[2]), int(Tokens[4]), int(Tokens[6]) )
+			Events.setdefault(EventKey, {})[Name] = float(Tokens[-1])
+		# for
+	# with
+	return Events
+# ReadEventTimes()
+
+
+def WriteTimeTrackerDatabase(LogPath, DatabasePath):
+	"""Writes the timing records of a log into an art TimeTracker database."""
+	Connection = sqlite3.connect(DatabasePath)
+	Connection.executescript("""
+	  CREATE TABLE TimeEvent
+	    (Run INTEGER, SubRun INTEGER, Event INTEGER, Time REAL);
+	  CREATE TABLE TimeModule (Run INTEGER, SubRun INTEGER, Event INTEGER,
+	    Path TEXT, ModuleLabel TEXT, ModuleType TEXT, Time REAL);
+	  """)
+	with open(LogPath, 'r') as LogFile:
+		for line in LogFile:
+			Tokens = line.split()
+			if (len(Tokens) == 10) and (Tokens[0] == "TimeModule>"):
+				Connection.execute("INSERT INTO TimeModule VALUES (?,?,?,?,?,?,?)",
+				  ( int(Tokens[2]), int(Tokens[4]), int(Tokens[6]), 'path',
+				  Tokens[7], Tokens[8], float(Tokens[9]) ))
+			elif (len(Tokens) == 8) and (Tokens[0] == "TimeEvent>"):
+				Connection.execute("INSERT INTO TimeEvent VALUES (?,?,?,?)",
+				  ( int(Tokens[2]), int(Tokens[4]), int(Tokens[6]),
+				  float(Tokens[7]) ))
+			# if ... elif
+		# for
+	# with
+	Connection.commit()
+	Connection.close()
+# WriteTimeTrackerDatabase()
+
+
+class SortModuleTimesTestCase(unittest.TestCase):
+	"""Runs SortModuleTimes.py on a few synthetic logs."""
+
+	@classmethod
+	def setUpClass(cls):
+		cls.WorkDir = tempfile.mkdtemp(prefix="SortModuleTimes_test")
+		cls.Logs = [ cls.path("multirun.log"), cls.path("single.log.gz") ]
+		GenerateTimingLog.GenerateLog(cls.Logs[0],
+		  nModules=8, nEvents=300, nRuns=2, nSubRuns=2, noise=0.5)
+		GenerateTimingLog.GenerateLog(cls.Logs[1], compression='gz',
+		  nModules=8, nEvents=200, noise=0.5, seed=7)
+		cls.SerialReport = cls.runScript(*cls.Logs)[1]
+		cls.SerialEventTable = cls.runScript("--eventtable", *cls.Logs)[1]
+	# setUpClass()
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.WorkDir, ignore_errors=True)
+
+	@classmethod
+	def path(cls, name): return os.path.join(cls.WorkDir, name)
+
+	@classmethod
+	def runScript(cls, *args, **Variables):
+		"""Runs the script; returns its exit code, output and error output.
+
+		The keyword arguments are set as environment variables of the script.
+		"""
+		Environment = dict(os.environ)
+		Environment.pop("SORTMODULETIMES_CACHE", None)
+		Environment.update(Variables)
+		Process = subprocess.Popen([ sys.executable, ScriptPath ] + list(args),
+		  stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+		  cwd=cls.WorkDir, env=Environment)
+		Output, Errors = Process.communicate()
+		return Process.returncode, Output, Errors
+	# runScript()
+
+	def checkRun(self, *args):
+		"""Runs the script, checks that it succeeds and returns its output."""
+		rc, Output, Errors = self.runScript(*args)
+		self.assertEqual(rc, 0,
+		  "%s failed with code %d:\n%s" % (" ".join(args), rc, Errors))
+		return Output
+	# checkRun()
+
+	def assertSameAsSerial(self, *args):
+		"""Checks that the reports with the options args match the serial ones."""
+		self.assertEqual(self.checkRun(*(args + tuple(self.Logs))),
+		  self.SerialReport)
+		self.assertEqual(
+		  self.checkRun(*(( "--eventtable", ) + args + tuple(self.Logs))),
+		  self.SerialEventTable)
+	# assertSameAsSerial()
+
+
+	def test_Jobs(self): self.assertSameAsSerial("--jobs", "2")
+
+	def test_FollowTerminated(self):
+		ReportPath = self.path("follow.txt")
+		Process = subprocess.Popen([ sys.executable, ScriptPath, "--follow",
+		  "--reportinterval", "0", "--reportevents", "1",
+		  "--reportfile", ReportPath, self.Logs[0] ],
+		  stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=self.WorkDir)
+		# wait for the log to be parsed (the first periodic report)
+		Timeout = time.time() + 60.
+		while not os.path.exists(ReportPath) and (time.time() < Timeout):
+			time.sleep(0.1)
+		Process.terminate()
+		Output, Errors = Process.communicate()
+		self.assertEqual(Process.returncode, 0, Errors)
+		with open(ReportPath, 'r') as ReportFile:
+			self.assertEqual(ReportFile.read(), self.checkRun(self.Logs[0]))
+	# test_FollowTerminated()
+
+
+	def test_WritePartial(self):
+		PartialPath = self.path("partial.modtimes.json")
+		self.checkRun("--writepartial", PartialPath, *self.Logs)
+		self.assertEqual(self.checkRun(PartialPath), self.SerialReport)
+	# test_WritePartial()
+
+	def test_Sidecar(self):
+		self.assertEqual(self.checkRun("--sidecar", *self.Logs), self.SerialReport)
+		# each partial aggregate stands for its log (the logs of the test share
+		# some events, that only the parsing of the logs together can detect)
+		for LogPath in self.Logs:
+			self.assertEqual(self.checkRun(LogPath + ".modtimes.json"),
+			  self.checkRun(LogPath))
+		# for
+	# test_Sidecar()
+
+
+	def test_FollowIdle(self):
+		# the log is not growing: follow mode ends after the idle timeout
+		self.assertEqual(self.checkRun("--follow", "--reportinterval", "0",
+		  "--idletimeout", "1", self.Logs[0]), self.checkRun(self.Logs[0]))
+	# test_FollowIdle()
+
+	def test_FollowCompressed(self):
+		rc, Output, Errors = self.runScript("--follow", "--idletimeout", "1",
+		  self.Logs[1])
+		self.assertEqual(rc, 2)
+		self.assertIn("--follow requires an uncompressed log", Errors)
+	# test_FollowCompressed()
+
+
+	def test_Percentiles(self):
+		Output = self.checkRun("--percentiles", self.Logs[0])
+		Times = ReadModuleTimes(self.Logs[0])
+		Pattern = re.compile(r'^(\S+) .* median (\S+)" +p90 (\S+)" +p99 (\S+)"'
+		  r' +p99\.9 (\S+)"')
+		nModules = 0
+		for line in Output.splitlines():
+			match = Pattern.match(line)
+			if not match or match.group(1) not in Times: continue
+			Sorted = sorted(Times[match.group(1)])
+			for q, Value in zip(( 0.5, 0.9, 0.99, 0.999 ), match.groups()[1:]):
+				# the sketch reports the value of rank ceil(q N) within 1%
+				Exact = Sorted[max(int(math.ceil(q * len(Sorted))), 1) - 1]
+				self.assertAlmostEqual(float(Value) / Exact, 1., delta=0.011,
+				  msg="%s: quantile %g is %s, should be %g"
+				  % (match.group(1), q, Value, Exact))
+			# for
+			nModules += 1
+		# for
+		self.assertEqual(nModules, len(Times))
+		# sketches are merged with no loss of accuracy
+		self.assertEqual(self.checkRun("--percentiles", "--jobs", "2", *self.Logs),
+		  self.checkRun("--percentiles", *self.Logs))
+	# test_Percentiles()
+
+
+	def test_Cache(self):
+		CacheDir = self.path("cache")
+		self.assertSameAsSerial("--cache", CacheDir) # filling the cache
+		self.assertSameAsSerial("--cache", CacheDir) # from the cache
+		# with no check of duplicate events
+		Report = self.checkRun("-D", *self.Logs)
+		CacheDir = self.path("cacheD")
+		for i in xrange(2):
+			self.assertEqual(self.checkRun("-D", "--cache", CacheDir, *self.Logs),
+			  Report)
+		# for
+	# test_Cache()
+
+	def test_CacheGrownLog(self):
+		CacheDir = self.path("growncache")
+		LogPath = self.path("growing.log")
+		with open(self.Logs[0], 'r') as LogFile: Lines = LogFile.readlines()
+		with open(LogPath, 'w') as LogFile:
+			LogFile.writelines(Lines[:len(Lines) // 2])
+		self.assertEqual(self.checkRun("--cache", CacheDir, LogPath),
+		  self.checkRun(LogPath))
+		# the cached results are completed with the new part of the log only
+		with open(LogPath, 'a') as LogFile:
+			LogFile.writelines(Lines[len(Lines) // 2:])
+		self.assertEqual(self.checkRun("--cache", CacheDir, LogPath),
+		  self.checkRun(self.Logs[0]))
+	# test_CacheGrownLog()
+
+
+	def test_CompressionDetection(self):
+		with open(self.Logs[0], 'rb') as LogFile: Content = LogFile.read()
+		# the format is detected from the content, whatever the file name
+		Inputs = [
+		  ( "gzipped.log", gzip.GzipFile ),
+		  ( "bzipped.gz", bz2.BZ2File ),
+		  ( "plain.bz2", open ),
+		  ]
+		for name, opener in Inputs:
+			OutputFile = opener(self.path(name), 'wb')
+			try: OutputFile.write(Content)
+			finally: OutputFile.close()
+		# for
+		Report = self.checkRun(self.Logs[0])
+		for name, opener in Inputs:
+			self.assertEqual(self.checkRun(self.path(name)), Report)
+	# test_CompressionDetection()
+
+	def test_DecompressorMissing(self):
+		try:
+			try: import lzma
+			except ImportError: from backports import lzma
+			self.skipTest("xz data is decompressed by the lzma module")
+		except ImportError: pass
+		# xz data (just the header) with no xz program in the PATH
+		with open(self.path("nodecompressor.log"), 'wb') as LogFile:
+			LogFile.write('\xfd7zXZ\x00' + '\x00' * 32)
+		rc, Output, Errors = self.runScript("nodecompressor.log", self.Logs[0],
+		  PATH=self.WorkDir)
+		self.assertEqual(rc, 1)
+		self.assertIn("cannot decompress 'nodecompressor.log': xz not available",
+		  Errors)
+		self.assertEqual(Output, self.checkRun(self.Logs[0]))
+	# test_DecompressorMissing()
+
+
+	def test_Export(self):
+		ExportPath = self.path("export.modtimes.bin")
+		self.checkRun("--export", ExportPath, *self.Logs)
+		self.assertEqual(self.checkRun(ExportPath), self.SerialReport)
+		self.assertEqual(self.checkRun("--eventtable", ExportPath),
+		  self.SerialEventTable)
+	# test_Export()
+
+
+	def test_SelfProfile(self):
+		ProfilePath = self.path("selfprofile.jsonl")
+		for Options in ( [], [ "--jobs", "2" ] ):
+			rc, Output, Errors = self.runScript(*(Options + [ "--self-profile",
+			  "--self-profile-log", ProfilePath ] + self.Logs))
+			self.assertEqual(rc, 0, Errors)
+			self.assertEqual(Output, self.SerialReport) # the profile is on stderr
+			self.assertIn("Self-profile", Errors)
+		# for
+		with open(ProfilePath, 'r') as ProfileLog:
+			Records = [ json.loads(line) for line in ProfileLog ]
+		self.assertEqual(len(Records), 2) # one line per run
+		for Record in Records:
+			self.assertEqual([ File['name'] for File in Record['files'] ],
+			  self.Logs)
+			for File in Record['files']:
+				Opener = gzip.GzipFile if File['name'].endswith(".gz") else open
+				LogFile = Opener(File['name'], 'rb')
+				try: Content = LogFile.read()
+				finally: LogFile.close()
+				self.assertEqual(File['bytesRead'], len(Content))
+				self.assertEqual(File['lines'], Content.count('\n'))
+				self.assertEqual(File['records'], ('\n' + Content).count('\nTime'))
+				self.assertEqual(File['rejected'], 0)
+			# for
+		# for
+	# test_SelfProfile()
+
+
+	def test_EventTableFormats(self):
+		Events = ReadEventTimes(self.Logs[0])
+		for Format, Delimiter in ( ( "csv", ',' ), ( "tsv", '\t' ) ):
+			Output = self.checkRun("--eventtable", "--eventtable-format", Format,
+			  self.Logs[0])
+			Rows = list(csv.reader(cStringIO.StringIO(Output), delimiter=Delimiter))
+			Header = Rows.pop(0)
+			self.assertEqual(Header[:3], [ "run", "subRun", "event" ])
+			self.assertEqual(Header[-1], "total")
+			self.assertEqual(len(Rows), len(Events))
+			for Row in Rows:
+				Times = Events[tuple(map(int, Row[:3]))]
+				self.assertEqual(len(Row), len(Header))
+				for Name, Value in zip(Header[3:], Row[3:]):
+					self.assertAlmostEqual(float(Value) / Times[Name], 1., delta=1e-5)
+			# for
+		# for
+	# test_EventTableFormats()
+
+
+	def test_Slowest(self):
+		K = 3
+		Output = self.checkRun("--slowest", str(K), self.Logs[0])
+		Report, Slowest = Output.split("\nSlowest events:\n")
+		self.assertEqual(Report.rstrip('\n') + '\n', self.checkRun(self.Logs[0]))
+		# expected: the K slowest ( time, event ) of each module, and of events
+		Expected = {}
+		for EventKey, Times in ReadEventTimes(self.Logs[0]).items():
+			for Name, Time in Times.items():
+				Expected.setdefault("=== events ===" if Name == "total" else Name,
+				  []).append(( Time, EventKey ))
+		# for
+		Pattern = re.compile(
+		  r'^(\S.*?)? +#(\d+) (\S+)" +run (\d+) subRun (\d+) event (\d+) *$')
+		Found = {}
+		for line in Slowest.splitlines():
+			match = Pattern.match(line)
+			self.assertIsNotNone(match, "Unexpected line: '%s'" % line)
+			if match.group(1): Name = match.group(1).strip()
+			Found.setdefault(Name, []).append(( float(match.group(3)),
+			  tuple(map(int, match.groups()[3:])) ))
+		# for
+		self.assertEqual(sorted(Found), sorted(Expected))
+		for Name, Entries in Expected.items():
+			Entries.sort(reverse=True)
+			self.assertEqual([ EventKey for Time, EventKey in Found[Name] ],
+			  [ EventKey for Time, EventKey in Entries[:K] ], Name)
+			for ( Time, EventKey ), ( ExpectedTime, ExpectedEventKey ) \
+			  in zip(Found[Name], Entries):
+				self.assertAlmostEqual(Time / ExpectedTime, 1., delta=1e-5)
+		# for
+		# the bounded heaps of parallel jobs are merged
+		self.assertEqual(self.checkRun("--slowest", str(K), "--jobs", "2",
+		  *self.Logs), self.checkRun("--slowest", str(K), *self.Logs))
+	# test_Slowest()
+
+
+	def test_GroupBy(self):
+		Events = ReadEventTimes(self.Logs[0])
+		for GroupBy, Depth in ( ( "run", 1 ), ( "subrun", 2 ) ):
+			Output = self.checkRun("--groupby", GroupBy, self.Logs[0])
+			Report, Groups = Output.split("\nAverage times by %s:\n" % GroupBy)
+			self.assertEqual(Report.rstrip('\n') + '\n', self.checkRun(self.Logs[0]))
+			Lines = Groups.splitlines()
+			Header = Lines.pop(0).split()
+			self.assertEqual(Header[:3], [ "Group", "events", "event" ])
+			Run = None
+			for line in Lines:
+				Tokens = line.split()
+				if Tokens[0] == "run":
+					Run = int(Tokens[1])
+					GroupKey = ( Run, )
+				else:
+					self.assertEqual(Tokens[0], "subRun")
+					GroupKey = ( Run, int(Tokens[1]) )
+				# if ... else
+				self.assertLessEqual(len(GroupKey), Depth)
+				GroupEvents = [ Times for EventKey, Times in Events.items()
+				  if EventKey[:len(GroupKey)] == GroupKey ]
+				self.assertEqual(int(Tokens[2]), len(GroupEvents))
+				for Name, Value in zip([ "total" ] + Header[3:], Tokens[3:]):
+					Average = sum(Times[Name] for Times in GroupEvents) \
+					  / len(GroupEvents)
+					self.assertAlmostEqual(float(Value.rstrip('"')) / Average, 1.,
+					  delta=1e-5, msg="%s in %s" % (Name, GroupKey))
+				# for
+			# for
+			self.assertEqual(len(Lines), { 1: 2, 2: 6 }[Depth]) # 2 runs, 2 subruns
+		# for
+	# test_GroupBy()
+
+
+	def test_SQLite(self):
+		DatabasePath = self.path("timing.db")
+		WriteTimeTrackerDatabase(self.Logs[0], DatabasePath)
+		# "-D": aggregation in SQL
+		for Options in ( [], [ "-D" ], [ "--eventtable" ], [ "--percentiles" ] ):
+			self.assertEqual(self.checkRun(*(Options + [ DatabasePath ])),
+			  self.checkRun(*(Options + [ self.Logs[0] ])))
+		# for
+	# test_SQLite()
+
+
+	def test_MemoryTracker(self):
+		# a MemoryTracker database for the events and modules of a log
+		DatabasePath = self.path("memory.db")
+		Connection = sqlite3.connect(DatabasePath)
+		Connection.executescript("""
+		  CREATE TABLE EventInfo (Run INTEGER, SubRun INTEGER, Event INTEGER,
+		    Vsize NUMERIC, DeltaVsize NUMERIC, RSS NUMERIC, DeltaRSS NUMERIC);
+		  CREATE TABLE ModuleInfo (Run INTEGER, SubRun INTEGER, Event INTEGER,
+		    Path TEXT, ModuleLabel TEXT, ModuleType TEXT,
+		    DeltaVsize NUMERIC, DeltaRSS NUMERIC);
+		  """)
+		Random = random.Random(1)
+		Expected = {} # name -> ( increments of VSize, of RSS, event keys )
+		Vsize, RSS = 1000., 500.
+		Peak = ( RSS, None ) # peak RSS of the process, and its event
+		for EventKey, Times in sorted(ReadEventTimes(self.Logs[0]).items()):
+			EventDeltaVsize = EventDeltaRSS = 0.
+			for Name in sorted(Times):
+				if Name == "total": continue
+				name, label = Name.rstrip(']').split('[')
+				DeltaVsize, DeltaRSS = Random.gauss(1., 2.), Random.gauss(0.5, 1.5)
+				Connection.execute("INSERT INTO ModuleInfo VALUES (?,?,?,?,?,?,?,?)",
+				  EventKey + ( 'path', label, name, DeltaVsize, DeltaRSS ))
+				Increments = Expected.setdefault(Name, ( [], [], [] ))
+				for values, value in zip(Increments, ( DeltaVsize, DeltaRSS, EventKey )):
+					values.append(value)
+				EventDeltaVsize += DeltaVsize
+				EventDeltaRSS += DeltaRSS
+			# for
+			Vsize += EventDeltaVsize
+			RSS += EventDeltaRSS
+			Peak = max(Peak, ( RSS, EventKey ))
+			Connection.execute("INSERT INTO EventInfo VALUES (?,?,?,?,?,?,?)",
+			  EventKey + ( Vsize, EventDeltaVsize, RSS, EventDeltaRSS ))
+			Increments = Expected.setdefault("=== events ===", ( [], [], [] ))
+			for values, value in zip(Increments,
+			  ( EventDeltaVsize, EventDeltaRSS, EventKey )):
+				values.append(value)
+			# for
+		# for
+		Connection.commit()
+		Connection.close()
+
+		Output = self.checkRun(self.Logs[0], DatabasePath)
+		Pattern = re.compile(r'^(=== events ===|\S+) .* VSize (\S+) MB +'
+		  r'RSS (\S+) MB +\(max (\S+) MB in run (\d+) subRun (\d+) event (\d+)\)')
+		Lines = Output.splitlines()
+		self.assertEqual(len(Lines), len(Expected))
+		for line in Lines:
+			match = Pattern.match(line)
+			self.assertIsNotNone(match, "Unexpected line: '%s'" % line)
+			DeltaVsizes, DeltaRSSs, EventKeys = Expected[match.group(1)]
+			for Value, Values in zip(match.groups()[1:3], ( DeltaVsizes, DeltaRSSs )):
+				self.assertAlmostEqual(float(Value), sum(Values) / len(Values),
+				  delta=1e-5 * max(map(abs, Values)))
+			# for
+			MaxRSS = max(DeltaRSSs)
+			self.assertAlmostEqual(float(match.group(4)) / MaxRSS, 1., delta=1e-5)
+			self.assertEqual(tuple(map(int, match.groups()[4:])),
+			  EventKeys[DeltaRSSs.index(MaxRSS)])
+		# for
+		self.assertTrue(Lines[-1].endswith(" peak RSS %g MB in run %d subRun %d"
+		  " event %d" % (( Peak[0], ) + Peak[1])), Lines[-1])
+		# the timing information is the same as without the memory usage
+		for line, TimeLine in zip(Lines, self.checkRun(self.Logs[0]).splitlines()):
+			self.assertEqual(line.split(" VSize ")[0].split(), TimeLine.split())
+	# test_MemoryTracker()
+
+
+	def test_ConcurrentFormatError(self):
+		# a multi-threaded log, made of good lines...
+		Lines = []
+		for event in xrange(1, 21):
+			Lines.extend(
+			  "TimeModule> run: 1 subRun: 0 event: %d schedule: %d thread: %d"
+			  " %s %s %g\n" % (event, event % 4, event % 5, label, name, t * event)
+			  for label, name, t in (( "gen", "Gen", 0.01 ), ( "reco", "Reco", 0.1 ))
+			  )
+			Lines.append("TimeEvent> run: 1 subRun: 0 event: %d schedule: %d"
+			  " thread: %d %g\n" % (event, event % 4, event % 5, 0.12 * event))
+		# for
+		with open(self.path("threads.log"), 'w') as LogFile:
+			LogFile.writelines(Lines)
+		Report = self.checkRun("threads.log")
+		self.assertIn("; 4 schedules (5 to 5 events each); 5 threads", Report)
+		self.assertIn("(20 events:", Report)
+		# ... and a module line without module, an event line with one
+		Lines[10:10] = [
+		  "TimeModule> run: 1 subRun: 0 event: 30 schedule: 1 thread: 1 0.5\n",
+		  "TimeEvent> run: 1 subRun: 0 event: 30 schedule: 1 thread: 1"
+		  " ana Ana 0.5\n",
+		  ]
+		with open(self.path("badthreads.log"), 'w') as LogFile:
+			LogFile.writelines(Lines)
+		rc, Output, Errors = self.runScript("badthreads.log")
+		self.assertNotEqual(rc, 0)
+		self.assertIn("TimeModule format not recognized", Errors)
+		# the malformed lines are skipped, not taken for other records
+		rc, Output, Errors = self.runScript("--permissive", "badthreads.log")
+		self.assertEqual(Output, Report)
+		self.assertIn("2 errors were found", Errors)
+	# test_ConcurrentFormatError()
+
+
+	def test_Warmup(self):
+		# 200 events, the first 20 ten times slower than the others
+		Random = random.Random(3)
+		with open(self.path("warmup.log"), 'w') as LogFile:
+			for event in xrange(1, 201):
+				Scale = 10. if event <= 20 else 1.
+				Times = [ Scale * t * Random.uniform(0.9, 1.1)
+				  for t in ( 0.2, 0.8 ) ]
+				for ( label, name ), t in zip(( ( "gen", "Gen" ), ( "reco", "Reco" ) ),
+				  Times):
+					LogFile.write("TimeModule> run: 1 subRun: 0 event: %d %s %s %g\n"
+					  % (event, label, name, t))
+				# for
+				LogFile.write("TimeEvent> run: 1 subRun: 0 event: %d %g\n"
+				  % (event, sum(Times) + 0.01))
+			# for
+		# with
+		Output = self.checkRun("--skipwarmup", "warmup.log")
+		match = re.search(r"Warm-up of 'warmup\.log': (\d+) events, until run 1"
+		  r" subRun 0 event (\d+) \(excluded from the statistics\)", Output)
+		self.assertTrue(match, Output)
+		nWarmup = int(match.group(1))
+		self.assertEqual(int(match.group(2)), nWarmup)
+		self.assertTrue(20 <= nWarmup <= 50, Output)
+		# no slow event is left in the statistics
+		match = re.search(r'^=== events === .*\((\d+) events: \S+ +- (\S+)\)',
+		  Output, re.MULTILINE)
+		self.assertEqual(int(match.group(1)), 200 - nWarmup)
+		self.assertLess(float(match.group(2)), 2.)
+		# the first bin of the time series is marked as warm-up, the others not
+		Output = self.checkRun("--timeseries", "50", "warmup.log")
+		Bins = re.findall(r'^(\d+-\d+)(\*?) ', Output, re.MULTILINE)
+		self.assertEqual(Bins,
+		  [ ( "1-50", "*" ), ( "51-100", "" ), ( "101-150", "" ),
+		    ( "151-200", "" ) ])
+		# the warm-up is found from the single events, that -D does not track
+		rc, Output, Errors = self.runScript("-D", "--skipwarmup", "warmup.log")
+		self.assertEqual(rc, 2)
+		self.assertIn("can't be used with --allowduplicates", Errors)
+	# test_Warmup()
+
+
+	def test_Approx(self):
+		IntervalPattern = re.compile(r' +mean \+/- (\S+)" \(\S+%\) *$')
+		def Strip(Report):
+			return [ IntervalPattern.sub("", line).rstrip()
+			  for line in Report.splitlines()
+			  if not line.startswith("Approximate: ") ]
+		# Strip()
+		# reading all the logs gives the usual statistics
+		Output = self.checkRun("--approx", "1", *self.Logs)
+		self.assertIn("(100.0%)", Output.splitlines()[-1])
+		self.assertEqual(Strip(Output),
+		  [ line.rstrip() for line in self.SerialReport.splitlines() ])
+		# a sample of the uncompressed log...
+		EventPattern = re.compile(r'^=== events === (\S+)" .*\((\d+) events:.*'
+		  r' mean \+/- (\S+)"', re.MULTILINE)
+		Output = self.checkRun("--approx", "0.3", self.Logs[0])
+		match = EventPattern.search(Output)
+		self.assertTrue(0 < int(match.group(2)) < 300, Output)
+		Events = ReadEventTimes(self.Logs[0])
+		Mean = sum(Times["total"] for Times in Events.values()) / len(Events)
+		self.assertLess(abs(float(match.group(1)) - Mean),
+		  2. * float(match.group(3)))
+		# ... and all of the compressed one
+		match = EventPattern.search(self.checkRun("--approx", "0.3", self.Logs[1]))
+		self.assertEqual(int(match.group(2)), 200)
+	# test_Approx()
+
+
+	def test_Pipeline(self):
+		# the same pool of workers scans all the logs
+		self.assertSameAsSerial("--pipeline", "2")
+		self.assertSameAsSerial("--pipeline", "2", "--sidecar")
+		CacheDir = self.path("pipelinecache")
+		self.assertSameAsSerial("--cache", CacheDir, "--pipeline", "2")
+		self.assertSameAsSerial("--cache", CacheDir, "--pipeline", "2")
+	# test_Pipeline()
+
+
+	def writeBudget(self, name, Budget):
+		"""Writes the Budget (JSON) in the working area; returns its path."""
+		BudgetPath = self.path(name)
+		with open(BudgetPath, 'w') as BudgetFile: json.dump(Budget, BudgetFile)
+		return BudgetPath
+	# writeBudget()
+
+	def runBudget(self, Budget, *args):
+		"""Runs with the budget; returns the exit code and the JSON report."""
+		rc, Output, Errors = self.runScript("--budget",
+		  self.writeBudget("budget.json", Budget), *args)
+		self.assertIn(rc, ( 0, BudgetFailureExitCode ), Errors)
+		return rc, json.loads(Output)
+	# runBudget()
+
+	def test_BudgetPass(self):
+		rc, Report = self.runBudget(
+		  { 'modules': { '*': { 'mean': 100. } }, 'event': { 'p99': 100. } },
+		  self.Logs[0])
+		self.assertEqual(rc, 0)
+		self.assertEqual(Report['status'], "pass")
+		self.assertEqual(Report['events'], 300)
+		# a check for each module and one for the events
+		self.assertEqual(len(Report['checks']), 9)
+	# test_BudgetPass()
+
+	def test_BudgetFail(self):
+		rc, Report = self.runBudget({ 'modules': { '*': { 'mean': 1e-9 } } },
+		  self.Logs[0])
+		self.assertEqual(rc, BudgetFailureExitCode)
+		self.assertEqual(Report['status'], "fail")
+		self.assertEqual(Report['violations'], 8)
+		self.assertEqual(Report['unevaluated'], 0)
+	# test_BudgetFail()
+
+	def test_BudgetUnevaluated(self):
+		# the baseline has no quantile sketches: p99 can't be compared, and
+		# the checks which can't be evaluated count as violations
+		BaselinePath = self.path("budgetbaseline.modtimes.json")
+		self.checkRun("--writepartial", BaselinePath, self.Logs[0])
+		rc, Report = self.runBudget({ 'baseline': os.path.basename(BaselinePath),
+		  'maxRegression': 10., 'event': { 'mean': 100. } }, self.Logs[0])
+		self.assertEqual(rc, BudgetFailureExitCode)
+		self.assertGreater(Report['unevaluated'], 0)
+		self.assertEqual(Report['violations'], Report['unevaluated'])
+	# test_BudgetUnevaluated()
+
+	def test_BudgetMalformed(self):
+		Budgets = [
+		  ( [ 'mean', 1. ], "does not hold a dictionary" ),
+		  ( { 'modules': [ 'mean' ] }, "'modules' is not a dictionary" ),
+		  ( { 'modules': { '*': 1. } }, "limits of '*' are not a dictionary" ),
+		  ( { 'event': [ 1. ] }, "limits of 'event' are not a dictionary" ),
+		  ( { 'event': { 'min': 1. } }, "metric 'min' not supported" ),
+		  ( { 'event': { 'mean': "1" } }, "limit of 'mean' is not a number" ),
+		  ( { 'maxRegression': "10%" }, "'maxRegression' is not a number" ),
+		  ]
+		for Budget, Message in Budgets:
+			rc, Output, Errors = self.runScript("--budget",
+			  self.writeBudget("badbudget.json", Budget), self.Logs[0])
+			self.assertEqual(rc, 2, Errors)
+			self.assertIn("error: Budget file", Errors)
+			self.assertIn(Message, Errors)
+		# for
+	# test_BudgetMalformed()
+
+
+	def test_CompareSame(self):
+		Output = self.checkRun("--compare", self.Logs[0], self.Logs[0])
+		Lines = Output.splitlines()
+		self.assertIn("(300 paired)", Lines[0])
+		self.assertNotIn(" slower", Output)
+		self.assertNotIn(" faster", Output)
+	# test_CompareSame()
+
+	def test_CompareSlower(self):
+		# the same log, with one module 50% slower
+		Times = ReadModuleTimes(self.Logs[0])
+		Slower = max(Times, key=lambda name: sum(Times[name]))
+		Label = Slower[Slower.index("[") + 1:-1]
+		Pattern = re.compile(r'^(TimeModule> .* %s \S+ )(\S+)$'
+		  % re.escape(Label))
+		with open(self.Logs[0], 'r') as LogFile, \
+		  open(self.path("slower.log"), 'w') as SlowerFile:
+			for line in LogFile:
+				match = Pattern.match(line.rstrip("\n"))
+				if match:
+					line = "%s%g\n" % (match.group(1), float(match.group(2)) * 1.5)
+				SlowerFile.write(line)
+			# for
+		# with
+		Output = self.checkRun("--compare", self.Logs[0], "slower.log")
+		Lines = Output.splitlines()
+		# sorted by impact: the slower module comes first
+		self.assertTrue(Lines[2].startswith(Slower + " "), Output)
+		self.assertTrue(Lines[2].endswith(" slower"), Output)
+		self.assertIn("+50.0%", Lines[2])
+		self.assertEqual(Output.count(" slower"), 1)
+	# test_CompareSlower()
+
+	def test_CompareMissingBaseline(self):
+		rc, Output, Errors = self.runScript("--compare", "nonexisting.log",
+		  self.Logs[0])
+		self.assertNotEqual(rc, 0)
+		self.assertIn("nonexisting.log", Errors)
+	# test_CompareMissingBaseline()
+
+# class SortModuleTimesTestCase
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python2
+#
+# Brief:  measures the performance of the phases of SortModuleTimes.py
+# Date:   20261018
+#
+# Run with '--help' argument for usage instructions.
+#
+# Each benchmark scenario describes a synthetic log (see GenerateTimingLog.py)
+# and the options it is processed with. For each scenario, the phases are:
+# - parse:     ParseInputFile() (scanning and aggregation together)
+# - scan:      LogScannerClass alone, extracting the timing records
+# - aggregate: TimingAggregatorClass alone, on records already scanned
+# - format:    TabularAlignmentClass.FormatTable() on the final report
+# Each phase runs in its own process, so that its memory usage (the growth of
+# the peak resident memory while the phase runs) is measured separately; the
+# best time of a few repetitions is kept.
+# The times are not compared as they are, since they depend on the host:
+# each run also times a reference workload (a plain line by line parsing of
+# the log of the 'plain' scenario, not using SortModuleTimes.py at all) on the
+# same host, and the times of the phases are stored and compared as ratios to
+# the reference time. The memory growth is compared in megabytes.
+# The results are compared to stored baselines, and phases which became slower
+# (or use more memory) by more than a tolerance are flagged; in that case, the
+# exit code is non-zero.
+#
+
+import sys, os
+import time
+import json
+import imp
+import resource
+import hashlib
+import platform
+import multiprocessing
+import tempfile
+from collections import OrderedDict
+
+import GenerateTimingLog
+
+
+__doc__ = "Measures the performance of the phases of SortModuleTimes.py."
+
+BenchmarkDir = os.path.dirname(os.path.abspath(__file__))
+DefaultScriptPath \
+  = os.path.join(BenchmarkDir, "..", "..", "scripts", "SortModuleTimes.py")
+DefaultBaselinePath = os.path.join(BenchmarkDir, "baselines.json")
+
+Phases = [ 'parse', 'scan', 'aggregate', 'format' ]
+
+# scenario name -> ( log generator parameters, compression, options )
+Scenarios = OrderedDict([
+	( 'plain', ( dict(nModules=30, nEvents=5000), 'none', {} ) ),
+	( 'untracked',
+	  ( dict(nModules=30, nEvents=5000), 'none', dict(CheckDuplicates=False) )
+	  ),
+	( 'noisy', (
+	    dict(nModules=30, nEvents=5000, noise=2., duplicates=0.05, truncated=0.01),
+	    'none', dict(Permissive=True)
+	  ) ),
+	( 'multirun',
+	  ( dict(nModules=10, nEvents=20000, nRuns=10, nSubRuns=20), 'none', {} )
+	  ),
+	( 'gzip', ( dict(nModules=30, nEvents=5000), 'gz', {} ) ),
+	( 'bzip2', ( dict(nModules=30, nEvents=5000), 'bz2', {} ) ),
+	( 'eventtable',
+	  ( dict(nModules=30, nEvents=2000), 'none', dict(PresentMode='EventTable') )
+	  ),
+	]) # Scenarios
+
+# the scenario whose log is parsed by the reference workload
+ReferenceScenario = 'plain'
+
+
+class ParseOptionsClass(object):
+	"""Options for SortModuleTimes.py functions, as from its command line."""
+	def __init__(self, **kargs):
+		self.PresentMode = 'ModTable'
+		self.CheckDuplicates = True
+		self.MaxEvents = -1
+		self.Permissive = False
+		self.Percentiles = False
+		self.__dict__.update(kargs)
+	# __init__()
+# class ParseOptionsClass
+
+
+def LoadScript(ScriptPath):
+	"""Imports SortModuleTimes.py as a module."""
+	return imp.load_source('SortModuleTimes', ScriptPath)
+
+
+def PrepareLog(WorkDir, LogParams, compression):
+	"""Generates the log for a scenario in WorkDir (if not there yet)."""
+	Key = hashlib.sha1(repr(( sorted(LogParams.items()), compression ))) \
+	  .hexdigest()[:12]
+	Path = os.path.join(WorkDir, "bench_%s.log%s"
+	  % (Key, { 'none': '', 'gz': '.gz', 'bz2': '.bz2' }[compression]))
+	if not os.path.exists(Path):
+		TempPath = Path + ".tmp"
+		GenerateTimingLog.GenerateLog(TempPath, compression=compression,
+		  **LogParams)
+		os.rename(TempPath, Path)
+	# if
+	return Path
+# PrepareLog()
+
+
+def ReferenceWorkload(LogPath):
+	"""Parses the log line by line in plain python; returns the record count.
+
+	This is the time unit of the benchmarks: it does not depend on the code
+	being measured, and it runs at the speed of the python interpreter on the
+	host, the same as SortModuleTimes.py does.
+	"""
+	Times = {}
+	with open(LogPath, 'r') as LogFile:
+		for line in LogFile:
+			if not line.startswith("Time"): continue
+			Tokens = line.split()
+			if Tokens[0] == "TimeModule>" and len(Tokens) == 10:
+				Key = ( Tokens[7], Tokens[8] )
+			elif Tokens[0] == "TimeEvent>" and len(Tokens) == 8:
+				Key = None
+			else: continue
+			EventKey = ( int(Tokens[2]), int(Tokens[4]), int(Tokens[6]) )
+			Times.setdefault(Key, []).append(( EventKey, float(Tokens[-1]) ))
+		# for
+	# with
+	return sum(map(len, Times.values()))
+# ReferenceWorkload()
+
+
+def PeakMemoryMB():
+	"""Returns the peak resident memory of this process, in megabytes."""
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def ReadProcessStatus(key):
+	"""Returns a memory value (in megabytes) from /proc/self/status, or None."""
+	try:
+		with open("/proc/self/status", 'r') as StatusFile:
+			for line in StatusFile:
+				if line.startswith(key + ":"): return int(line.split()[1]) / 1024.
+		# with
+	except (IOError, IndexError, ValueError): pass
+	return None
+# ReadProcessStatus()
+
+
+def ResetPeakMemory():
+	"""Resets the peak resident memory of this process, if supported (Linux).
+
+	Returns whether the reset was successful.
+	"""
+	try:
+		with open("/proc/self/clear_refs", 'w') as ClearFile: ClearFile.write("5")
+	except IOError: return False
+	return ReadProcessStatus("VmHWM") is not None
+# ResetPeakMemory()
+
+
+def RunPhase(SMT, phase, LogPath, options):
+	"""Runs a phase, returning its duration and peak memory growth.
+
+	The memory growth is the peak resident memory during the phase, minus the
+	resident memory at its start. Where the peak can't be reset before the
+	phase (it can on Linux), the growth of the peak is used instead, which is
+	underestimated if the setup reached a higher peak than the phase.
+	The setup needed by the phase (e.g. parsing the log before formatting the
+	report) is not included in the measurement.
+	"""
+	def NewStats():
+		return SMT.JobStatsClass(), SMT.CreateEventStats(options)
+
+	def ScanAll():
+		Scanner = SMT.LogScannerClass(LogPath, options)
+		return list(Scanner.blocks())
+	# ScanAll()
+
+	def Aggregate(Blocks):
+		AllStats, EventStats = NewStats()
+		Aggregator = SMT.TimingAggregatorClass(AllStats, EventStats, options)
+		for Records in Blocks: Aggregator.addRecords(Records)
+		Aggregator.finish()
+		return AllStats, EventStats
+	# Aggregate()
+
+	if phase == 'reference':
+		Action = lambda: ReferenceWorkload(LogPath)
+	elif phase == 'parse':
+		AllStats, EventStats = NewStats()
+		Action = lambda: SMT.ParseInputFile(LogPath, AllStats, EventStats, options)
+	elif phase == 'scan':
+		Action = ScanAll
+	elif phase == 'aggregate':
+		Blocks = ScanAll()
+		Action = lambda: Aggregate(Blocks)
+	elif phase == 'format':
+		Table = SMT.BuildReportTable(*(Aggregate(ScanAll()) + ( options, )))
+		Action = Table.FormatTable
+	else:
+		raise RuntimeError("Phase %r not known" % phase)
+
+	if ResetPeakMemory():
+		StartMemory = ReadProcessStatus("VmRSS")
+		GetPeakMemory = lambda: ReadProcessStatus("VmHWM")
+	else:
+		StartMemory = PeakMemoryMB()
+		GetPeakMemory = PeakMemoryMB
+	# if ... else
+	StartTime = time.time()
+	Action()
+	return time.time() - StartTime, GetPeakMemory() - StartMemory
+# RunPhase()
+
+
+def RunPhaseInChild(ScriptPath, phase, LogPath, options):
+	"""Runs RunPhase() in a new process; returns ( time, memory growth )."""
+	ReadEnd, WriteEnd = os.pipe()
+	pid = os.fork()
+	if pid == 0: # child
+		os.close(ReadEnd)
+		os.dup2(os.open(os.devnull, os.O_WRONLY), 2) # no format error messages
+		try:
+			try:
+				SMT = None if phase == 'reference' else LoadScript(ScriptPath)
+				Result = RunPhase(SMT, phase, LogPath, options)
+			except Exception, e: Result = { 'error': "%s: %s" % (type(e).__name__, e) }
+			os.write(WriteEnd, json.dumps(Result))
+		finally: os._exit(0)
+	# if child
+	os.close(WriteEnd)
+	Output = ''
+	while True:
+		data = os.read(ReadEnd, 4096)
+		if not data: break
+		Output += data
+	# while
+	os.close(ReadEnd)
+	os.waitpid(pid, 0)
+	Result = json.loads(Output) if Output else { 'error': "no result" }
+	if isinstance(Result, dict):
+		raise RuntimeError("Phase '%s' on '%s' failed (%s)"
+		  % (phase, LogPath, Result['error']))
+	# if
+	return Result
+# RunPhaseInChild()
+
+
+def RunReference(WorkDir, nRepeat):
+	"""Returns the best time of the reference workload on this host."""
+	LogParams, compression, Options = Scenarios[ReferenceScenario]
+	LogPath = PrepareLog(WorkDir, LogParams, compression)
+	return min(RunPhaseInChild(None, 'reference', LogPath, None)[0]
+	  for i in xrange(nRepeat))
+# RunReference()
+
+
+def RunScenario(ScriptPath, name, WorkDir, nRepeat, ReferenceTime):
+	"""Runs all the phases of a scenario; returns a dictionary of results.
+
+	The time of each phase is stored relative to ReferenceTime.
+	"""
+	LogParams, compression, Options = Scenarios[name]
+	LogPath = PrepareLog(WorkDir, LogParams, compression)
+	options = ParseOptionsClass(**Options)
+	Results = OrderedDict()
+	for phase in Phases:
+		Runs = [ RunPhaseInChild(ScriptPath, phase, LogPath, options)
+		  for i in xrange(nRepeat) ]
+		Results[phase] = OrderedDict([
+		  ( 'relativetime', min(run[0] for run in Runs) / ReferenceTime ),
+		  ( 'memory', min(run[1] for run in Runs) ),
+		  ])
+	# for
+	return Results
+# RunScenario()
+
+
+def CompareToBaseline(name, Results, Baseline, TimeTolerance, MemoryTolerance,
+  ReferenceTime, TimeSlack = 0.05, MemorySlack = 2.):
+	"""Prints the results and returns the list of flagged regressions.
+
+	Times are compared relative to the reference time of each run (see
+	ReferenceWorkload()). Slowdowns smaller than TimeSlack seconds (on this
+	host) and memory growths below MemorySlack megabytes are not flagged.
+	"""
+	Regressions = []
+	for phase, Result in Results.items():
+		Reference = Baseline.get(phase)
+		msg = "%-12s %-10s %8.3f s (x%7.3f) %8.1f MB" \
+		  % (name, phase, Result['relativetime'] * ReferenceTime,
+		  Result['relativetime'], Result['memory'])
+		if Reference and ('relativetime' in Reference):
+			TimeRatio \
+			  = Result['relativetime'] / max(Reference['relativetime'], 1e-6)
+			msg += "   (baseline: x%7.3f %8.1f MB; time x%.2f)" \
+			  % (Reference['relativetime'], Reference['memory'], TimeRatio)
+			if (TimeRatio > 1. + TimeTolerance) and (ReferenceTime
+			  * (Result['relativetime'] - Reference['relativetime']) > TimeSlack):
+				Regressions.append("%s/%s: %.0f%% slower" \
+				  % (name, phase, (TimeRatio - 1.) * 100.))
+				msg += "  SLOWER"
+			# if
+			if Result['memory'] > max \
+			  (Reference['memory'] * (1. + MemoryTolerance), MemorySlack):
+				Regressions.append("%s/%s: memory %.1f MB (was %.1f MB)" \
+				  % (name, phase, Result['memory'], Reference['memory']))
+				msg += "  MORE MEMORY"
+			# if
+		else:
+			msg += "   (no baseline)"
+		print msg
+	# for
+	return Regressions
+# CompareToBaseline()
+
+
+################################################################################
+### main program
+###
+if __name__ == "__main__":
+	import argparse
+
+	Parser = argparse.ArgumentParser(description=__doc__)
+	Parser.add_argument("Scenarios", metavar="Scenario", nargs="*",
+	  help="scenarios to run (default: all; available: %s)"
+	  % ", ".join(Scenarios))
+	Parser.add_argument("--script", dest="ScriptPath", default=DefaultScriptPath,
+	  help="path of SortModuleTimes.py [%(default)s]")
+	Parser.add_argument("--baseline", dest="BaselinePath",
+	  default=DefaultBaselinePath, help="baseline file [%(default)s]")
+	Parser.add_argument("--updatebaseline", dest="UpdateBaseline",
+	  action="store_true", help="store the results as new baseline")
+	Parser.add_argument("--repeat", dest="nRepeat", type=int, default=3,
+	  help="repetitions of each phase (the best time is kept) [%(default)s]")
+	Parser.add_argument("--tolerance", dest="TimeTolerance", type=float,
+	  default=0.3, help="relative slowdown flagged as regression [%(default)s]")
+	Parser.add_argument("--memorytolerance", dest="MemoryTolerance",
+	  type=float, default=0.25,
+	  help="relative memory increase flagged as regression [%(default)s]")
+	Parser.add_argument("--workdir", dest="WorkDir",
+	  default=os.path.join(tempfile.gettempdir(), "SortModuleTimesBenchmarks"),
+	  help="directory for the generated logs [%(default)s]")
+
+	options = Parser.parse_args()
+
+	for name in options.Scenarios:
+		if name not in Scenarios: Parser.error("Unknown scenario '%s'" % name)
+	ScenarioNames = options.Scenarios or list(Scenarios)
+	if not os.path.isdir(options.WorkDir): os.makedirs(options.WorkDir)
+
+	try:
+		with open(options.BaselinePath, 'r') as BaselineFile:
+			Baselines = json.load(BaselineFile, object_pairs_hook=OrderedDict)
+	except IOError:
+		Baselines = OrderedDict([ ( 'scenarios', OrderedDict() ) ])
+	# try ... except
+	if not options.UpdateBaseline and Baselines.get('machine'):
+		print "Baseline from %s (python %s), reference time %.3f s" \
+		  % (Baselines['machine'], Baselines.get('python', 'unknown'),
+		  Baselines.get('reference', {}).get('time', float('nan')))
+	# if
+
+	ReferenceTime = RunReference(options.WorkDir, options.nRepeat)
+	print "Reference time on this host: %.3f s" \
+	  " (phase times below are also shown as multiples of it)" % ReferenceTime
+
+	Regressions = []
+	for name in ScenarioNames:
+		Results = RunScenario(options.ScriptPath, name,
+		  options.WorkDir, options.nRepeat, ReferenceTime)
+		Regressions.extend(CompareToBaseline(name, Results,
+		  Baselines['scenarios'].get(name, {}),
+		  options.TimeTolerance, options.MemoryTolerance, ReferenceTime))
+		Baselines['scenarios'][name] = Results
+		sys.stdout.flush()
+	# for
+
+	if options.UpdateBaseline:
+		Baselines['machine'] = "%s, %d CPUs" \
+		  % (platform.machine(), multiprocessing.cpu_count())
+		Baselines['python'] = platform.python_version()
+		Baselines['reference'] = OrderedDict([
+		  ( 'workload', "ReferenceWorkload() on the '%s' scenario log"
+		    % ReferenceScenario ),
+		  ( 'time', ReferenceTime ),
+		  ])
+		with open(options.BaselinePath, 'w') as BaselineFile:
+			json.dump(Baselines, BaselineFile,
+			  indent=2, separators=(',', ': '))
+			print >>BaselineFile
+		# with
+		print "Baseline written into '%s'." % options.BaselinePath
+		sys.exit(0)
+	# if
+
+	if Regressions:
+		print >>sys.stderr, "%d regressions found:" % len(Regressions)
+		for msg in Regressions: print >>sys.stderr, "  " + msg
+	# if
+	sys.exit(1 if Regressions else 0)
+# main
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+#
+# Brief:  writes a synthetic art log with timing information
+# Date:   20261018
+#
+# Run with '--help' argument for usage instructions.
+#
+# The log contains the TimeModule and TimeEvent lines from the art Timing
+# service, as parsed by SortModuleTimes.py, optionally mixed with unrelated
+# output lines, duplicate lines and truncated timing records.
+#
+
+import sys
+import random
+import gzip
+import bz2
+
+
+__doc__ = "Writes a synthetic art log with timing information."
+
+NoiseLines = [
+	"%%MSG-i Timing:  %s %s 18-Oct-2026 12:00:00 CDT run: %d subRun: %d event: %d",
+	"Begin processing the %dth record. run: %d subRun: %d event: %d at 18-Oct-2026 12:00:00 CDT",
+	"%%MSG",
+	"TrackFinder: found %d tracks in %d hits (%d clusters)",
+	"Warning: channel %d has no pedestal; using default",
+	]
+
+
+class LogGeneratorClass(object):
+	"""Produces the lines of a synthetic art log.
+
+	The job has nModules modules (with labels "mod<N>" of types "Type<N>"),
+	processing nEvents events spread in nRuns runs of nSubRuns subruns each.
+	Each module takes a time drawn from a log-normal distribution with a
+	median specific to that module.
+	The fractions of noise lines (unrelated output between timing lines),
+	duplicate lines (a timing line repeated) and truncated records (a timing
+	line cut short) are specified relative to the number of timing lines.
+	"""
+	def __init__(self, nModules = 20, nEvents = 1000, nRuns = 1, nSubRuns = 1,
+	  noise = 0., duplicates = 0., truncated = 0., seed = 12345):
+		self.nModules = nModules
+		self.nEvents = nEvents
+		self.nRuns = max(nRuns, 1)
+		self.nSubRuns = max(nSubRuns, 1)
+		self.noise = noise
+		self.duplicates = duplicates
+		self.truncated = truncated
+		self.random = random.Random(seed)
+		self.modules = [ ( "mod%d" % i, "Type%d" % (i % 7) ) \
+		  for i in xrange(nModules) ]
+		self.medians = [ 10. ** self.random.uniform(-4., 0.) \
+		  for i in xrange(nModules) ]
+	# __init__()
+
+	def eventKeys(self):
+		"""Yields (run, subRun, event) for all the events."""
+		nPerSubRun = max(1, -(-self.nEvents // (self.nRuns * self.nSubRuns)))
+		iEvent = 0
+		for run in xrange(1, self.nRuns + 1):
+			for subRun in xrange(self.nSubRuns):
+				for event in xrange(1, nPerSubRun + 1):
+					if iEvent >= self.nEvents: return
+					yield run, subRun, event
+					iEvent += 1
+				# for event
+			# for subrun
+		# for run
+	# eventKeys()
+
+	def noiseLine(self, run, subRun, event):
+		rnd = self.random
+		template = rnd.choice(NoiseLines)
+		nArgs = template.count('%') - 2 * template.count('%%')
+		if template.startswith("%%MSG-i"):
+			return template % ("mod0", "Type0", run, subRun, event)
+		if template.startswith("Begin"):
+			return template % (event, run, subRun, event)
+		return template % tuple(rnd.randint(0, 10000) for i in xrange(nArgs))
+	# noiseLine()
+
+	def lines(self):
+		"""Yields all the lines of the log (without end of line)."""
+		rnd = self.random
+		for run, subRun, event in self.eventKeys():
+			eventKey = "run: %d subRun: %d event: %d" % (run, subRun, event)
+			eventTime = 0.
+			records = []
+			for (label, type_), median in zip(self.modules, self.medians):
+				time = median * rnd.lognormvariate(0., 0.5)
+				eventTime += time
+				records.append("TimeModule> %s %s %s %g" \
+				  % (eventKey, label, type_, time))
+			# for
+			records.append("TimeEvent> %s %g" % (eventKey, eventTime * 1.01))
+			for record in records:
+				if self.noise and (rnd.random() < self.noise):
+					yield self.noiseLine(run, subRun, event)
+				if self.truncated and (rnd.random() < self.truncated):
+					yield record[:rnd.randint(1, len(record) - 1)]
+				yield record
+				if self.duplicates and (rnd.random() < self.duplicates):
+					yield record
+			# for
+		# for events
+	# lines()
+
+	def write(self, OutputFile):
+		"""Writes the whole log into a file object; returns the number of lines."""
+		nLines = 0
+		for line in self.lines():
+			OutputFile.write(line + '\n')
+			nLines += 1
+		# for
+		return nLines
+	# write()
+
+# class LogGeneratorClass
+
+
+def OpenOutput(Path, compression = None):
+	"""Opens a file for writing, with the compression (or from its suffix)."""
+	if compression is None:
+		if Path.endswith('.gz'): compression = 'gz'
+		elif Path.endswith('.bz2'): compression = 'bz2'
+		else: compression = 'none'
+	# if
+	if compression == 'gz': return gzip.GzipFile(Path, 'wb')
+	if compression == 'bz2': return bz2.BZ2File(Path, 'wb')
+	if compression == 'none':
+		return sys.stdout if Path == '-' else open(Path, 'wb')
+	raise RuntimeError("Compression %r not supported" % compression)
+# OpenOutput()
+
+
+def GenerateLog(Path, compression = None, **kargs):
+	"""Writes a synthetic log into Path; arguments as LogGeneratorClass."""
+	OutputFile = OpenOutput(Path, compression)
+	try: return LogGeneratorClass(**kargs).write(OutputFile)
+	finally:
+		if OutputFile is not sys.stdout: OutputFile.close()
+# GenerateLog()
+
+
+################################################################################
+### main program
+###
+if __name__ == "__main__":
+	import argparse
+
+	Parser = argparse.ArgumentParser(description=__doc__)
+	Parser.add_argument("OutputFile", nargs="?", default="-",
+	  help="output log file ('-' for standard output) [%(default)s]")
+	Parser.add_argument("--modules", dest="nModules", type=int, default=20,
+	  help="number of modules [%(default)s]")
+	Parser.add_argument("--events", dest="nEvents", type=int, default=1000,
+	  help="number of events [%(default)s]")
+	Parser.add_argument("--runs", dest="nRuns", type=int, default=1,
+	  help="number of runs [%(default)s]")
+	Parser.add_argument("--subruns", dest="nSubRuns", type=int, default=1,
+	  help="number of subruns in each run [%(default)s]")
+	Parser.add_argument("--noise", type=float, default=0.,
+	  help="fraction of unrelated lines per timing line [%(default)s]")
+	Parser.add_argument("--duplicates", type=float, default=0.,
+	  help="fraction of duplicate timing lines [%(default)s]")
+	Parser.add_argument("--truncated", type=float, default=0.,
+	  help="fraction of truncated timing records [%(default)s]")
+	Parser.add_argument("--compress", dest="compression",
+	  choices=[ 'none', 'gz', 'bz2' ],
+	  help="compression of the output (default: from the file suffix)")
+	Parser.add_argument("--seed", type=int, default=12345,
+	  help="seed of the random generator [%(default)s]")
+
+	options = Parser.parse_args()
+
+	GenerateLog(options.OutputFile, compression=options.compression,
+	  nModules=options.nModules, nEvents=options.nEvents,
+	  nRuns=options.nRuns, nSubRuns=options.nSubRuns,
+	  noise=options.noise, duplicates=options.duplicates,
+	  truncated=options.truncated, seed=options.seed)
+# main
@@ -0,0 +1,180 @@
+#!/usr/bin/env python2
+#
+# Brief:  tests of the behaviour of find_global_symbol.py
+# Date:   20261018
+#
+# Run without arguments; unittest options are accepted (e.g. '-v').
+#
+# Each test builds (with g++) two small libraries, one using a function of the
+# other, and looks for their symbols with the script; the symbol index is kept
+# in the test working area.
+# The path of the script can be set with the FIND_GLOBAL_SYMBOL_SCRIPT
+# environment variable (default: the one in the source tree).
+#
+
+import sys, os
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+TestDir = os.path.dirname(os.path.abspath(__file__))
+
+ScriptPath = os.environ.get("FIND_GLOBAL_SYMBOL_SCRIPT",
+  os.path.join(TestDir, "..", "scripts", "find_global_symbol.py"))
+
+# liba defines util::answer(int), libb uses it
+Sources = {
+  "liba": "namespace util { int answer(int x) { return x + %d; } }\n",
+  "libb": "namespace util { int answer(int x); }\n"
+    "int ask(int x) { return util::answer(x); }\n",
+  }
+Mangled = "_ZN4util6answerEi"
+Demangled = "util::answer(int)"
+
+
+class FindGlobalSymbolTestCase(unittest.TestCase):
+	"""Runs find_global_symbol.py on libraries built for the test."""
+
+	@classmethod
+	def setUpClass(cls):
+		cls.WorkDir = tempfile.mkdtemp(prefix="find_global_symbol_test")
+		cls.LibDir = cls.path("lib")
+		os.mkdir(cls.LibDir)
+		try:
+			for name in sorted(Sources): cls.buildLibrary(name)
+		except (OSError, subprocess.CalledProcessError), e:
+			shutil.rmtree(cls.WorkDir, ignore_errors=True)
+			raise unittest.SkipTest("can't build the test libraries (%s)" % e)
+		# try ... except
+	# setUpClass()
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.WorkDir, ignore_errors=True)
+
+	@classmethod
+	def path(cls, *names): return os.path.join(cls.WorkDir, *names)
+
+	@classmethod
+	def buildLibrary(cls, name, Value = 42):
+		"""Builds the library name in LibDir (Value changes liba content)."""
+		SourcePath = cls.path(name + ".cpp")
+		with open(SourcePath, 'w') as SourceFile:
+			SourceFile.write(Sources[name] % Value if "%d" in Sources[name]
+			  else Sources[name])
+		# with
+		with open(os.devnull, 'w') as Null:
+			subprocess.check_call([ "g++", "-shared", "-fPIC", "-o",
+			  os.path.join(cls.LibDir, name + ".so"), SourcePath ],
+			  stdout=Null, stderr=Null)
+		# with
+	# buildLibrary()
+
+	def runScript(self, *args, **kargs):
+		"""Runs the script; returns its output (and checks it succeeds).
+
+		The index is the one named IndexName in the working area, unless an
+		index is specified in args.
+		"""
+		Environment = dict(os.environ)
+		Environment.pop("DYLD_LIBRARY_PATH", None)
+		Environment["LD_LIBRARY_PATH"] = self.LibDir
+		Arguments = [ sys.executable, ScriptPath, "-j", "2" ]
+		if "--index" not in args:
+			Arguments.extend([ "--index",
+			  self.path(kargs.get("IndexName", "index.sqlite")) ])
+		# if
+		Process = subprocess.Popen(Arguments + list(args),
+		  stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=Environment)
+		Output, Errors = Process.communicate()
+		self.assertEqual(Process.returncode, 0,
+		  "%s failed with code %d:\n%s" % (" ".join(args), Process.returncode,
+		  Errors))
+		if kargs.get("bErrors", False): return Output, Errors
+		return Output
+	# runScript()
+
+	def foundLibraries(self, Output):
+		"""Returns the libraries with matches listed in the output."""
+		return [ line.split()[-1] for line in Output.splitlines()
+		  if line.startswith("    Found in ") ]
+	# foundLibraries()
+
+
+	def test_Mangled(self):
+		Output = self.runScript(Mangled)
+		self.assertIn("Searching for mangled symbol '%s'" % Mangled, Output)
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so" ])
+		self.assertIn("Found in path %s/..." % self.LibDir, Output)
+		self.assertIn("        Entry: T %s\n" % Mangled, Output)
+		self.assertIn("        Translates to T %s\n" % Demangled, Output)
+		# the undefined symbol in libb is listed only on request
+		Output = self.runScript("-u", Mangled)
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so", "libb.so" ])
+		self.assertIn("        Entry: U %s\n" % Mangled, Output)
+	# test_Mangled()
+
+	def test_Demangled(self):
+		# names with a parenthesis are demangled names
+		Output = self.runScript(Demangled)
+		self.assertIn("Searching for demangled symbol '%s'" % Demangled, Output)
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so" ])
+		self.assertIn("        Entry: T %s\n" % Demangled, Output)
+		self.assertIn("        Translates to T %s\n" % Mangled, Output)
+		Output = self.runScript("-d", "util::answer")
+		self.assertEqual(self.foundLibraries(Output), [])
+	# test_Demangled()
+
+	def test_Fragment(self):
+		Output = self.runScript("-f", "6answer")
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so" ])
+		Output = self.runScript("-f", "-d", "-u", "util::answer")
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so", "libb.so" ])
+		self.assertIn("        Entry: T %s\n" % Demangled, Output)
+		Output = self.runScript("-f", "-d", "ask(")
+		self.assertIn("        Entry: T ask(int)\n", Output)
+	# test_Fragment()
+
+	def test_IndexUpdate(self):
+		def Scanned(Output):
+			return [ line.split()[0] for line in Output.splitlines()
+			  if line.startswith("  ") and line.endswith(" symbols") ]
+		# Scanned()
+		Output = self.runScript("-v", "-v", Mangled, IndexName="update.sqlite")
+		self.assertIn("Scanning 2 of 2 libraries", Output)
+		# nothing changed: the index is used as it is
+		Output = self.runScript("-v", "-v", Mangled, IndexName="update.sqlite")
+		self.assertNotIn("Scanning", Output)
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so" ])
+		# only the rebuilt library is scanned again
+		LibraryPath = os.path.join(self.LibDir, "liba.so")
+		Info = os.stat(LibraryPath)
+		self.buildLibrary("liba", Value=1234567)
+		os.utime(LibraryPath, ( Info.st_atime, Info.st_mtime + 10 ))
+		Output = self.runScript("-v", "-v", Mangled, IndexName="update.sqlite")
+		self.assertIn("Scanning 1 of 2 libraries", Output)
+		self.assertEqual(Scanned(Output), [ LibraryPath + ":" ])
+		# removed libraries are removed from the index too
+		os.rename(LibraryPath, self.path("liba.so.removed"))
+		try:
+			Output = self.runScript("-u", Mangled, IndexName="update.sqlite")
+			self.assertEqual(self.foundLibraries(Output), [ "libb.so" ])
+		finally:
+			os.rename(self.path("liba.so.removed"), LibraryPath)
+	# test_IndexUpdate()
+
+	def test_IndexNotWritable(self):
+		# the directory of the index would be under a regular file
+		with open(self.path("notADirectory"), 'w'): pass
+		Output, Errors = self.runScript("--index",
+		  self.path("notADirectory", "index.sqlite"), Mangled, bErrors=True)
+		self.assertIn("Warning: can't use the index at", Errors)
+		self.assertEqual(self.foundLibraries(Output), [ "liba.so" ])
+	# test_IndexNotWritable()
+
+# class FindGlobalSymbolTestCase
+
+
+if __name__ == "__main__":
+	unittest.main()
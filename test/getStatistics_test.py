@@ -0,0 +1,208 @@
+#!/usr/bin/env python2
+#
+# Brief:  tests of the behaviour of getStatistics.py
+# Date:   20261018
+#
+# Run without arguments; unittest options are accepted (e.g. '-v').
+#
+# The tests create two small git repositories: "tracked", a clone with an
+# origin/master branch, and "local", without any remote; the cache of the
+# script is kept in the test working area.
+# The path of the script can be set with the GETSTATISTICS_SCRIPT environment
+# variable (default: the one in the source tree).
+#
+
+import sys, os
+import json
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+TestDir = os.path.dirname(os.path.abspath(__file__))
+
+ScriptPath = os.environ.get("GETSTATISTICS_SCRIPT",
+  os.path.join(TestDir, "..", "scripts", "getStatistics.py"))
+
+
+def FindProgram(name):
+	"""Returns the path of the program name in PATH (None if not found)."""
+	for Dir in os.environ.get("PATH", "").split(os.pathsep):
+		Path = os.path.join(Dir, name)
+		if os.path.isfile(Path) and os.access(Path, os.X_OK): return Path
+	# for
+	return None
+# FindProgram()
+
+
+class GetStatisticsTestCase(unittest.TestCase):
+	"""Runs getStatistics.py on git repositories created for the test."""
+
+	@classmethod
+	def setUpClass(cls):
+		if FindProgram("git") is None:
+			raise unittest.SkipTest("git is not available")
+		cls.WorkDir = tempfile.mkdtemp(prefix="getStatistics_test")
+		cls.Upstream = cls.path("upstream")
+		cls.Tracked = cls.path("tracked")
+		cls.Local = cls.path("local")
+		cls.createRepository(cls.Upstream, "Alice", {
+		  "Alpha_module.cc": "int a;\n",
+		  "Beta_service.cc": "int b;\n",
+		  "test/Gamma_test.cc": "int c;\n",
+		  "notamodule.cc": "int d;\n",
+		  "ups/product_deps": "parent\n",
+		  "image.bin": "\0\1\2\3",
+		  })
+		cls.git(cls.WorkDir, "clone", "-q", cls.Upstream, cls.Tracked)
+		cls.commit(cls.Tracked, "Bob", { "Delta_module.cc": "int e;\nint f;\n" })
+		cls.createRepository(cls.Local, "Carol", { "Epsilon_tool.cc": "int g;\n" })
+	# setUpClass()
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.WorkDir, ignore_errors=True)
+
+	@classmethod
+	def path(cls, *names): return os.path.join(cls.WorkDir, *names)
+
+	@classmethod
+	def git(cls, Dir, *args, **Variables):
+		Environment = dict(os.environ)
+		Environment.update(Variables)
+		with open(os.devnull, 'w') as Null:
+			subprocess.check_call([ "git" ] + list(args), cwd=Dir,
+			  stdout=Null, env=Environment)
+		# with
+	# git()
+
+	@classmethod
+	def commit(cls, Dir, Author, Files):
+		"""Writes the Files (path: content) and commits them as Author."""
+		for Path, Content in Files.items():
+			FullPath = os.path.join(Dir, Path)
+			if not os.path.isdir(os.path.dirname(FullPath)):
+				os.makedirs(os.path.dirname(FullPath))
+			with open(FullPath, 'wb') as OutputFile: OutputFile.write(Content)
+		# for
+		cls.git(Dir, "add", "-A")
+		Email = Author.lower() + "@example.com"
+		cls.git(Dir, "commit", "-q", "-m", "by " + Author,
+		  GIT_AUTHOR_NAME=Author, GIT_AUTHOR_EMAIL=Email,
+		  GIT_COMMITTER_NAME=Author, GIT_COMMITTER_EMAIL=Email)
+	# commit()
+
+	@classmethod
+	def createRepository(cls, Dir, Author, Files):
+		"""Creates a repository at Dir with a master branch with the Files."""
+		os.makedirs(Dir)
+		cls.git(Dir, "init", "-q")
+		cls.git(Dir, "symbolic-ref", "HEAD", "refs/heads/master")
+		cls.commit(Dir, Author, Files)
+	# createRepository()
+
+	def runScript(self, *args, **Variables):
+		"""Runs the script; returns its exit code, output and error output."""
+		Environment = dict(os.environ)
+		Environment.update(Variables)
+		Process = subprocess.Popen([ sys.executable, ScriptPath,
+		  "--cache", self.path("cache.json") ] + list(args),
+		  stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+		  cwd=self.WorkDir, env=Environment)
+		Output, Errors = Process.communicate()
+		return Process.returncode, Output, Errors
+	# runScript()
+
+	def checkRun(self, *args):
+		"""Runs the script, checks that it succeeds and returns its output."""
+		rc, Output, Errors = self.runScript(*args)
+		self.assertEqual(rc, 0,
+		  "%s failed with code %d:\n%s" % (" ".join(args), rc, Errors))
+		return Output
+	# checkRun()
+
+
+	def test_Modules(self):
+		# Alpha, Beta (and Delta in the clone); not in tests, nor without '_'
+		self.assertEqual(self.checkRun("-t", "modules", "upstream"),
+		  "found 2 modules\n")
+		self.assertEqual(self.checkRun("-t", "modules", "tracked", "local"),
+		  "found 4 modules\n")
+		# the count follows uncommitted changes too (the cache is not stale)
+		ModulePath = os.path.join(self.Local, "Zeta_module.cc")
+		with open(ModulePath, 'w') as ModuleFile: ModuleFile.write("int z;\n")
+		try:
+			self.assertEqual(self.checkRun("-t", "modules", "tracked", "local"),
+			  "found 5 modules\n")
+		finally: os.remove(ModulePath)
+		self.assertEqual(self.checkRun("-t", "modules", "tracked", "local"),
+		  "found 4 modules\n")
+	# test_Modules()
+
+	def test_Authors(self):
+		self.assertEqual(self.checkRun("-t", "authors", "tracked", "local"),
+		  '"Alice"\n"Bob"\n"Carol"\n')
+	# test_Authors()
+
+	def test_ThisYear(self):
+		# the numbers of lines added on origin/master (i.e. in upstream),
+		# except the binary file and the ups directory
+		self.assertEqual(self.checkRun("-t", "this_year", "tracked"),
+		  "tracked: 4 lines changed in the last year\n")
+		# a repository with no origin/master is reported on its own line
+		rc, Output, Errors = self.runScript("-t", "this_year", "local", "tracked")
+		self.assertEqual(rc, 1)
+		Lines = Output.splitlines()
+		self.assertEqual(len(Lines), 2)
+		self.assertTrue(Lines[0].startswith("local: ERROR: "), Output)
+		self.assertIn("origin/master", Lines[0])
+		self.assertEqual(Lines[1], "tracked: 4 lines changed in the last year")
+	# test_ThisYear()
+
+	def test_Cache(self):
+		# a repository of its own, as this test adds commits to it
+		Dir = self.path("cached")
+		self.createRepository(Dir, "Frank", { "Theta_module.cc": "int t;\n" })
+		CachePath = self.path("cache.json")
+		self.checkRun("-t", "authors", "cached")
+		with open(CachePath, 'r') as CacheFile: Cache = json.load(CacheFile)
+		Key = "authors:" + Dir
+		self.assertIn(Key, Cache["entries"])
+		# a stored result is used while the repository has not moved...
+		Cache["entries"][Key]["result"] = [ "Cached" ]
+		with open(CachePath, 'w') as CacheFile: json.dump(Cache, CacheFile)
+		self.assertEqual(self.checkRun("-t", "authors", "cached"), '"Cached"\n')
+		self.assertEqual(self.checkRun("--nocache", "-t", "authors", "cached"),
+		  '"Frank"\n')
+		# ... and ignored when the repository has new commits
+		self.commit(Dir, "Grace", { "notes.txt": "moved\n" })
+		self.assertEqual(self.checkRun("-t", "authors", "cached"),
+		  '"Frank"\n"Grace"\n')
+		# the failures are not cached
+		self.assertEqual(self.runScript("-t", "this_year", "cached")[0], 1)
+		with open(CachePath, 'r') as CacheFile: Cache = json.load(CacheFile)
+		self.assertNotIn("this_year:" + Dir, Cache["entries"])
+	# test_Cache()
+
+	def test_Code(self):
+		if FindProgram("cloc") is None:
+			# each repository reports the failure, and the report is still printed
+			rc, Output, Errors = self.runScript("-t", "code", "tracked", "local")
+			self.assertEqual(rc, 1)
+			self.assertIn("ERROR: tracked: can't run 'cloc'", Errors)
+			self.assertIn("ERROR: local: can't run 'cloc'", Errors)
+			self.assertIn("\nSUM ", Output)
+			return
+		# if no cloc
+		Output = self.checkRun("-t", "code", "tracked", "local")
+		Totals = dict(( line.split()[0], line.split()[1:] )
+		  for line in Output.splitlines()[2:])
+		# five C++ files in tracked (ups excluded), one in local
+		self.assertEqual(Totals["SUM"][0], "6")
+	# test_Code()
+
+# class GetStatisticsTestCase
+
+
+if __name__ == "__main__":
+	unittest.main()